@@ -0,0 +1,147 @@
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Optional
+
+from app.settings import settings
+from app.users.principal import Principal
+
+PRINCIPAL_CACHE_MAX_SIZE = settings.PRINCIPAL_CACHE_MAX_SIZE
+PRINCIPAL_CACHE_TTL_SECONDS = settings.PRINCIPAL_CACHE_TTL_SECONDS
+
+
+def token_fingerprint(token: str) -> bytes:
+    return hashlib.blake2b(token.encode(), digest_size=16).digest()
+
+
+class _CacheEntry:
+    __slots__ = ("principal", "expires_at", "token_id")
+
+    def __init__(self, principal: Principal, expires_at: float, token_id: Optional[str] = None):
+        self.principal = principal
+        self.expires_at = expires_at
+        self.token_id = token_id
+
+
+class PrincipalCache:
+    """
+    Bounded LRU cache with a TTL, mapping bearer token fingerprints to resolved principals.
+
+    Entries never outlive the token they were resolved from, and all entries of a user can be
+    dropped at once with `invalidate_user` when the user is updated or deleted. Entries resolved from
+    a token carrying a `jti` can be dropped with `invalidate_token_id` when that token is revoked.
+    The cache is per worker: changes made through another worker are applied when this one syncs
+    them from the database (see `app.auth.sync`), until then its entries may be stale.
+
+    Every invalidation increments `generation`. A caller reads it before resolving a principal and passes
+    it to `put`, which refuses the entry when an invalidation ran meanwhile: the principal may have been
+    resolved from a revoked token or a superseded user row.
+    """
+
+    def __init__(
+        self,
+        max_size: int = PRINCIPAL_CACHE_MAX_SIZE,
+        ttl_seconds: float = PRINCIPAL_CACHE_TTL_SECONDS,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self._clock = clock
+        self._entries: OrderedDict[bytes, _CacheEntry] = OrderedDict()
+        self._keys_by_user: dict[int, set[bytes]] = {}
+        self._keys_by_token_id: dict[str, bytes] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.generation = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, token: str) -> Optional[Principal]:
+        key = token_fingerprint(token)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return
+            if entry.expires_at <= self._clock():
+                self._remove(key)
+                self.misses += 1
+                return
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry.principal
+
+    def put(
+        self,
+        token: str,
+        principal: Principal,
+        token_expires_at: Optional[float] = None,
+        token_id: Optional[str] = None,
+        generation: Optional[int] = None,
+    ) -> None:
+        ttl = self.ttl_seconds
+        if token_expires_at is not None:
+            ttl = min(ttl, token_expires_at - time.time())
+        if ttl <= 0:
+            return
+        key = token_fingerprint(token)
+        with self._lock:
+            if generation is not None and generation != self.generation:
+                return
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = _CacheEntry(principal, self._clock() + ttl, token_id)
+            self._keys_by_user.setdefault(principal.id, set()).add(key)
+            if token_id is not None:
+                self._keys_by_token_id[token_id] = key
+            while len(self._entries) > self.max_size:
+                self._remove(next(iter(self._entries)))
+                self.evictions += 1
+
+    def invalidate_user(self, uid: int) -> None:
+        with self._lock:
+            self.generation += 1
+            for key in list(self._keys_by_user.get(uid, ())):
+                self._remove(key)
+
+    def invalidate_token_id(self, token_id: str) -> None:
+        with self._lock:
+            self.generation += 1
+            key = self._keys_by_token_id.get(token_id)
+            if key is not None:
+                self._remove(key)
+
+    def clear(self) -> None:
+        with self._lock:
+            self.generation += 1
+            self._entries.clear()
+            self._keys_by_user.clear()
+            self._keys_by_token_id.clear()
+
+    def stats(self) -> dict:
+        return {
+            "size": len(self._entries),
+            "max_size": self.max_size,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+        }
+
+    def _remove(self, key: bytes) -> None:
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return
+        if entry.token_id is not None:
+            self._keys_by_token_id.pop(entry.token_id, None)
+        user_keys = self._keys_by_user.get(entry.principal.id)
+        if user_keys is not None:
+            user_keys.discard(key)
+            if not user_keys:
+                del self._keys_by_user[entry.principal.id]
+
+
+principal_cache = PrincipalCache()
@@ -0,0 +1,161 @@
+import asyncio
+import os
+import secrets
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from functools import lru_cache
+from typing import Any, Callable, Optional, Sequence
+
+from app.metrics import password_hashing_duration
+from app.settings import pwd_context, settings
+
+HASHING_MAX_WORKERS = settings.HASHING_MAX_WORKERS or os.cpu_count() or 1
+HASHING_MAX_QUEUE = settings.HASHING_MAX_QUEUE
+
+
+class HashingPoolSaturatedError(Exception):
+    default_message = "Password hashing pool is saturated"
+
+    def __init__(self, message=default_message):
+        self.message = message
+        super().__init__(self.message)
+
+
+class HashingExecutor:
+    """
+    Bounded thread pool dedicated to password hashing and verification.
+
+    bcrypt releases the GIL, so a thread pool sized to the number of cores hashes in parallel
+    without competing with the threadpool Starlette uses for sync endpoints and dependencies.
+    Once `max_workers + max_queue` jobs are pending, new submissions are rejected with
+    `HashingPoolSaturatedError` instead of queueing without bound.
+    """
+
+    def __init__(self, max_workers: int = HASHING_MAX_WORKERS, max_queue: int = HASHING_MAX_QUEUE):
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._pending = 0
+        self._rejected = 0
+        self._lock = threading.Lock()
+
+    @property
+    def pending(self) -> int:
+        return self._pending
+
+    @property
+    def queue_depth(self) -> int:
+        return max(0, self._pending - self.max_workers)
+
+    @property
+    def rejected(self) -> int:
+        return self._rejected
+
+    def stats(self) -> dict:
+        return {
+            "max_workers": self.max_workers,
+            "max_queue": self.max_queue,
+            "pending": self.pending,
+            "queue_depth": self.queue_depth,
+            "rejected": self.rejected,
+        }
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        if self._executor is None:
+            with self._lock:
+                if self._executor is None:
+                    self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="pwd-hash")
+        return self._executor
+
+    def _release(self, _future: Optional[Future] = None) -> None:
+        with self._lock:
+            self._pending -= 1
+
+    def submit(self, fn: Callable[..., Any], *args: Any) -> Future:
+        executor = self._get_executor()
+        with self._lock:
+            if self._pending >= self.max_workers + self.max_queue:
+                self._rejected += 1
+                raise HashingPoolSaturatedError()
+            self._pending += 1
+        try:
+            future = executor.submit(fn, *args)
+        except BaseException:
+            self._release()
+            raise
+        future.add_done_callback(self._release)
+        return future
+
+    async def run(self, fn: Callable[..., Any], *args: Any) -> Any:
+        return await asyncio.wrap_future(self.submit(fn, *args))
+
+    async def map(self, fn: Callable[[Any], Any], items: Sequence[Any]) -> list:
+        """
+        Runs `fn` over `items` on all workers, keeping at most `max_workers` jobs of this call in flight
+        so bulk work never takes over the queue left for interactive requests.
+        """
+        results: list = [None] * len(items)
+        in_flight: dict[asyncio.Future, int] = {}
+        next_index = 0
+        while next_index < len(items) or in_flight:
+            while next_index < len(items) and len(in_flight) < self.max_workers:
+                try:
+                    future = asyncio.wrap_future(self.submit(fn, items[next_index]))
+                except HashingPoolSaturatedError:
+                    if not in_flight:
+                        raise
+                    break
+                in_flight[future] = next_index
+                next_index += 1
+            done, _ = await asyncio.wait(in_flight, return_when=asyncio.FIRST_COMPLETED)
+            for future in done:
+                results[in_flight.pop(future)] = future.result()
+        return results
+
+    def shutdown(self) -> None:
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=True)
+
+
+hashing_executor = HashingExecutor()
+
+
+@lru_cache
+def dummy_password_hash() -> str:
+    """Hash of a random password with the current profile, verified against when the user does not exist."""
+    return pwd_context.hash(secrets.token_urlsafe(32))
+
+
+def _verify_dummy(password: str) -> bool:
+    return pwd_context.verify(password, dummy_password_hash())
+
+
+# timed on the worker thread, so the histograms exclude the wait for a free worker
+_timed_hash = password_hashing_duration.time("hash")(pwd_context.hash)
+_timed_verify = password_hashing_duration.time("verify")(pwd_context.verify)
+_timed_verify_and_update = password_hashing_duration.time("verify")(pwd_context.verify_and_update)
+_timed_verify_dummy = password_hashing_duration.time("dummy_verify")(_verify_dummy)
+
+
+async def hash_password(password: str) -> str:
+    return await hashing_executor.run(_timed_hash, password)
+
+
+async def hash_passwords(passwords: Sequence[str]) -> list[str]:
+    return await hashing_executor.map(_timed_hash, passwords)
+
+
+async def verify_password(password: str, hashed_password: str) -> bool:
+    return await hashing_executor.run(_timed_verify, password, hashed_password)
+
+
+async def verify_and_update_password(password: str, hashed_password: str) -> tuple[bool, Optional[str]]:
+    """Verifies the password and, when the hash is outdated, also returns it rehashed with the current profile."""
+    return await hashing_executor.run(_timed_verify_and_update, password, hashed_password)
+
+
+async def verify_dummy_password(password: str) -> None:
+    """Spends the time of a real verification, for logins whose user does not exist."""
+    await hashing_executor.run(_timed_verify_dummy, password)
@@ -0,0 +1,69 @@
+from typing import Optional, Sequence
+
+from pydantic import BaseModel, Field
+
+from app.db import async_operations
+from app.db.connection import DBSession
+from app.db.schema import Role
+from app.settings import settings
+
+from .token import decode_access_token_claims
+
+INTROSPECTION_MAX_BATCH_SIZE = settings.INTROSPECTION_MAX_BATCH_SIZE
+
+
+class IntrospectionResponse(BaseModel):
+    """RFC 7662 introspection result: inactive tokens carry `active` only."""
+
+    active: bool
+    sub: Optional[str] = None
+    username: Optional[str] = None
+    uid: Optional[int] = None
+    role: Optional[Role] = None
+    exp: Optional[int] = None
+    jti: Optional[str] = None
+    token_type: Optional[str] = None
+
+
+class IntrospectionBatchRequest(BaseModel):
+    tokens: list[str] = Field(min_length=1, max_length=INTROSPECTION_MAX_BATCH_SIZE)
+
+
+class IntrospectionBatchResponse(BaseModel):
+    results: list[IntrospectionResponse]
+
+
+INACTIVE = IntrospectionResponse(active=False)
+
+
+async def introspect_tokens(session: DBSession, tokens: Sequence[str]) -> list[IntrospectionResponse]:
+    """
+    Introspects `tokens`, returning one result per token, in order.
+
+    Signatures, expiry and revocation are checked in memory with the cached verification keys; the owners
+    of all valid tokens are then loaded with a single query. A token is active only while its owner exists
+    and its `ver` claim, when present, matches the owner's current token version.
+    """
+    claims = [decode_access_token_claims(token=token) for token in tokens]
+    usernames = [token_claims["sub"] for token_claims in claims if token_claims]
+    users = await async_operations.get_users_by_usernames(session=session, usernames=usernames)
+
+    results = []
+    for token_claims in claims:
+        user = users.get(token_claims["sub"]) if token_claims else None
+        if user is None or token_claims.get("ver", user.token_version) != user.token_version:
+            results.append(INACTIVE)
+            continue
+        results.append(
+            IntrospectionResponse(
+                active=True,
+                sub=token_claims["sub"],
+                username=user.username,
+                uid=user.id,
+                role=user.role,
+                exp=int(token_claims["exp"]) if "exp" in token_claims else None,
+                jti=token_claims.get("jti"),
+                token_type="Bearer",
+            )
+        )
+    return results
@@ -0,0 +1,107 @@
+import base64
+import hashlib
+import json
+from dataclasses import dataclass
+from functools import lru_cache
+from pathlib import Path
+from typing import Optional, Sequence
+
+from jose import jwk
+from jose.backends.base import Key
+
+from app.settings import settings
+
+SYMMETRIC_ALGORITHMS = {"HS256", "HS384", "HS512"}
+# members of each key type that identify it, see RFC 7638
+THUMBPRINT_MEMBERS = {"EC": ("crv", "kty", "x", "y"), "RSA": ("e", "kty", "n"), "oct": ("k", "kty")}
+
+
+class UnknownKeyError(Exception):
+    default_message = "Unknown signing key"
+
+    def __init__(self, message=default_message):
+        self.message = message
+        super().__init__(self.message)
+
+
+def key_thumbprint(public_jwk: dict) -> str:
+    """RFC 7638 thumbprint, used as the `kid` so it is derived from the key and stable across restarts."""
+    members = {name: public_jwk[name] for name in THUMBPRINT_MEMBERS[public_jwk["kty"]]}
+    digest = hashlib.sha256(json.dumps(members, separators=(",", ":"), sort_keys=True).encode()).digest()
+    return base64.urlsafe_b64encode(digest).rstrip(b"=").decode()
+
+
+@dataclass(frozen=True)
+class VerificationKey:
+    kid: str
+    algorithm: str
+    key: Key
+
+    @property
+    def is_public(self) -> bool:
+        return self.algorithm not in SYMMETRIC_ALGORITHMS
+
+
+class KeyRing:
+    """
+    Pre-parsed signing key plus every key still accepted for verification, indexed by `kid`.
+
+    jose re-parses a raw PEM or secret on every call; constructing the key objects once keeps that
+    out of the token hot path. Rotating means signing with a new key while the previous public
+    keys stay listed here (and in the JWKS) until the tokens they signed have expired.
+    """
+
+    def __init__(self, algorithm: str, signing_key: Key, verification_keys: Sequence[VerificationKey] = ()):
+        self.algorithm = algorithm
+        self.signing_key = signing_key
+        public_key = signing_key if algorithm in SYMMETRIC_ALGORITHMS else signing_key.public_key()
+        self.signing_kid = key_thumbprint(public_key.to_dict())
+        self._keys = {self.signing_kid: VerificationKey(self.signing_kid, algorithm, public_key)}
+        for verification_key in verification_keys:
+            self._keys.setdefault(verification_key.kid, verification_key)
+
+    @classmethod
+    def from_pem(
+        cls, algorithm: str, private_key_pem: str, previous_public_key_pems: Sequence[tuple[str, str]] = ()
+    ) -> "KeyRing":
+        """`previous_public_key_pems` holds (algorithm, PEM) pairs of keys rotated out but still accepted."""
+        verification_keys = []
+        for previous_algorithm, public_key_pem in previous_public_key_pems:
+            public_key = jwk.construct(public_key_pem, previous_algorithm)
+            kid = key_thumbprint(public_key.to_dict())
+            verification_keys.append(VerificationKey(kid, previous_algorithm, public_key))
+        return cls(algorithm, jwk.construct(private_key_pem, algorithm), verification_keys)
+
+    def verification_key(self, kid: Optional[str]) -> VerificationKey:
+        """Tokens issued without a `kid` can only have been signed by the current key."""
+        if kid is None:
+            return self._keys[self.signing_kid]
+        try:
+            return self._keys[kid]
+        except KeyError:
+            raise UnknownKeyError()
+
+    def jwks(self) -> dict:
+        """Public keys only: shared secrets are never published."""
+        keys = []
+        for verification_key in self._keys.values():
+            if verification_key.is_public:
+                public_jwk = verification_key.key.to_dict()
+                keys.append(
+                    {**public_jwk, "kid": verification_key.kid, "use": "sig", "alg": verification_key.algorithm}
+                )
+        return {"keys": keys}
+
+
+def read_key_file(path: str) -> str:
+    return Path(path).read_text()
+
+
+@lru_cache
+def get_key_ring() -> KeyRing:
+    if settings.ALGORITHM in SYMMETRIC_ALGORITHMS:
+        return KeyRing(settings.ALGORITHM, jwk.construct(settings.SECRET_KEY, settings.ALGORITHM))
+    if not settings.JWT_PRIVATE_KEY_FILE:
+        raise ValueError(f"JWT_PRIVATE_KEY_FILE is required to sign tokens with {settings.ALGORITHM}")
+    previous_keys = [(settings.ALGORITHM, read_key_file(path)) for path in settings.JWT_PREVIOUS_PUBLIC_KEY_FILES]
+    return KeyRing.from_pem(settings.ALGORITHM, read_key_file(settings.JWT_PRIVATE_KEY_FILE), previous_keys)
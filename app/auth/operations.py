@@ -1,22 +1,88 @@
 from typing import Optional
 
-from email_validator import EmailNotValidError, validate_email
 from sqlalchemy.orm import Session
 
+from app.db import async_operations
+from app.db.connection import DBSession
+from app.db.operations import get_user, update_password_hash
 from app.db.schema import User as db_User
-from app.settings import pwd_context
+from app.settings import pwd_context, settings
 
+from .hashing import (
+    dummy_password_hash,
+    verify_and_update_password,
+    verify_dummy_password,
+)
+from .rate_limit import RateLimitDecision
 
-def authenticate_user(session: Session, username_or_email: str, password: str) -> Optional[db_User]:
-    try:
-        validate_email(username_or_email)
-        query_filter = db_User.email
-    except EmailNotValidError:
-        query_filter = db_User.username
+UNKNOWN_USER_VERIFY_POLICY = settings.UNKNOWN_USER_VERIFY_POLICY
+UNKNOWN_USER_VERIFY_MIN_REMAINING = settings.UNKNOWN_USER_VERIFY_MIN_REMAINING
 
-    user: Optional[db_User] = session.query(db_User).filter(query_filter == username_or_email).first()
 
-    if not user or not pwd_context.verify(password, user.hashed_password):
+def should_verify_unknown_user(
+    decision: RateLimitDecision,
+    policy: str = UNKNOWN_USER_VERIFY_POLICY,
+    min_remaining: int = UNKNOWN_USER_VERIFY_MIN_REMAINING,
+) -> bool:
+    """
+    Whether a login for an unknown user should still pay for a password verification.
+
+    Under "unless_throttled", the dummy verification is skipped for callers about to hit their rate limit,
+    who are most likely guessing, to save CPU. Their remaining attempts then answer measurably faster for
+    unknown users, so each of them reveals whether an account exists; the default "always" does not.
+    """
+    if policy == "always":
+        return True
+    if policy == "never":
+        return False
+    return decision.remaining >= min_remaining
+
+
+def authenticate_user(
+    session: Session, username_or_email: str, password: str, verify_unknown: bool = True
+) -> Optional[db_User]:
+    user: Optional[db_User] = get_user(session=session, username_or_email=username_or_email)
+    if not user:
+        if verify_unknown:
+            pwd_context.verify(password, dummy_password_hash())
+        return
+
+    is_valid, new_hashed_password = pwd_context.verify_and_update(password, user.hashed_password)
+    if not is_valid:
+        return
+    if new_hashed_password:
+        # the hash predates the current hashing profile: upgrade it while the plain password is at hand
+        update_password_hash(session=session, user=user, hashed_password=new_hashed_password)
+
+    return user
+
+
+async def authenticate_user_async(
+    session: DBSession, username_or_email: str, password: str, verify_unknown: bool = True
+) -> Optional[db_User]:
+    """
+    Same as `authenticate_user`, but the password is verified on the dedicated hashing executor,
+    so the caller never holds a Starlette threadpool thread for the duration of a bcrypt verify.
+    """
+    user: Optional[db_User] = await async_operations.get_user(session=session, username_or_email=username_or_email)
+    return await verify_user_password_async(
+        session=session, user=user, password=password, verify_unknown=verify_unknown
+    )
+
+
+async def verify_user_password_async(
+    session: DBSession, user: Optional[db_User], password: str, verify_unknown: bool = True
+) -> Optional[db_User]:
+    """Second half of `authenticate_user_async`, for a user already looked up (None when unknown)."""
+    if not user:
+        if verify_unknown:
+            await verify_dummy_password(password)
+        return
+
+    is_valid, new_hashed_password = await verify_and_update_password(password, user.hashed_password)
+    if not is_valid:
         return
+    if new_hashed_password:
+        await async_operations.update_password_hash(session=session, user=user, hashed_password=new_hashed_password)
 
     return user
@@ -0,0 +1,240 @@
+import math
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Callable, Optional
+
+from sqlalchemy import delete, select
+from sqlalchemy.orm import Session
+
+from app.db.connection import DBSession, run_db
+from app.db.operations import insert_or_ignore, normalize_identity
+from app.db.schema import RateLimitWindow
+from app.settings import settings
+
+LOGIN_RATE_LIMIT_WINDOW_SECONDS = settings.LOGIN_RATE_LIMIT_WINDOW_SECONDS
+LOGIN_RATE_LIMIT_PER_USERNAME = settings.LOGIN_RATE_LIMIT_PER_USERNAME
+LOGIN_RATE_LIMIT_PER_IP = settings.LOGIN_RATE_LIMIT_PER_IP
+LOGIN_RATE_LIMIT_MAX_KEYS = settings.LOGIN_RATE_LIMIT_MAX_KEYS
+
+
+@dataclass(frozen=True, slots=True)
+class RateLimitDecision:
+    allowed: bool
+    retry_after: int = 0
+    # attempts left in the window, after this one
+    remaining: float = math.inf
+
+
+ALLOWED = RateLimitDecision(allowed=True)
+
+
+class SlidingWindow:
+    """
+    Sliding window counter approximated from two fixed windows, so each key costs three numbers.
+
+    The count over the last `window_seconds` is estimated as the current window's count plus the previous
+    window's count weighted by how much of it still overlaps the sliding window.
+    """
+
+    __slots__ = ("window_start", "previous_count", "current_count")
+
+    def __init__(self, window_start: float = 0.0, previous_count: int = 0, current_count: int = 0):
+        self.window_start = window_start
+        self.previous_count = previous_count
+        self.current_count = current_count
+
+    def advance(self, now: float, window_seconds: float) -> None:
+        window_start = now - now % window_seconds
+        if window_start == self.window_start:
+            return
+        adjacent = math.isclose(window_start - self.window_start, window_seconds)
+        self.previous_count = self.current_count if adjacent else 0
+        self.current_count = 0
+        self.window_start = window_start
+
+    def estimate(self, now: float, window_seconds: float) -> float:
+        overlap = 1 - (now - self.window_start) / window_seconds
+        return self.previous_count * overlap + self.current_count
+
+    def retry_after(self, now: float, window_seconds: float, limit: int) -> int:
+        """Whole seconds until the estimate is below `limit`, assuming no further hits."""
+        elapsed = now - self.window_start
+        if self.current_count < limit:
+            # the previous window's weight decays until previous * (1 - t / window) < limit - current
+            wait = window_seconds * (1 - (limit - self.current_count) / self.previous_count) - elapsed
+        else:
+            # the current window becomes the previous one, then decays until current * (1 - t / window) < limit
+            wait = window_seconds - elapsed + window_seconds * (1 - limit / self.current_count)
+        return max(1, math.floor(wait) + 1)
+
+    def hit(self, now: float, window_seconds: float, limit: int) -> RateLimitDecision:
+        """Counts one attempt, unless the limit has been reached."""
+        self.advance(now, window_seconds)
+        estimate = self.estimate(now, window_seconds)
+        if estimate >= limit:
+            return RateLimitDecision(
+                allowed=False, retry_after=self.retry_after(now, window_seconds, limit), remaining=0
+            )
+        self.current_count += 1
+        return RateLimitDecision(allowed=True, remaining=max(0.0, limit - estimate - 1))
+
+
+class MemoryRateLimitStore:
+    """Per-process windows in a bounded LRU: the least recently used keys are dropped past `max_keys`."""
+
+    def __init__(self, max_keys: int = LOGIN_RATE_LIMIT_MAX_KEYS, clock: Callable[[], float] = time.time):
+        self.max_keys = max_keys
+        self._clock = clock
+        self._windows: OrderedDict[str, SlidingWindow] = OrderedDict()
+        self._lock = threading.Lock()
+        self.evictions = 0
+
+    def __len__(self) -> int:
+        return len(self._windows)
+
+    def hit(self, key: str, limit: int, window_seconds: float) -> RateLimitDecision:
+        with self._lock:
+            window = self._windows.get(key)
+            if window is None:
+                window = self._windows[key] = SlidingWindow()
+                while len(self._windows) > self.max_keys:
+                    self._windows.popitem(last=False)
+                    self.evictions += 1
+            else:
+                self._windows.move_to_end(key)
+            return window.hit(self._clock(), window_seconds, limit)
+
+    def reset(self, key: str) -> None:
+        with self._lock:
+            self._windows.pop(key, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._windows.clear()
+
+
+class DatabaseRateLimitStore:
+    """
+    Windows kept in the `RateLimitWindow` table, so limits hold across all workers.
+
+    Each hit is a read-modify-write of one row by primary key, in one transaction. The row is created
+    with INSERT ... ON CONFLICT DO NOTHING, then read with SELECT ... FOR UPDATE, so concurrent hits on
+    the same key are serialized and all counted: on PostgreSQL by the row lock, on SQLite by the write
+    lock the insert takes. Rows idle for two windows are pruned every `prune_every` hits.
+    """
+
+    def __init__(self, clock: Callable[[], float] = time.time, prune_every: int = 1000):
+        self._clock = clock
+        self.prune_every = prune_every
+        self._hits = 0
+
+    def hit(self, session: Session, key: str, limit: int, window_seconds: float) -> RateLimitDecision:
+        now = self._clock()
+        insert_or_ignore(
+            session, RateLimitWindow, {"key": key, "window_start": 0.0, "previous_count": 0, "current_count": 0}
+        )
+        statement = select(RateLimitWindow).where(RateLimitWindow.key == key).with_for_update()
+        row = session.scalars(statement.execution_options(populate_existing=True)).one()
+        window = SlidingWindow(row.window_start, row.previous_count, row.current_count)
+        decision = window.hit(now, window_seconds, limit)
+        row.window_start, row.previous_count, row.current_count = (
+            window.window_start,
+            window.previous_count,
+            window.current_count,
+        )
+        self._hits += 1
+        if self._hits % self.prune_every == 0:
+            session.execute(delete(RateLimitWindow).where(RateLimitWindow.window_start < now - 2 * window_seconds))
+        session.commit()
+        return decision
+
+    def reset(self, session: Session, key: str) -> None:
+        session.execute(delete(RateLimitWindow).where(RateLimitWindow.key == key))
+        session.commit()
+
+
+def account_key(username: str, user_id: Optional[int] = None) -> str:
+    """
+    Key of the per-account limit: the id of the account when the login names an existing one, by username
+    or by email, so both share one limit; otherwise the normalized identifier.
+    """
+    if user_id is not None:
+        return f"user:{user_id}"
+    return f"username:{normalize_identity(username)}"
+
+
+class LoginRateLimiter:
+    """
+    Throttles password logins by client IP and by account before any password is verified.
+
+    Every attempt is counted, so a burst of concurrent attempts cannot slip past the limit, and a
+    successful login resets its account's window, see `account_key`. The IP is the ASGI client address: run uvicorn
+    with `--proxy-headers` behind a reverse proxy.
+    """
+
+    def __init__(
+        self,
+        store,
+        per_username: int = LOGIN_RATE_LIMIT_PER_USERNAME,
+        per_ip: int = LOGIN_RATE_LIMIT_PER_IP,
+        window_seconds: float = LOGIN_RATE_LIMIT_WINDOW_SECONDS,
+        enabled: bool = True,
+    ):
+        self.store = store
+        self.per_username = per_username
+        self.per_ip = per_ip
+        self.window_seconds = window_seconds
+        self.enabled = enabled
+
+    @property
+    def is_shared(self) -> bool:
+        return isinstance(self.store, DatabaseRateLimitStore)
+
+    async def _hit(self, session: DBSession, key: str, limit: int) -> RateLimitDecision:
+        if self.is_shared:
+            return await run_db(session, self.store.hit, key=key, limit=limit, window_seconds=self.window_seconds)
+        return self.store.hit(key, limit, self.window_seconds)
+
+    async def check(
+        self, session: DBSession, username: str, ip: Optional[str], user_id: Optional[int] = None
+    ) -> RateLimitDecision:
+        """Counts the attempt against each key; the decision reports the smallest number of attempts left."""
+        if not self.enabled:
+            return ALLOWED
+        limits = [(account_key(username, user_id), self.per_username)]
+        if ip:
+            limits.insert(0, (f"ip:{ip}", self.per_ip))
+        decision = ALLOWED
+        for key, limit in limits:
+            key_decision = await self._hit(session, key, limit)
+            if not key_decision.allowed:
+                return key_decision
+            if key_decision.remaining < decision.remaining:
+                decision = key_decision
+        return decision
+
+    async def reset(self, session: DBSession, username: str, user_id: Optional[int] = None) -> None:
+        if not self.enabled:
+            return
+        key = account_key(username, user_id)
+        if self.is_shared:
+            await run_db(session, self.store.reset, key=key)
+        else:
+            self.store.reset(key)
+
+    def clear(self) -> None:
+        if not self.is_shared:
+            self.store.clear()
+
+
+def build_login_rate_limiter() -> LoginRateLimiter:
+    if settings.LOGIN_RATE_LIMIT_BACKEND == "database":
+        store = DatabaseRateLimitStore()
+    else:
+        store = MemoryRateLimitStore()
+    return LoginRateLimiter(store, enabled=settings.LOGIN_RATE_LIMIT_ENABLED)
+
+
+login_rate_limiter = build_login_rate_limiter()
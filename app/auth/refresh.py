@@ -0,0 +1,131 @@
+import hashlib
+import secrets
+import uuid
+from datetime import UTC, datetime, timedelta
+from typing import Optional
+
+from sqlalchemy import delete, select, update
+from sqlalchemy.orm import Session
+
+from app.db.schema import RefreshToken
+from app.db.schema import User as db_User
+from app.settings import settings
+
+REFRESH_TOKEN_EXPIRE_DAYS = settings.REFRESH_TOKEN_EXPIRE_DAYS
+
+
+class InvalidRefreshTokenError(Exception):
+    default_message = "Invalid refresh token"
+
+    def __init__(self, message=default_message):
+        self.message = message
+        super().__init__(self.message)
+
+
+class RefreshTokenReuseError(InvalidRefreshTokenError):
+    default_message = "Refresh token reused, all tokens issued from this login were revoked"
+
+    def __init__(self, message=default_message):
+        super().__init__(message)
+
+
+def utcnow() -> datetime:
+    # stored without a timezone, SQLite would drop it anyway
+    return datetime.now(tz=UTC).replace(tzinfo=None)
+
+
+def hash_refresh_token(token: str) -> str:
+    """
+    Refresh tokens are 256 random bits, so a single SHA-256 is enough to make a leaked table useless,
+    and it is cheap enough to look the token up by its hash.
+    """
+    return hashlib.sha256(token.encode()).hexdigest()
+
+
+def add_refresh_token(
+    session: Session, user_id: int, family_id: Optional[str] = None, expire_days: int = REFRESH_TOKEN_EXPIRE_DAYS
+) -> str:
+    """Adds a new refresh token to the session, without committing, and returns the token itself."""
+    token = secrets.token_urlsafe(32)
+    session.add(
+        RefreshToken(
+            token_hash=hash_refresh_token(token),
+            user_id=user_id,
+            family_id=family_id or uuid.uuid4().hex,
+            expires_at=utcnow() + timedelta(days=expire_days),
+        )
+    )
+    return token
+
+
+def issue_refresh_token(session: Session, user_id: int, expire_days: int = REFRESH_TOKEN_EXPIRE_DAYS) -> str:
+    """Starts a new token family, one per password login."""
+    token = add_refresh_token(session, user_id=user_id, expire_days=expire_days)
+    session.commit()
+    return token
+
+
+def revoke_refresh_token_family(session: Session, family_id: str) -> None:
+    session.execute(update(RefreshToken).where(RefreshToken.family_id == family_id).values(revoked=True))
+    session.commit()
+
+
+def revoke_refresh_token(session: Session, token: str) -> None:
+    """Revokes every token issued from the same login as `token`, unknown tokens are ignored."""
+    statement = select(RefreshToken.family_id).where(RefreshToken.token_hash == hash_refresh_token(token))
+    family_id = session.scalars(statement).first()
+    if family_id is not None:
+        revoke_refresh_token_family(session, family_id)
+
+
+def prune_refresh_tokens(session: Session) -> int:
+    """
+    Deletes the expired refresh tokens, used and revoked ones included, and returns how many were deleted.
+
+    An expired token is rejected whether or not its row exists, so deleting it changes no outcome.
+    """
+    result = session.execute(delete(RefreshToken).where(RefreshToken.expires_at <= utcnow()))
+    session.commit()
+    return result.rowcount
+
+
+def rotate_refresh_token(
+    session: Session, token: str, expire_days: int = REFRESH_TOKEN_EXPIRE_DAYS
+) -> tuple[db_User, str]:
+    """
+    Exchanges a refresh token for its owner and the next token of the same family.
+
+    The token and its owner are loaded with one indexed lookup. The token is then marked as used with a
+    conditional UPDATE, so of two concurrent requests presenting the same token only one can succeed;
+    presenting an already used token revokes the whole family.
+    """
+    now = utcnow()
+    statement = (
+        select(RefreshToken, db_User)
+        .join(db_User, RefreshToken.user_id == db_User.id)
+        .where(RefreshToken.token_hash == hash_refresh_token(token))
+    )
+    row = session.execute(statement).first()
+    if row is None:
+        raise InvalidRefreshTokenError()
+    refresh_token, user = row
+    if refresh_token.revoked or refresh_token.expires_at <= now:
+        raise InvalidRefreshTokenError()
+    if refresh_token.used_at is not None:
+        revoke_refresh_token_family(session, refresh_token.family_id)
+        raise RefreshTokenReuseError()
+
+    result = session.execute(
+        update(RefreshToken)
+        .where(RefreshToken.id == refresh_token.id, RefreshToken.used_at.is_(None))
+        .values(used_at=now)
+        .execution_options(synchronize_session=False)
+    )
+    if result.rowcount != 1:
+        session.rollback()
+        revoke_refresh_token_family(session, refresh_token.family_id)
+        raise RefreshTokenReuseError()
+
+    next_token = add_refresh_token(session, user_id=user.id, family_id=refresh_token.family_id, expire_days=expire_days)
+    session.commit()
+    return user, next_token
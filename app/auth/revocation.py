@@ -0,0 +1,120 @@
+import heapq
+import threading
+import time
+from datetime import UTC, datetime
+
+from sqlalchemy import delete, select
+from sqlalchemy.orm import Session
+
+from app.db.changes import ChangeCursor
+from app.db.operations import insert_or_ignore
+from app.db.schema import RevokedToken
+
+from .cache import principal_cache
+from .refresh import utcnow
+
+
+def to_datetime(timestamp: float) -> datetime:
+    return datetime.fromtimestamp(timestamp, tz=UTC).replace(tzinfo=None)
+
+
+def to_timestamp(value: datetime) -> float:
+    return value.replace(tzinfo=UTC).timestamp()
+
+
+class RevocationList:
+    """
+    In-process set of revoked token ids, checked on every token decode without touching the database.
+
+    Only tokens that are revoked *and* not yet expired are kept, so the set stays small; a heap ordered
+    by expiry lets `prune` drop entries as their tokens expire. Lookups take no lock. The `RevokedToken`
+    table is the source of truth, and `cursor` records how far it has been synced.
+    """
+
+    def __init__(self, clock=time.time):
+        self._clock = clock
+        self._expiry: dict[str, float] = {}
+        self._heap: list[tuple[float, str]] = []
+        self._lock = threading.Lock()
+        self.cursor = ChangeCursor()
+
+    def __len__(self) -> int:
+        return len(self._expiry)
+
+    def add(self, jti: str, expires_at: float) -> bool:
+        """Adds a revoked token id, returns False if it was already known or has already expired."""
+        if expires_at <= self._clock():
+            return False
+        with self._lock:
+            if jti in self._expiry:
+                return False
+            self._expiry[jti] = expires_at
+            heapq.heappush(self._heap, (expires_at, jti))
+        return True
+
+    def is_revoked(self, jti: str) -> bool:
+        return jti in self._expiry
+
+    def prune(self) -> int:
+        now = self._clock()
+        pruned = 0
+        with self._lock:
+            while self._heap and self._heap[0][0] <= now:
+                _, jti = heapq.heappop(self._heap)
+                self._expiry.pop(jti, None)
+                pruned += 1
+        return pruned
+
+    def clear(self) -> None:
+        with self._lock:
+            self._expiry.clear()
+            self._heap.clear()
+            self.cursor.reset()
+
+    def stats(self) -> dict:
+        return {"size": len(self._expiry), "watermark": self.cursor.watermark, "gaps": len(self.cursor.gaps)}
+
+
+revocation_list = RevocationList()
+
+
+def remember_revocation(jti: str, expires_at: float) -> bool:
+    if not revocation_list.add(jti, expires_at):
+        return False
+    principal_cache.invalidate_token_id(jti)
+    return True
+
+
+def revoke_token(session: Session, jti: str, expires_at: float) -> None:
+    """
+    Persists the revocation, then applies it to this process right away.
+
+    Revoking a token again, for instance through a worker that has not synced the first revocation yet,
+    is a no-op.
+    """
+    insert_or_ignore(session, RevokedToken, {"jti": jti, "expires_at": to_datetime(expires_at), "revoked_at": utcnow()})
+    session.commit()
+    remember_revocation(jti, expires_at)
+
+
+def sync_revocations(session: Session) -> int:
+    """
+    Pulls the revocations recorded since the last sync and prunes expired entries, in memory and in the table.
+
+    The first call loads every revocation that has not expired yet, later ones only the rows not read yet,
+    by id. Returns the number of new revocations.
+    """
+    now = utcnow()
+    session.execute(delete(RevokedToken).where(RevokedToken.expires_at <= now))
+    statement = select(RevokedToken.id, RevokedToken.jti, RevokedToken.expires_at).where(
+        revocation_list.cursor.unread(RevokedToken.id), RevokedToken.expires_at > now
+    )
+    revocations = session.execute(statement.order_by(RevokedToken.id)).all()
+    session.commit()
+    added = 0
+    for _, jti, expires_at in revocations:
+        if remember_revocation(jti, to_timestamp(expires_at)):
+            added += 1
+    revocation_list.cursor.advance(revocation_id for revocation_id, _, _ in revocations)
+    revocation_list.prune()
+    return added
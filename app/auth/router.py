@@ -1,28 +1,133 @@
 from typing import Optional
 
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, Form, HTTPException, Request, status
 from fastapi.security import OAuth2PasswordRequestForm
-from sqlalchemy.orm import Session
 
-from app.db.connection import get_session
+from app.db import async_operations
+from app.db.connection import DBSession, get_db_session, run_db
 from app.db.schema import User as db_User
+from app.metrics import login_attempts, token_refreshes
+from app.settings import oauth2_scheme
+from app.users.permissions import authenticated_staff_or_admin_user
+from app.users.principal import Principal
 
-from .operations import authenticate_user
-from .token import Token, create_access_token
+from .introspection import (
+    IntrospectionBatchRequest,
+    IntrospectionBatchResponse,
+    IntrospectionResponse,
+    introspect_tokens,
+)
+from .keys import get_key_ring
+from .operations import should_verify_unknown_user, verify_user_password_async
+from .rate_limit import login_rate_limiter
+from .refresh import (
+    InvalidRefreshTokenError,
+    RefreshTokenReuseError,
+    issue_refresh_token,
+    revoke_refresh_token,
+    rotate_refresh_token,
+)
+from .revocation import revoke_token
+from .token import Token, create_access_token, decode_access_token_claims
 
 router = APIRouter()
 
 
 @router.post("/auth/token/")
-def get_access_token(
-    form_data: OAuth2PasswordRequestForm = Depends(), session: Session = Depends(get_session)
+async def get_access_token(
+    request: Request,
+    form_data: OAuth2PasswordRequestForm = Depends(),
+    session: DBSession = Depends(get_db_session),
 ) -> Token:
-    user: Optional[db_User] = authenticate_user(
-        session=session, username_or_email=form_data.username, password=form_data.password
+    client_ip = request.client.host if request.client else None
+    # resolved first, so that attempts naming the same account by username or by email share one limit
+    user: Optional[db_User] = await async_operations.get_user(session=session, username_or_email=form_data.username)
+    decision = await login_rate_limiter.check(
+        session=session, username=form_data.username, ip=client_ip, user_id=user.id if user else None
+    )
+    if not decision.allowed:
+        login_attempts.inc("throttled")
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail="Too many login attempts, please retry later",
+            headers={"Retry-After": str(decision.retry_after)},
+        )
+
+    user = await verify_user_password_async(
+        session=session,
+        user=user,
+        password=form_data.password,
+        verify_unknown=should_verify_unknown_user(decision),
     )
     if not user:
+        login_attempts.inc("failure")
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Incorrect username or password")
 
+    login_attempts.inc("success")
+    await login_rate_limiter.reset(session=session, username=form_data.username, user_id=user.id)
     token_creation_data = {"sub": user.username}
-    access_token: str = create_access_token(data=token_creation_data)
-    return Token(access_token=access_token)
+    access_token: str = create_access_token(data=token_creation_data, user=user)
+    refresh_token: str = await run_db(session, issue_refresh_token, user_id=user.id)
+    return Token(access_token=access_token, refresh_token=refresh_token)
+
+
+@router.post("/auth/token/refresh/")
+async def refresh_access_token(refresh_token: str = Form(), session: DBSession = Depends(get_db_session)) -> Token:
+    """Exchanges a refresh token for a new access token and the next refresh token, without a password check."""
+    try:
+        user, next_refresh_token = await run_db(session, rotate_refresh_token, token=refresh_token)
+    except RefreshTokenReuseError as exc:
+        token_refreshes.inc("reused")
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail=exc.message)
+    except InvalidRefreshTokenError as exc:
+        token_refreshes.inc("invalid")
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail=exc.message)
+
+    token_refreshes.inc("success")
+    access_token: str = create_access_token(data={"sub": user.username}, user=user)
+    return Token(access_token=access_token, refresh_token=next_refresh_token)
+
+
+@router.post("/auth/token/revoke/", status_code=status.HTTP_204_NO_CONTENT)
+async def revoke_access_token(
+    token: str = Depends(oauth2_scheme),
+    refresh_token: Optional[str] = Form(default=None),
+    session: DBSession = Depends(get_db_session),
+) -> None:
+    """Logs out: revokes the bearer access token and, when given, every refresh token of the same login."""
+    claims = decode_access_token_claims(token=token)
+    if not claims:
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Unauthorized access")
+    if not claims.get("jti"):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Token cannot be revoked")
+    await run_db(session, revoke_token, jti=claims["jti"], expires_at=float(claims["exp"]))
+    if refresh_token:
+        await run_db(session, revoke_refresh_token, token=refresh_token)
+
+
+@router.get("/.well-known/jwks.json")
+async def get_jwks() -> dict:
+    """Public keys verifying access tokens, so other services can validate them without calling this app."""
+    return get_key_ring().jwks()
+
+
+@router.post("/auth/introspect/", response_model_exclude_none=True)
+async def introspect_token(
+    token: str = Form(),
+    session: DBSession = Depends(get_db_session),
+    auth_user: Principal = Depends(authenticated_staff_or_admin_user),
+) -> IntrospectionResponse:
+    """RFC 7662 token introspection, for gateways validating tokens on behalf of other services."""
+    [result] = await introspect_tokens(session=session, tokens=[token])
+    return result
+
+
+@router.post("/auth/introspect/batch/", response_model_exclude_none=True)
+async def introspect_token_batch(
+    introspection_request: IntrospectionBatchRequest,
+    session: DBSession = Depends(get_db_session),
+    auth_user: Principal = Depends(authenticated_staff_or_admin_user),
+) -> IntrospectionBatchResponse:
+    """Introspects up to INTROSPECTION_MAX_BATCH_SIZE tokens with a single user query."""
+    results = await introspect_tokens(session=session, tokens=introspection_request.tokens)
+    return IntrospectionBatchResponse(results=results)
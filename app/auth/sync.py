@@ -0,0 +1,49 @@
+import asyncio
+import logging
+
+from sqlalchemy.orm import Session
+
+from app.db.connection import SessionLocal, get_async_sessionmaker, run_db
+from app.settings import settings
+
+from .refresh import prune_refresh_tokens
+from .revocation import sync_revocations
+from .token_versions import sync_token_versions
+
+AUTH_SYNC_INTERVAL_SECONDS = settings.REVOCATION_SYNC_INTERVAL_SECONDS
+
+logger = logging.getLogger(__name__)
+
+
+def sync_auth_state(session: Session) -> dict:
+    """
+    Pulls the token revocations and token version changes made by other workers since the last sync,
+    and deletes the refresh tokens that have expired.
+    """
+    return {
+        "revocations": sync_revocations(session),
+        "token_version_changes": sync_token_versions(session),
+        "expired_refresh_tokens": prune_refresh_tokens(session),
+    }
+
+
+async def sync_auth_state_once() -> dict:
+    if settings.ASYNC_DB:
+        async with get_async_sessionmaker()() as session:
+            return await run_db(session, sync_auth_state)
+    with SessionLocal() as session:
+        return await run_db(session, sync_auth_state)
+
+
+async def auth_sync_loop(interval: float = AUTH_SYNC_INTERVAL_SECONDS) -> None:
+    """
+    Keeps this worker in step with the other workers, every `interval` seconds.
+
+    The first sync is expected to have run on startup, before requests are served.
+    """
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            await sync_auth_state_once()
+        except Exception:
+            logger.exception("Auth state sync failed")
@@ -1,22 +1,32 @@
+import uuid
 from datetime import UTC, datetime, timedelta
 from typing import Optional
 
 from jose import JWTError, jwt
+from jose.exceptions import ExpiredSignatureError, JWTClaimsError
 from pydantic import BaseModel
 from sqlalchemy.orm import Session
 
-from app.db.operations import get_user
+from app.db.operations import get_principal_row, get_user
+from app.db.schema import Role
 from app.db.schema import User as db_User
+from app.metrics import token_decode_failures
 from app.settings import settings
+from app.users.principal import Principal
+
+from .cache import principal_cache
+from .keys import UnknownKeyError, get_key_ring
+from .revocation import revocation_list
+from .token_versions import token_versions
 
 ACCESS_TOKEN_EXPIRE_MINUTES = settings.ACCESS_TOKEN_EXPIRE_MINUTES
 ALGORITHM = settings.ALGORITHM
-SECRET_KEY = settings.SECRET_KEY
 
 
 class Token(BaseModel):
     access_token: str
     token_type: str = "Bearer"
+    refresh_token: Optional[str] = None
 
 
 class InvalidTokenError(Exception):
@@ -37,28 +47,126 @@ class TokenExpiredError(Exception):
 
 def create_access_token(
     data: dict,
-    secret_key: str = SECRET_KEY,
+    secret_key: Optional[str] = None,
     algorithm: str = ALGORITHM,
     token_expire_minutes: int = ACCESS_TOKEN_EXPIRE_MINUTES,
+    user: Optional[db_User] = None,
 ) -> str:
     to_encode = data.copy()
+    if user is not None:
+        # lets stateless verification build a principal without a DB round trip
+        to_encode.update({"uid": user.id, "role": Role(user.role).value, "ver": user.token_version or 0})
+    if "jti" not in to_encode:
+        # identifies the token for revocation
+        to_encode["jti"] = uuid.uuid4().hex
     if "exp" not in to_encode:
         token_expiration_time = datetime.now(tz=UTC) + timedelta(minutes=token_expire_minutes)
         expire = datetime.timestamp(token_expiration_time)
         to_encode.update({"exp": expire})
-    encoded_jwt = jwt.encode(to_encode, secret_key, algorithm=algorithm)
+    if secret_key is not None:
+        return jwt.encode(to_encode, secret_key, algorithm=algorithm)
+    key_ring = get_key_ring()
+    encoded_jwt = jwt.encode(
+        to_encode, key_ring.signing_key, algorithm=key_ring.algorithm, headers={"kid": key_ring.signing_kid}
+    )
     return encoded_jwt
 
 
+def decode_failure_reason(error: JWTError) -> str:
+    if isinstance(error, ExpiredSignatureError):
+        return "expired"
+    if isinstance(error, JWTClaimsError):
+        return "invalid_claims"
+    if "Signature verification failed" in str(error):
+        return "invalid_signature"
+    return "malformed"
+
+
+def decode_access_token_claims(
+    token: str, secret_key: Optional[str] = None, algorithms: str = ALGORITHM
+) -> Optional[dict]:
+    """
+    Verifies the token and returns its claims, or None when it is not valid.
+
+    Without an explicit `secret_key`, the token is verified with the key ring entry named by its `kid` header.
+    """
+    try:
+        if secret_key is None:
+            verification_key = get_key_ring().verification_key(jwt.get_unverified_header(token).get("kid"))
+            payload = jwt.decode(token, verification_key.key, algorithms=[verification_key.algorithm])
+        else:
+            payload = jwt.decode(token, secret_key, algorithms=algorithms)
+    except UnknownKeyError:
+        token_decode_failures.inc("unknown_key")
+        return
+    except JWTError as error:
+        token_decode_failures.inc(decode_failure_reason(error))
+        return
+    if not payload.get("sub"):
+        token_decode_failures.inc("missing_subject")
+        return
+    jti = payload.get("jti")
+    if jti and revocation_list.is_revoked(jti):
+        token_decode_failures.inc("revoked")
+        return
+    return payload
+
+
 def decode_access_token(
-    token: str, session: Session, secret_key: str = SECRET_KEY, algorithms: str = ALGORITHM
+    token: str, session: Session, secret_key: Optional[str] = None, algorithms: str = ALGORITHM
 ) -> Optional[db_User]:
+    payload = decode_access_token_claims(token, secret_key=secret_key, algorithms=algorithms)
+    if not payload:
+        return
+    user: Optional[db_User] = get_user(session, payload["sub"])
+    return user
+
+
+def principal_from_claims(payload: dict) -> Optional[Principal]:
+    """
+    Builds a principal straight from verified token claims.
+
+    Returns None when the token does not carry the `uid`/`role`/`ver` claims, or when its version has been
+    superseded by a role change or delete; callers are then expected to fall back to a database lookup.
+    """
     try:
-        payload = jwt.decode(token, secret_key, algorithms=algorithms)
-        username: str = payload.get("sub")
-    except JWTError:
+        uid, role, version = int(payload["uid"]), Role(payload["role"]), int(payload["ver"])
+    except (KeyError, TypeError, ValueError):
         return
-    if not username:
+    if not token_versions.is_current(uid, version):
         return
-    user: Optional[db_User] = get_user(session, username)
-    return user
+    return Principal(id=uid, username=payload["sub"], role=role, token_version=version)
+
+
+def resolve_principal(
+    token: str, session: Session, secret_key: Optional[str] = None, algorithms: str = ALGORITHM
+) -> Optional[Principal]:
+    """
+    Resolves the token owner from the database, going through the principal cache when it is enabled.
+
+    A cache hit skips both the signature check and the user SELECT. Revocations and user changes drop
+    the entries they affect, including those of lookups still running when they happen.
+    """
+    generation = principal_cache.generation
+    if settings.PRINCIPAL_CACHE_ENABLED:
+        principal = principal_cache.get(token)
+        if principal:
+            return principal
+
+    payload = decode_access_token_claims(token, secret_key=secret_key, algorithms=algorithms)
+    if not payload:
+        return
+    row = get_principal_row(session, payload["sub"])
+    if not row:
+        return
+    principal = Principal.from_user(row)
+
+    if settings.PRINCIPAL_CACHE_ENABLED:
+        principal_cache.put(
+            token,
+            principal,
+            token_expires_at=payload.get("exp"),
+            token_id=payload.get("jti"),
+            generation=generation,
+        )
+    return principal
@@ -0,0 +1,96 @@
+import sys
+import threading
+import time
+from datetime import UTC, datetime, timedelta
+
+from sqlalchemy import delete, select
+from sqlalchemy.orm import Session
+
+from app.db.changes import ChangeCursor
+from app.db.schema import TokenVersionChange
+from app.settings import settings
+
+from .cache import principal_cache
+
+ACCESS_TOKEN_EXPIRE_MINUTES = settings.ACCESS_TOKEN_EXPIRE_MINUTES
+
+
+class TokenVersionRegistry:
+    """
+    In-process record of the lowest token version still accepted for each user.
+
+    Stateless principals are built from token claims without touching the database, so role
+    changes and deletes have to be propagated here. Users that are not registered accept any
+    version; deleted users accept none. Changes made by this worker apply right away; those made
+    by other workers, or before this one started, are replayed from the `TokenVersionChange` table
+    by `sync_token_versions`, so another worker can trust a stale token until its next sync. Once
+    every token issued before its last change has expired, a user's entry is dropped by `prune`.
+    """
+
+    def __init__(self, clock=time.time):
+        self._clock = clock
+        self._min_versions: dict[int, int] = {}
+        self._changed_at: dict[int, float] = {}
+        self._lock = threading.Lock()
+        self.cursor = ChangeCursor()
+
+    def __len__(self) -> int:
+        return len(self._min_versions)
+
+    def bump(self, uid: int, version: int) -> None:
+        with self._lock:
+            if version > self._min_versions.get(uid, 0):
+                self._min_versions[uid] = version
+                self._changed_at[uid] = self._clock()
+
+    def revoke_all(self, uid: int) -> None:
+        with self._lock:
+            self._min_versions[uid] = sys.maxsize
+            self._changed_at[uid] = self._clock()
+
+    def is_current(self, uid: int, version: int) -> bool:
+        return version >= self._min_versions.get(uid, 0)
+
+    def prune(self, max_age_seconds: float) -> int:
+        """Drops the entries last changed more than `max_age_seconds` ago, returns how many were dropped."""
+        cutoff = self._clock() - max_age_seconds
+        with self._lock:
+            stale = [uid for uid, changed_at in self._changed_at.items() if changed_at < cutoff]
+            for uid in stale:
+                del self._min_versions[uid]
+                del self._changed_at[uid]
+        return len(stale)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._min_versions.clear()
+            self._changed_at.clear()
+            self.cursor.reset()
+
+
+token_versions = TokenVersionRegistry()
+
+
+def sync_token_versions(session: Session, token_expire_minutes: int = ACCESS_TOKEN_EXPIRE_MINUTES) -> int:
+    """
+    Applies the token version changes recorded since the last sync, and drops the cached principals they affect.
+
+    Changes older than the access token lifetime are pruned first, from the table and from the registry: every
+    token issued before them has expired. Returns the number of changes applied.
+    """
+    cutoff = datetime.now(tz=UTC).replace(tzinfo=None) - timedelta(minutes=token_expire_minutes)
+    session.execute(delete(TokenVersionChange).where(TokenVersionChange.changed_at < cutoff))
+    statement = select(TokenVersionChange.id, TokenVersionChange.user_id, TokenVersionChange.min_version).where(
+        token_versions.cursor.unread(TokenVersionChange.id)
+    )
+    changes = session.execute(statement.order_by(TokenVersionChange.id)).all()
+    session.commit()
+    for _, uid, min_version in changes:
+        if min_version is None:
+            token_versions.revoke_all(uid)
+        else:
+            token_versions.bump(uid, min_version)
+        principal_cache.invalidate_user(uid)
+    token_versions.cursor.advance(change_id for change_id, _, _ in changes)
+    token_versions.prune(token_expire_minutes * 60)
+    return len(changes)
@@ -0,0 +1,117 @@
+from typing import AsyncIterator, Optional, Sequence, Type
+
+from sqlalchemy import Row
+from sqlalchemy.ext.asyncio import AsyncSession
+from starlette.concurrency import iterate_in_threadpool
+
+from app.auth.hashing import hash_password
+from app.settings import settings
+
+from . import operations
+from .connection import DBSession, run_db
+from .schema import Role
+from .schema import User as db_User
+
+
+async def add_user(
+    session: DBSession, username: str, email: str, password: str, role: Role = Role.basic
+) -> Optional[db_User]:
+    hashed_password = await hash_password(password)
+    return await create_user(
+        session=session, username=username, email=email, hashed_password=hashed_password, role=role
+    )
+
+
+async def create_user(
+    session: DBSession, username: str, email: str, hashed_password: str, role: Role = Role.basic
+) -> Optional[db_User]:
+    return await run_db(
+        session, operations.create_user, username=username, email=email, hashed_password=hashed_password, role=role
+    )
+
+
+async def find_existing_identities(
+    session: DBSession, usernames: Sequence[str], emails: Sequence[str]
+) -> tuple[set[str], set[str]]:
+    return await run_db(session, operations.find_existing_identities, usernames=usernames, emails=emails)
+
+
+async def insert_users(session: DBSession, rows: Sequence[dict]) -> list[int]:
+    return await run_db(session, operations.insert_users, rows=rows)
+
+
+async def get_user(session: DBSession, username_or_email: str) -> Optional[db_User]:
+    return await run_db(session, operations.get_user, username_or_email=username_or_email)
+
+
+async def get_users_by_usernames(session: DBSession, usernames: Sequence[str]) -> dict[str, Row]:
+    return await run_db(session, operations.get_users_by_usernames, usernames=usernames)
+
+
+async def update_password_hash(session: DBSession, user: db_User, hashed_password: str) -> None:
+    await run_db(session, operations.update_password_hash, user=user, hashed_password=hashed_password)
+
+
+async def get_all_users(session: DBSession) -> list[Type[db_User]]:
+    return await run_db(session, operations.get_all_users)
+
+
+async def get_users_page(
+    session: DBSession,
+    limit: Optional[int] = None,
+    after: Optional[int] = None,
+    role: Optional[Role] = None,
+    username_prefix: Optional[str] = None,
+) -> Sequence[db_User]:
+    return await run_db(
+        session, operations.get_users_page, limit=limit, after=after, role=role, username_prefix=username_prefix
+    )
+
+
+async def stream_user_row_batches(
+    session: DBSession,
+    role: Optional[Role] = None,
+    username_prefix: Optional[str] = None,
+    batch_size: int = settings.USER_STREAM_BATCH_SIZE,
+) -> AsyncIterator[Sequence[Row]]:
+    if isinstance(session, AsyncSession):
+        statement = operations.user_rows_statement(role=role, username_prefix=username_prefix)
+        result = await session.stream(statement.execution_options(yield_per=batch_size))
+        async for batch in result.partitions():
+            yield batch
+        return
+
+    batches = operations.iter_user_row_batches(
+        session=session, role=role, username_prefix=username_prefix, batch_size=batch_size
+    )
+    async for batch in iterate_in_threadpool(batches):
+        yield batch
+
+
+async def get_user_by_id(uid: int, session: DBSession) -> Optional[db_User]:
+    return await run_db(session, operations.get_user_by_id, uid=uid)
+
+
+async def update_user_data(uid: int, update_data: dict, session: DBSession) -> db_User:
+    return await run_db(session, operations.update_user_data, uid=uid, update_data=update_data)
+
+
+async def delete_user_data(uid: int, session: DBSession) -> int:
+    return await run_db(session, operations.delete_user_data, uid=uid)
+
+
+async def select_user_ids(
+    session: DBSession,
+    ids: Optional[Sequence[int]] = None,
+    role: Optional[Role] = None,
+    username_prefix: Optional[str] = None,
+) -> list[int]:
+    return await run_db(session, operations.select_user_ids, ids=ids, role=role, username_prefix=username_prefix)
+
+
+async def bulk_update_role(session: DBSession, ids: Sequence[int], role: Role) -> int:
+    return await run_db(session, operations.bulk_update_role, ids=ids, role=role)
+
+
+async def bulk_delete_users(session: DBSession, ids: Sequence[int]) -> int:
+    return await run_db(session, operations.bulk_delete_users, ids=ids)
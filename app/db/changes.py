@@ -0,0 +1,68 @@
+import time
+from typing import Callable, Iterable, Optional
+
+from sqlalchemy import ColumnElement, or_, true
+
+# an id still missing after this long belongs to a transaction that was rolled back, or to a pruned row
+GAP_TIMEOUT_SECONDS = 60.0
+MAX_GAPS = 1000
+
+
+class ChangeCursor:
+    """
+    How far an append-only table with a DB-assigned, increasing id has been read.
+
+    Ids are assigned when a row is inserted but only become visible when its transaction commits, so a
+    transaction committing after a later one can leave a gap below the last id read. Such gaps are read
+    again on every sync until they fill or get older than `gap_timeout` seconds. Unlike a timestamp
+    watermark, this does not depend on the clock of whichever worker wrote the row.
+    """
+
+    def __init__(
+        self,
+        gap_timeout: float = GAP_TIMEOUT_SECONDS,
+        max_gaps: int = MAX_GAPS,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.gap_timeout = gap_timeout
+        self.max_gaps = max_gaps
+        self._clock = clock
+        self.watermark: Optional[int] = None
+        self._gaps: dict[int, float] = {}
+
+    @property
+    def gaps(self) -> list[int]:
+        return sorted(self._gaps)
+
+    def unread(self, id_column) -> ColumnElement[bool]:
+        """Condition selecting the rows not read yet, every row before the first sync."""
+        if self.watermark is None:
+            return true()
+        if not self._gaps:
+            return id_column > self.watermark
+        return or_(id_column > self.watermark, id_column.in_(self.gaps))
+
+    def advance(self, ids: Iterable[int]) -> None:
+        """Records the ids returned by a sync."""
+        now = self._clock()
+        ids = set(ids)
+        for change_id in ids:
+            self._gaps.pop(change_id, None)
+        for change_id, first_missed in list(self._gaps.items()):
+            if now - first_missed > self.gap_timeout:
+                del self._gaps[change_id]
+        if not ids:
+            return
+        # before the first sync, nothing is known about ids below the lowest one read
+        low = self.watermark if self.watermark is not None else min(ids)
+        high = max(ids)
+        for change_id in range(max(low + 1, high - self.max_gaps), high):
+            if change_id not in ids:
+                self._gaps.setdefault(change_id, now)
+        while len(self._gaps) > self.max_gaps:
+            del self._gaps[min(self._gaps)]
+        self.watermark = max(high, self.watermark or 0)
+
+    def reset(self) -> None:
+        self.watermark = None
+        self._gaps.clear()
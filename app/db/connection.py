@@ -1,24 +1,91 @@
 from functools import lru_cache
+from typing import Any, AsyncGenerator, Callable, Union
 
+from fastapi.concurrency import run_in_threadpool
 from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import (
+    AsyncEngine,
+    AsyncSession,
+    async_sessionmaker,
+    create_async_engine,
+)
+from sqlalchemy.orm import Session, sessionmaker
 
 from app.settings import settings
 
+from .pool import engine_options, register_connect_listeners
+
 DATABASE_URL = settings.DATABASE_URL
 
+# sync driver -> async driver used when ASYNC_DATABASE_URL is not configured
+ASYNC_DRIVERS = {
+    "sqlite": "sqlite+aiosqlite",
+    "postgresql": "postgresql+asyncpg",
+    "mysql": "mysql+aiomysql",
+}
+
+DBSession = Union[Session, AsyncSession]
+
+
+def get_async_database_url(database_url: str = DATABASE_URL) -> str:
+    if settings.ASYNC_DATABASE_URL:
+        return settings.ASYNC_DATABASE_URL
+    url = make_url(database_url)
+    async_driver = ASYNC_DRIVERS.get(url.get_backend_name())
+    if "+" in url.drivername or async_driver is None:
+        return database_url
+    return url.set(drivername=async_driver).render_as_string(hide_password=False)
+
 
 @lru_cache
 def get_engine():
-    return create_engine(DATABASE_URL)
+    engine = create_engine(DATABASE_URL, **engine_options(DATABASE_URL))
+    register_connect_listeners(engine)
+    return engine
+
+
+@lru_cache
+def get_async_engine() -> AsyncEngine:
+    async_database_url = get_async_database_url()
+    engine = create_async_engine(async_database_url, **engine_options(async_database_url, is_async=True))
+    register_connect_listeners(engine.sync_engine)
+    return engine
 
 
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=get_engine())
 
 
+@lru_cache
+def get_async_sessionmaker() -> async_sessionmaker[AsyncSession]:
+    # objects returned to async route handlers must not lazy-load expired attributes after commit
+    return async_sessionmaker(bind=get_async_engine(), autoflush=False, expire_on_commit=False)
+
+
 def get_session():
     db = SessionLocal()
     try:
         yield db
     finally:
         db.close()
+
+
+async def get_async_session() -> AsyncGenerator[AsyncSession, None]:
+    async with get_async_sessionmaker()() as db:
+        yield db
+
+
+# Session dependency used by the routes; the sync path stays available with ASYNC_DB disabled
+get_db_session = get_async_session if settings.ASYNC_DB else get_session
+
+
+async def run_db(session: DBSession, fn: Callable[..., Any], /, **kwargs: Any) -> Any:
+    """
+    Awaits a sync DB operation `fn(session=..., **kwargs)` without blocking the event loop.
+
+    An `AsyncSession` runs it through `run_sync`, so the I/O goes through the async driver;
+    a sync `Session` runs it in the threadpool.
+    """
+    if isinstance(session, AsyncSession):
+        return await session.run_sync(lambda sync_session: fn(session=sync_session, **kwargs))
+    return await run_in_threadpool(fn, session=session, **kwargs)
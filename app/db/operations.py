@@ -1,14 +1,34 @@
-from typing import Optional, Type
+from datetime import UTC, datetime
+from typing import Iterator, Optional, Sequence, Type
 
-from email_validator import EmailNotValidError, validate_email
+from sqlalchemy import (
+    Row,
+    Select,
+    bindparam,
+    case,
+    delete,
+    func,
+    insert,
+    or_,
+    select,
+    update,
+)
+from sqlalchemy.dialects.postgresql import insert as postgresql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
 from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session
 
-from app.settings import pwd_context
+from app.auth.cache import principal_cache
+from app.auth.token_versions import token_versions
+from app.metrics import db_operation_duration, timed_operation
+from app.settings import pwd_context, settings
 
-from .schema import Role
+from .schema import Base, RefreshToken, Role, TokenVersionChange
 from .schema import User as db_User
 
+# records each operation in the db_operation_duration_seconds histogram, labelled by function name
+timed = timed_operation(db_operation_duration)
+
 
 class UserExistsError(Exception):
     pass
@@ -18,8 +38,16 @@ class UserNotFoundError(Exception):
     pass
 
 
+@timed
 def add_user(session: Session, username: str, email: str, password: str, role: Role = Role.basic) -> Optional[db_User]:
     hashed_password = pwd_context.hash(password)
+    return create_user(session=session, username=username, email=email, hashed_password=hashed_password, role=role)
+
+
+@timed
+def create_user(
+    session: Session, username: str, email: str, hashed_password: str, role: Role = Role.basic
+) -> Optional[db_User]:
     db_user = db_User(username=username, email=email, hashed_password=hashed_password, role=role)
     session.add(db_user)
     try:
@@ -31,45 +59,333 @@ def add_user(session: Session, username: str, email: str, password: str, role: R
     return db_user
 
 
-def get_user(session: Session, username_or_email: str) -> Optional[db_User]:
+@timed
+def find_existing_identities(
+    session: Session, usernames: Sequence[str], emails: Sequence[str]
+) -> tuple[set[str], set[str]]:
+    """
+    Returns the subset of `usernames` and `emails` already taken, in a single query.
+
+    Identities are matched case-insensitively by the database, as the unique lower() indexes compare them,
+    and returned normalized, see `normalize_identity`.
+    """
+    if not usernames and not emails:
+        return set(), set()
+    lower_username, lower_email = func.lower(db_User.username), func.lower(db_User.email)
+    statement = select(db_User.username, db_User.email).where(
+        or_(
+            lower_username.in_([func.lower(username) for username in set(usernames)]),
+            lower_email.in_([func.lower(email) for email in set(emails)]),
+        )
+    )
+    existing_usernames, existing_emails = set(), set()
+    for username, email in session.execute(statement):
+        existing_usernames.add(normalize_identity(username))
+        existing_emails.add(normalize_identity(email))
+    return (
+        existing_usernames & {normalize_identity(username) for username in usernames},
+        existing_emails & {normalize_identity(email) for email in emails},
+    )
+
+
+@timed
+def insert_users(session: Session, rows: Sequence[dict]) -> list[int]:
+    """
+    Inserts `rows` (username, email, hashed_password, role) with a single executemany and commits.
+
+    Returns the positions of the rows rejected by a unique constraint. Those only show up when another
+    transaction inserted the same identity concurrently, in which case the batch is retried one row
+    per transaction so that the remaining rows are still inserted.
+    """
+    if not rows:
+        return []
+    try:
+        session.execute(insert(db_User), list(rows))
+        session.commit()
+        return []
+    except IntegrityError:
+        session.rollback()
+
+    conflicts = []
+    for position, row in enumerate(rows):
+        try:
+            session.execute(insert(db_User), [row])
+            session.commit()
+        except IntegrityError:
+            session.rollback()
+            conflicts.append(position)
+    return conflicts
+
+
+def insert_or_ignore(session: Session, model: type[Base], values: dict) -> bool:
+    """
+    Inserts one row of `model` without committing, unless it would violate a unique constraint.
+
+    Returns whether the row was inserted. SQLite and PostgreSQL skip the conflicting row with
+    INSERT ... ON CONFLICT DO NOTHING, other databases insert it within a savepoint.
+    """
+    dialect_name = session.get_bind().dialect.name
+    if dialect_name in ("sqlite", "postgresql"):
+        dialect_insert = sqlite_insert if dialect_name == "sqlite" else postgresql_insert
+        return session.execute(dialect_insert(model).values(values).on_conflict_do_nothing()).rowcount == 1
     try:
-        validate_email(username_or_email)
-        query_filter = db_User.email
-    except EmailNotValidError:
-        query_filter = db_User.username
+        with session.begin_nested():
+            session.execute(insert(model).values(values))
+    except IntegrityError:
+        return False
+    return True
+
+
+def normalize_identity(username_or_email: str) -> str:
+    """
+    Case-folded identity, for rate limit keys and comparisons made in Python.
+
+    Queries must not compare columns to it: SQLite's lower() only folds ASCII letters, so they apply
+    lower() to both sides instead and leave the folding to the database.
+    """
+    return username_or_email.lower()
+
 
-    db_user: Optional[db_User] = session.query(db_User).filter(query_filter == username_or_email).first()
+# The hot lookups below run pre-built statements with bound parameters: the statement object and its
+# cache key are built once at import, so each call only binds its values and reuses the compiled SQL.
+USERNAME_MATCH = func.lower(db_User.username) == func.lower(bindparam("identity"))
+EMAIL_MATCH = func.lower(db_User.email) == func.lower(bindparam("identity"))
+USER_BY_USERNAME = select(db_User).where(USERNAME_MATCH).limit(1)
+# a username may equal the email of another user, the email wins
+USER_BY_EMAIL_OR_USERNAME = (
+    select(db_User).where(or_(EMAIL_MATCH, USERNAME_MATCH)).order_by(case((EMAIL_MATCH, 0), else_=1)).limit(1)
+)
+USER_BY_ID = select(db_User).where(db_User.id == bindparam("uid"))
+# columns needed to authorize a request, without the password hash or an ORM identity
+PRINCIPAL_BY_USERNAME = select(db_User.id, db_User.username, db_User.email, db_User.role, db_User.token_version).where(
+    USERNAME_MATCH
+)
+
+
+@timed
+def get_user(session: Session, username_or_email: str) -> Optional[db_User]:
+    """
+    Matches a user by username or email, case-insensitively, through the lower() functional indexes.
+
+    Emails always contain "@", so an identifier without one can only be a username and is resolved
+    with a single index probe; otherwise both indexes are probed in the same query, and a user whose
+    email matches is preferred over one whose username does.
+    """
+    statement = USER_BY_EMAIL_OR_USERNAME if "@" in username_or_email else USER_BY_USERNAME
+    db_user: Optional[db_User] = session.scalars(statement, {"identity": username_or_email}).first()
     return db_user
 
 
+@timed
+def get_principal_row(session: Session, username: str) -> Optional[Row]:
+    """Returns the (id, username, email, role, token_version) row of `username`, for permission checks."""
+    return session.execute(PRINCIPAL_BY_USERNAME, {"identity": username}).first()
+
+
+@timed
+def get_users_by_usernames(session: Session, usernames: Sequence[str]) -> dict[str, Row]:
+    """Returns the (id, username, role, token_version) row of each existing user in `usernames`, in one query."""
+    if not usernames:
+        return {}
+    statement = select(db_User.id, db_User.username, db_User.role, db_User.token_version).where(
+        db_User.username.in_(set(usernames))
+    )
+    return {row.username: row for row in session.execute(statement)}
+
+
+@timed
+def update_password_hash(session: Session, user: db_User, hashed_password: str) -> None:
+    """Stores a rehashed password, as produced by `pwd_context.verify_and_update` after a successful login."""
+    user.hashed_password = hashed_password
+    session.commit()
+    session.refresh(user)
+
+
+@timed
 def get_all_users(session: Session) -> list[Type[db_User]]:
     return session.query(db_User).all()
 
 
+def filter_users(statement: Select, role: Optional[Role] = None, username_prefix: Optional[str] = None) -> Select:
+    if role is not None:
+        statement = statement.where(db_User.role == role)
+    if username_prefix:
+        statement = statement.where(db_User.username.startswith(username_prefix, autoescape=True))
+    return statement
+
+
+@timed
+def get_users_page(
+    session: Session,
+    limit: Optional[int] = None,
+    after: Optional[int] = None,
+    role: Optional[Role] = None,
+    username_prefix: Optional[str] = None,
+) -> Sequence[db_User]:
+    """
+    Keyset pagination on the primary key: returns up to `limit` users with an id greater than `after`.
+
+    Without a `limit`, every matching user is returned.
+    """
+    statement = filter_users(select(db_User), role=role, username_prefix=username_prefix)
+    if after is not None:
+        statement = statement.where(db_User.id > after)
+    statement = statement.order_by(db_User.id)
+    if limit is not None:
+        statement = statement.limit(limit)
+    return session.scalars(statement).all()
+
+
+def user_rows_statement(role: Optional[Role] = None, username_prefix: Optional[str] = None) -> Select:
+    statement = select(db_User.id, db_User.username, db_User.email, db_User.role)
+    return filter_users(statement, role=role, username_prefix=username_prefix).order_by(db_User.id)
+
+
+def iter_user_row_batches(
+    session: Session,
+    role: Optional[Role] = None,
+    username_prefix: Optional[str] = None,
+    batch_size: int = settings.USER_STREAM_BATCH_SIZE,
+) -> Iterator[Sequence[Row]]:
+    """Yields batches of (id, username, email, role) rows without loading ORM objects or the whole table."""
+    statement = user_rows_statement(role=role, username_prefix=username_prefix)
+    result = session.execute(statement.execution_options(yield_per=batch_size))
+    yield from result.partitions()
+
+
+def record_token_version_changes(session: Session, changes: Sequence[tuple[int, Optional[int]]]) -> None:
+    """
+    Adds (uid, min_version) changes to the session's transaction, for the other workers to replay.
+
+    A None version revokes every token of a deleted user, see `app.auth.token_versions.sync_token_versions`.
+    """
+    if not changes:
+        return
+    changed_at = datetime.now(tz=UTC).replace(tzinfo=None)
+    session.execute(
+        insert(TokenVersionChange),
+        [{"user_id": uid, "min_version": min_version, "changed_at": changed_at} for uid, min_version in changes],
+    )
+
+
+@timed
 def get_user_by_id(uid: int, session: Session) -> Optional[db_User]:
-    return session.query(db_User).filter(db_User.id == uid).first()
+    return session.scalars(USER_BY_ID, {"uid": uid}).first()
 
 
+@timed
 def update_user_data(uid: int, update_data: dict, session: Session) -> db_User:
     db_user = get_user_by_id(uid=uid, session=session)
     if not db_user:
         raise UserNotFoundError("User not found")
+    initial_claims = (db_user.username, db_user.role)
     db_user.username = update_data.get("username", db_user.username)
     db_user.email = update_data.get("email", db_user.email)
     db_user.role = update_data.get("role", db_user.role)
+    if (db_user.username, db_user.role) != initial_claims:
+        # invalidates stateless tokens carrying the previous username or role
+        db_user.token_version = (db_user.token_version or 0) + 1
+        record_token_version_changes(session, [(db_user.id, db_user.token_version)])
     try:
         session.commit()
         session.refresh(db_user)
     except IntegrityError:
         session.rollback()
         raise UserExistsError("User with provided username or email already exists.")
+    token_versions.bump(db_user.id, db_user.token_version)
+    principal_cache.invalidate_user(db_user.id)
     return db_user
 
 
+@timed
 def delete_user_data(uid: int, session: Session) -> int:
     db_user = get_user_by_id(uid=uid, session=session)
     if not db_user:
         raise UserNotFoundError
+    session.execute(delete(RefreshToken).where(RefreshToken.user_id == uid))
     session.delete(db_user)
+    record_token_version_changes(session, [(uid, None)])
     session.commit()
+    token_versions.revoke_all(uid)
+    principal_cache.invalidate_user(uid)
     return 1
+
+
+def chunked(items: Sequence[int], chunk_size: int) -> Iterator[Sequence[int]]:
+    for start in range(0, len(items), chunk_size):
+        end = start + chunk_size
+        yield items[start:end]
+
+
+@timed
+def select_user_ids(
+    session: Session,
+    ids: Optional[Sequence[int]] = None,
+    role: Optional[Role] = None,
+    username_prefix: Optional[str] = None,
+    chunk_size: int = settings.BULK_MUTATION_CHUNK_SIZE,
+) -> list[int]:
+    """Resolves either an explicit id list or a filter to the ids of existing users."""
+    if ids is None:
+        statement = filter_users(select(db_User.id), role=role, username_prefix=username_prefix).order_by(db_User.id)
+        return list(session.scalars(statement))
+    existing_ids: list[int] = []
+    for chunk in chunked(sorted(set(ids)), chunk_size):
+        existing_ids.extend(session.scalars(select(db_User.id).where(db_User.id.in_(chunk)).order_by(db_User.id)))
+    return existing_ids
+
+
+@timed
+def bulk_update_role(
+    session: Session, ids: Sequence[int], role: Role, chunk_size: int = settings.BULK_MUTATION_CHUNK_SIZE
+) -> int:
+    """
+    Sets `role` on the users in `ids` with one UPDATE per chunk, in a single transaction.
+
+    Only users whose role actually changes are touched; their token version is bumped so that
+    stateless tokens carrying the previous role are rejected.
+    """
+    updated = 0
+    changed: list[tuple[int, int]] = []
+    supports_returning = session.get_bind().dialect.update_returning
+    for chunk in chunked(ids, chunk_size):
+        statement = (
+            update(db_User)
+            .where(db_User.id.in_(chunk), db_User.role != role)
+            .values(role=role, token_version=db_User.token_version + 1)
+            .execution_options(synchronize_session=False)
+        )
+        if supports_returning:
+            rows = session.execute(statement.returning(db_User.id, db_User.token_version)).all()
+            updated += len(rows)
+            changed.extend(rows)
+            continue
+        changed_ids = list(session.scalars(select(db_User.id).where(db_User.id.in_(chunk), db_User.role != role)))
+        if not changed_ids:
+            continue
+        updated += session.execute(statement).rowcount
+        changed.extend(session.execute(select(db_User.id, db_User.token_version).where(db_User.id.in_(changed_ids))))
+    record_token_version_changes(session, [(uid, token_version) for uid, token_version in changed])
+    session.commit()
+    for uid, token_version in changed:
+        token_versions.bump(uid, token_version)
+        principal_cache.invalidate_user(uid)
+    return updated
+
+
+@timed
+def bulk_delete_users(session: Session, ids: Sequence[int], chunk_size: int = settings.BULK_MUTATION_CHUNK_SIZE) -> int:
+    """Deletes the users in `ids` with one DELETE per chunk, in a single transaction."""
+    deleted = 0
+    for chunk in chunked(ids, chunk_size):
+        session.execute(delete(RefreshToken).where(RefreshToken.user_id.in_(chunk)))
+        result = session.execute(
+            delete(db_User).where(db_User.id.in_(chunk)).execution_options(synchronize_session=False)
+        )
+        deleted += result.rowcount
+    record_token_version_changes(session, [(uid, None) for uid in ids])
+    session.commit()
+    for uid in ids:
+        token_versions.revoke_all(uid)
+        principal_cache.invalidate_user(uid)
+    return deleted
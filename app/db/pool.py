@@ -0,0 +1,130 @@
+import threading
+import time
+
+from sqlalchemy import AsyncAdaptedQueuePool, QueuePool, StaticPool, event
+from sqlalchemy.engine import Engine, make_url
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+
+from app.metrics import db_pool_checkout_wait
+from app.settings import settings
+
+
+class PoolStats:
+    """Checkout wait time and overflow counters, shared by the sync and async engines."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self) -> None:
+        with self._lock:
+            self.checkouts = 0
+            self.overflow_checkouts = 0
+            self.timeouts = 0
+            self.total_wait_seconds = 0.0
+            self.max_wait_seconds = 0.0
+
+    def record_checkout(self, wait_seconds: float, overflow: bool) -> None:
+        with self._lock:
+            self.checkouts += 1
+            self.total_wait_seconds += wait_seconds
+            if wait_seconds > self.max_wait_seconds:
+                self.max_wait_seconds = wait_seconds
+            if overflow:
+                self.overflow_checkouts += 1
+
+    def record_timeout(self) -> None:
+        with self._lock:
+            self.timeouts += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "checkouts": self.checkouts,
+                "overflow_checkouts": self.overflow_checkouts,
+                "timeouts": self.timeouts,
+                "total_wait_seconds": self.total_wait_seconds,
+                "avg_wait_seconds": self.total_wait_seconds / self.checkouts if self.checkouts else 0.0,
+                "max_wait_seconds": self.max_wait_seconds,
+            }
+
+
+pool_stats = PoolStats()
+
+
+class InstrumentedPoolMixin:
+    """Times how long callers wait for a connection to be checked out of a `QueuePool`."""
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            connection = super()._do_get()
+        except PoolTimeoutError:
+            pool_stats.record_timeout()
+            raise
+        wait_seconds = time.perf_counter() - start
+        # only checkouts taking the pool past its size are overflow, not every checkout while some overflow is out
+        pool_stats.record_checkout(wait_seconds, overflow=self.checkedout() > self.size())
+        db_pool_checkout_wait.observe(wait_seconds)
+        return connection
+
+
+class InstrumentedQueuePool(InstrumentedPoolMixin, QueuePool):
+    pass
+
+
+class InstrumentedAsyncAdaptedQueuePool(InstrumentedPoolMixin, AsyncAdaptedQueuePool):
+    pass
+
+
+def is_in_memory_sqlite(database_url: str) -> bool:
+    url = make_url(database_url)
+    return url.get_backend_name() == "sqlite" and url.database in (None, "", ":memory:")
+
+
+def engine_options(database_url: str, is_async: bool = False) -> dict:
+    url = make_url(database_url)
+    options: dict = {}
+    if url.get_backend_name() == "sqlite":
+        # sessions are handed between threadpool threads
+        options["connect_args"] = {"check_same_thread": False}
+        if is_in_memory_sqlite(database_url):
+            # every new connection would be a new, empty database: share a single one
+            options["poolclass"] = StaticPool
+            return options
+    options |= {
+        "poolclass": InstrumentedAsyncAdaptedQueuePool if is_async else InstrumentedQueuePool,
+        "pool_size": settings.DB_POOL_SIZE,
+        "max_overflow": settings.DB_MAX_OVERFLOW,
+        "pool_timeout": settings.DB_POOL_TIMEOUT,
+        "pool_recycle": settings.DB_POOL_RECYCLE,
+        "pool_pre_ping": settings.DB_POOL_PRE_PING,
+    }
+    return options
+
+
+def connect_statements(backend_name: str) -> list[str]:
+    if backend_name == "sqlite":
+        return [
+            f"PRAGMA journal_mode={settings.SQLITE_JOURNAL_MODE}",
+            f"PRAGMA synchronous={settings.SQLITE_SYNCHRONOUS}",
+            f"PRAGMA busy_timeout={int(settings.SQLITE_BUSY_TIMEOUT_MS)}",
+        ]
+    if backend_name == "postgresql" and settings.POSTGRES_STATEMENT_TIMEOUT_MS:
+        return [f"SET statement_timeout = {int(settings.POSTGRES_STATEMENT_TIMEOUT_MS)}"]
+    return []
+
+
+def register_connect_listeners(engine: Engine) -> None:
+    statements = connect_statements(engine.dialect.name)
+    if not statements:
+        return
+
+    @event.listens_for(engine, "connect")
+    def apply_connect_statements(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        try:
+            for statement in statements:
+                cursor.execute(statement)
+        finally:
+            cursor.close()
@@ -1,6 +1,10 @@
+from datetime import datetime
 from enum import Enum
+from typing import Optional
 
+from sqlalchemy import Connection, ForeignKey, Index, func, inspect, text
 from sqlalchemy.orm import DeclarativeBase, Mapped, mapped_column
+from sqlalchemy.schema import CreateIndex
 
 
 class Base(DeclarativeBase):
@@ -31,6 +35,109 @@ class User(Base):
     email: Mapped[str] = mapped_column(unique=True, nullable=False)
     hashed_password: Mapped[str] = mapped_column(nullable=False)
     role: Mapped[Role] = mapped_column(default=Role.basic)
+    token_version: Mapped[int] = mapped_column(default=0, server_default="0")
+
+    # logins are case-insensitive: lookups compare lower(column), which these indexes serve directly
+    __table_args__ = (
+        Index("ix_user_username_lower", func.lower(username), unique=True),
+        Index("ix_user_email_lower", func.lower(email), unique=True),
+    )
 
     def __repr__(self):
         return f"User(id={self.id}, username={self.username}, email={self.email})"
+
+
+class RefreshToken(Base):
+    """
+    Opaque refresh token, stored as the SHA-256 of the token.
+
+    Tokens issued from one login share a `family_id`; each is used once and replaced by the next one in the
+    family, so a second use of the same token means it leaked, and the whole family is revoked. Expired rows
+    are deleted by `app.auth.refresh.prune_refresh_tokens`.
+    """
+
+    __tablename__ = "RefreshToken"
+
+    id: Mapped[int] = mapped_column(primary_key=True)
+    token_hash: Mapped[str] = mapped_column(unique=True, nullable=False)
+    user_id: Mapped[int] = mapped_column(ForeignKey("User.id", ondelete="CASCADE"), index=True, nullable=False)
+    family_id: Mapped[str] = mapped_column(index=True, nullable=False)
+    expires_at: Mapped[datetime] = mapped_column(index=True, nullable=False)
+    used_at: Mapped[Optional[datetime]] = mapped_column(default=None)
+    revoked: Mapped[bool] = mapped_column(default=False, server_default="0")
+
+    def __repr__(self):
+        return f"RefreshToken(id={self.id}, user_id={self.user_id}, family_id={self.family_id})"
+
+
+class RevokedToken(Base):
+    """
+    Access token revoked before its expiry, kept until it expires. See `app.auth.revocation`.
+
+    Workers sync new rows by id rather than by `revoked_at`, which is stamped by the revoking worker's clock.
+    """
+
+    __tablename__ = "RevokedToken"
+    # ids are never reused, even once the latest row is pruned
+    __table_args__ = {"sqlite_autoincrement": True}
+
+    id: Mapped[int] = mapped_column(primary_key=True)
+    jti: Mapped[str] = mapped_column(unique=True, nullable=False)
+    expires_at: Mapped[datetime] = mapped_column(index=True, nullable=False)
+    revoked_at: Mapped[datetime] = mapped_column(nullable=False)
+
+    def __repr__(self):
+        return f"RevokedToken(jti={self.jti}, expires_at={self.expires_at})"
+
+
+class TokenVersionChange(Base):
+    """
+    Token version bump of a user, written with the role change or delete that caused it.
+
+    Workers replay these into their `app.auth.token_versions` registry in id order. `min_version` is None
+    for deleted users. Rows are kept for the lifetime of an access token, older tokens have expired anyway.
+    """
+
+    __tablename__ = "TokenVersionChange"
+    # ids are never reused, even once the latest row is pruned
+    __table_args__ = {"sqlite_autoincrement": True}
+
+    id: Mapped[int] = mapped_column(primary_key=True)
+    user_id: Mapped[int] = mapped_column(nullable=False)
+    min_version: Mapped[Optional[int]] = mapped_column(default=None)
+    changed_at: Mapped[datetime] = mapped_column(index=True, nullable=False)
+
+    def __repr__(self):
+        return f"TokenVersionChange(id={self.id}, user_id={self.user_id}, min_version={self.min_version})"
+
+
+class RateLimitWindow(Base):
+    """Sliding window counters shared by all workers, see `app.auth.rate_limit.DatabaseRateLimitStore`."""
+
+    __tablename__ = "RateLimitWindow"
+
+    key: Mapped[str] = mapped_column(primary_key=True)
+    window_start: Mapped[float] = mapped_column(index=True, nullable=False)
+    previous_count: Mapped[int] = mapped_column(default=0, nullable=False)
+    current_count: Mapped[int] = mapped_column(default=0, nullable=False)
+
+    def __repr__(self):
+        return f"RateLimitWindow(key={self.key}, window_start={self.window_start})"
+
+
+def create_tables(connection: Connection) -> None:
+    """
+    Creates the missing tables, then upgrades the tables created by an earlier version of the schema.
+
+    `create_all` never alters a table that already exists, so the columns and indexes added since are
+    created here: the `User.token_version` column, the case-insensitive identity indexes of `User`, and
+    any other missing index.
+    """
+    Base.metadata.create_all(connection)
+    user_columns = {column["name"] for column in inspect(connection).get_columns(User.__tablename__)}
+    if "token_version" not in user_columns:
+        connection.execute(text('ALTER TABLE "User" ADD COLUMN token_version INTEGER NOT NULL DEFAULT 0'))
+    for table in Base.metadata.sorted_tables:
+        for index in table.indexes:
+            # reflection skips expression indexes on SQLite, so existence is left to the database
+            connection.execute(CreateIndex(index, if_not_exists=True))
@@ -1,26 +1,135 @@
+import atexit
 import logging
-from logging.handlers import TimedRotatingFileHandler
+import queue
+import threading
+from logging.handlers import QueueHandler, QueueListener, TimedRotatingFileHandler
 
 from uvicorn.logging import ColourizedFormatter
 
 from app.settings import settings
 
 LOG_FILE_LOCATION = settings.LOG_FILE_LOCATION
+LOG_QUEUE_SIZE = settings.LOG_QUEUE_SIZE
+LOG_QUEUE_FULL_POLICY = settings.LOG_QUEUE_FULL_POLICY
+LOG_BATCH_SIZE = settings.LOG_BATCH_SIZE
+
+
+class DeferredFlushMixin:
+    """Skips the flush done after every record, the queue listener flushes once per batch instead."""
+
+    def flush(self):
+        pass
+
+    def flush_batch(self):
+        super().flush()
+
+
+class BatchStreamHandler(DeferredFlushMixin, logging.StreamHandler):
+    pass
+
+
+class BatchTimedRotatingFileHandler(DeferredFlushMixin, TimedRotatingFileHandler):
+    pass
+
+
+class BoundedQueueHandler(QueueHandler):
+    """Enqueues records on a bounded queue, either dropping (and counting) or blocking when it is full."""
+
+    def __init__(self, queue_: queue.Queue, policy: str = LOG_QUEUE_FULL_POLICY):
+        super().__init__(queue_)
+        self.policy = policy
+        self.dropped = 0
+        self._dropped_lock = threading.Lock()
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        if self.policy == "block":
+            self.queue.put(record)
+            return
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            with self._dropped_lock:
+                self.dropped += 1
+
+
+class BatchingQueueListener(QueueListener):
+    """Drains up to `batch_size` records per wake-up and flushes every handler once per batch."""
+
+    def __init__(self, queue_: queue.Queue, *handlers: logging.Handler, batch_size: int = LOG_BATCH_SIZE):
+        super().__init__(queue_, *handlers, respect_handler_level=True)
+        self.batch_size = batch_size
+
+    def enqueue_sentinel(self) -> None:
+        # the queue is bounded, wait for room instead of failing with queue.Full
+        self.queue.put(self._sentinel)
+
+    def _monitor(self) -> None:
+        stop = False
+        while not stop:
+            batch = [self.dequeue(True)]
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(self.queue.get_nowait())
+                except queue.Empty:
+                    break
+            for record in batch:
+                if record is self._sentinel:
+                    stop = True
+                else:
+                    self.handle(record)
+            for handler in self.handlers:
+                try:
+                    if isinstance(handler, DeferredFlushMixin):
+                        handler.flush_batch()
+                    else:
+                        handler.flush()
+                except (OSError, ValueError):
+                    # the stream may already be closed at interpreter shutdown, as in logging.shutdown()
+                    pass
+            for _ in batch:
+                self.queue.task_done()
 
 
 client_logger = logging.getLogger("client_logger")
 client_logger.setLevel(logging.INFO)
 
 # Console Handler
-console_handler = logging.StreamHandler()
+console_handler = BatchStreamHandler()
 console_formatter = ColourizedFormatter("%(levelprefix)s CLIENT CALL - %(message)s", use_colors=True)
 console_handler.setFormatter(console_formatter)
 
 # File Handler
-file_handler = TimedRotatingFileHandler(LOG_FILE_LOCATION)
+file_handler = BatchTimedRotatingFileHandler(LOG_FILE_LOCATION)
 file_formatter = logging.Formatter("time: %(asctime)s, %(levelname)s: %(message)s", datefmt="%Y-%m-%d %H:%M:%S")
 file_handler.setFormatter(file_formatter)
 
+# Requests only pay for enqueueing, formatting and I/O happen on the listener thread
+log_queue: queue.Queue = queue.Queue(maxsize=LOG_QUEUE_SIZE)
+queue_handler = BoundedQueueHandler(log_queue)
+queue_listener = BatchingQueueListener(log_queue, console_handler, file_handler)
+
+client_logger.addHandler(queue_handler)
+queue_listener.start()
+atexit.register(queue_listener.stop)
+
+
+def restart_queue_listener() -> None:
+    """
+    Starts a new listener thread on a new queue, in a process forked after the listener was started.
+
+    Only the forking thread survives a fork, and the queue's locks may have been held by the old listener.
+    """
+    global log_queue
+    log_queue = queue.Queue(maxsize=LOG_QUEUE_SIZE)
+    queue_handler.queue = log_queue
+    queue_listener.queue = log_queue
+    queue_listener._thread = None
+    queue_listener.start()
+
 
-client_logger.addHandler(console_handler)
-client_logger.addHandler(file_handler)
+def logging_stats() -> dict:
+    return {
+        "queue_size": log_queue.qsize(),
+        "queue_max_size": log_queue.maxsize,
+        "dropped_records": queue_handler.dropped,
+    }
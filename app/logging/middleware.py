@@ -0,0 +1,117 @@
+import json
+import random
+import time
+import uuid
+from contextvars import ContextVar
+from typing import Optional
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.settings import settings
+
+from . import client_logger
+
+REQUEST_ID_HEADER = b"x-request-id"
+
+
+class RequestTimings:
+    __slots__ = ("request_id", "auth_seconds", "db_seconds")
+
+    def __init__(self, request_id: str):
+        self.request_id = request_id
+        self.auth_seconds = 0.0
+        self.db_seconds = 0.0
+
+
+request_timings: ContextVar[Optional[RequestTimings]] = ContextVar("request_timings", default=None)
+
+
+def add_auth_time(seconds: float) -> None:
+    timings = request_timings.get()
+    if timings is not None:
+        timings.auth_seconds += seconds
+
+
+def add_db_time(seconds: float) -> None:
+    timings = request_timings.get()
+    if timings is not None:
+        timings.db_seconds += seconds
+
+
+@event.listens_for(Engine, "before_cursor_execute")
+def _start_query_timer(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("query_start_time", []).append(time.perf_counter())
+
+
+@event.listens_for(Engine, "after_cursor_execute")
+def _stop_query_timer(conn, cursor, statement, parameters, context, executemany):
+    add_db_time(time.perf_counter() - conn.info["query_start_time"].pop())
+
+
+@event.listens_for(Engine, "handle_error")
+def _discard_query_timer(exception_context):
+    connection = exception_context.connection
+    if connection is not None and connection.info.get("query_start_time"):
+        add_db_time(time.perf_counter() - connection.info["query_start_time"].pop())
+
+
+class AccessLogMiddleware:
+    """
+    Pure ASGI middleware writing one JSON line per sampled request to the client logger.
+
+    Each line carries the request id (taken from X-Request-ID or generated, and echoed back),
+    the total duration split into auth dependency and DB time, and the response size.
+    """
+
+    def __init__(
+        self,
+        app: ASGIApp,
+        success_sample_rate: float = settings.ACCESS_LOG_SUCCESS_SAMPLE_RATE,
+        error_sample_rate: float = settings.ACCESS_LOG_ERROR_SAMPLE_RATE,
+    ):
+        self.app = app
+        self.success_sample_rate = success_sample_rate
+        self.error_sample_rate = error_sample_rate
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        start = time.perf_counter()
+        request_id = dict(scope["headers"]).get(REQUEST_ID_HEADER, b"").decode("latin-1") or uuid.uuid4().hex
+        timings = RequestTimings(request_id)
+        context_token = request_timings.set(timings)
+        status_code = 500
+        response_bytes = 0
+
+        async def send_wrapper(message: Message) -> None:
+            nonlocal status_code, response_bytes
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                message["headers"] = [*message.get("headers", []), (REQUEST_ID_HEADER, request_id.encode("latin-1"))]
+            elif message["type"] == "http.response.body":
+                response_bytes += len(message.get("body", b""))
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            request_timings.reset(context_token)
+            sample_rate = self.error_sample_rate if status_code >= 400 else self.success_sample_rate
+            if sample_rate >= 1.0 or random.random() < sample_rate:
+                client = scope.get("client")
+                access_log_entry = {
+                    "request_id": request_id,
+                    "method": scope["method"],
+                    "path": scope["path"],
+                    "ip": client[0] if client else None,
+                    "status": status_code,
+                    "duration_ms": round((time.perf_counter() - start) * 1000, 3),
+                    "auth_ms": round(timings.auth_seconds * 1000, 3),
+                    "db_ms": round(timings.db_seconds * 1000, 3),
+                    "response_bytes": response_bytes,
+                }
+                client_logger.info("%s", json.dumps(access_log_entry, separators=(",", ":")))
@@ -1,13 +1,29 @@
-from contextlib import asynccontextmanager
+import asyncio
+import secrets
+from contextlib import asynccontextmanager, suppress
 
-from fastapi import Depends, FastAPI, Request
-from sqlalchemy.orm import Session
+from fastapi import Depends, FastAPI, HTTPException, Request, status
+from fastapi.responses import JSONResponse, ORJSONResponse, PlainTextResponse, Response
 
 from app.auth import router as auth_router
-from app.db.connection import get_engine, get_session
-from app.db.schema import Base
-from app.db.schema import User as db_User
-from app.logging import client_logger
+from app.auth.cache import principal_cache
+from app.auth.hashing import (
+    HashingPoolSaturatedError,
+    dummy_password_hash,
+    hashing_executor,
+)
+from app.auth.revocation import revocation_list
+from app.auth.sync import auth_sync_loop, sync_auth_state_once
+from app.db.connection import DBSession, get_async_engine, get_db_session, get_engine
+from app.db.pool import pool_stats
+from app.db.schema import create_tables
+from app.logging import logging_stats
+from app.logging.middleware import AccessLogMiddleware
+from app.metrics import CONTENT_TYPE as METRICS_CONTENT_TYPE
+from app.metrics import CallbackGauge, registry
+from app.metrics.middleware import MetricsMiddleware
+from app.profiling import ProfilingConfig, request_profiler
+from app.profiling.middleware import ProfilingMiddleware
 from app.settings import oauth2_scheme, settings
 from app.user_administration import router as user_admin_router
 from app.users import router as user_router
@@ -16,44 +32,145 @@ from app.users.permissions import (
     authenticated_staff_user,
     authenticated_user,
 )
+from app.users.principal import Principal
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - optional dependency
+    orjson = None
 
 ENABLE_CLIENT_LOGGING = settings.ENABLE_CLIENT_LOGGING
+METRICS_ENABLED = settings.METRICS_ENABLED
+
+
+def current_engine():
+    return get_async_engine() if settings.ASYNC_DB else get_engine()
+
+
+def pool_checked_out() -> int:
+    pool = current_engine().pool
+    # StaticPool and NullPool keep no checkout count
+    return pool.checkedout() if hasattr(pool, "checkedout") else 0
+
+
+def register_stats_gauges() -> None:
+    """Exposes the counters the app already keeps as gauges read at scrape time."""
+    gauges = [
+        CallbackGauge("password_hashing_pending", "Hashing jobs running or queued", lambda: hashing_executor.pending),
+        CallbackGauge(
+            "password_hashing_queue_depth",
+            "Hashing jobs waiting for a free worker",
+            lambda: hashing_executor.queue_depth,
+        ),
+        CallbackGauge(
+            "password_hashing_rejected", "Hashing jobs rejected by a saturated pool", lambda: hashing_executor.rejected
+        ),
+        CallbackGauge(
+            "principal_cache_events",
+            "Principal cache hits, misses and evictions",
+            lambda: {(event,): principal_cache.stats()[event] for event in ("hits", "misses", "evictions")},
+            label_names=("event",),
+        ),
+        CallbackGauge("principal_cache_size", "Principals held in the cache", lambda: principal_cache.stats()["size"]),
+        CallbackGauge("revoked_tokens", "Revoked access tokens not yet expired", lambda: len(revocation_list)),
+        CallbackGauge("db_pool_checked_out", "Connections currently checked out", pool_checked_out),
+        CallbackGauge(
+            "db_pool_timeouts", "Connection checkouts that timed out", lambda: pool_stats.stats()["timeouts"]
+        ),
+        CallbackGauge(
+            "log_queue_size", "Records waiting in the client log queue", lambda: logging_stats()["queue_size"]
+        ),
+        CallbackGauge(
+            "log_records_dropped",
+            "Client log records dropped on a full queue",
+            lambda: logging_stats()["dropped_records"],
+        ),
+    ]
+    for gauge in gauges:
+        if registry.get(gauge.name) is None:
+            registry.register(gauge)
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    Base.metadata.create_all(bind=get_engine())
+    if settings.ASYNC_DB:
+        async with get_async_engine().begin() as connection:
+            await connection.run_sync(create_tables)
+    else:
+        with get_engine().begin() as connection:
+            create_tables(connection)
+    # hash the dummy password now, rather than on the first login for an unknown user
+    await hashing_executor.run(dummy_password_hash)
+    # revocations and role changes made by other workers, or before this one started, apply from the first request
+    await sync_auth_state_once()
+    auth_sync = asyncio.create_task(auth_sync_loop())
     yield
+    auth_sync.cancel()
+    with suppress(asyncio.CancelledError):
+        await auth_sync
+    hashing_executor.shutdown()
+    if settings.ASYNC_DB:
+        await get_async_engine().dispose()
+
+
+def default_response_class() -> type[Response]:
+    if not settings.FAST_JSON_RESPONSES:
+        return JSONResponse
+    if orjson is None:
+        raise RuntimeError("FAST_JSON_RESPONSES requires the orjson package, install the fast-json extra")
+    return ORJSONResponse
+
 
+app = FastAPI(title="User Authentication Demo", lifespan=lifespan, default_response_class=default_response_class())
 
-app = FastAPI(title="User Authentication Demo", lifespan=lifespan)
+
+@app.exception_handler(HashingPoolSaturatedError)
+async def hashing_pool_saturated_handler(request: Request, exc: HashingPoolSaturatedError):
+    return JSONResponse(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        content={"detail": "Service temporarily overloaded, please retry later"},
+        headers={"Retry-After": str(settings.HASHING_RETRY_AFTER_SECONDS)},
+    )
 
 
 if ENABLE_CLIENT_LOGGING:
+    app.add_middleware(AccessLogMiddleware)
+
+app.add_middleware(ProfilingMiddleware)
+
 
-    @app.middleware("http")
-    async def log_requests(request: Request, call_next):
-        response = await call_next(request)
-        client_logger.info(
-            "method: %s, call: %s, ip: %s, status: %s",
-            request.method,
-            request.url.path,
-            request.client.host,
-            response.status_code,
+async def authorized_metrics_scraper(request: Request) -> None:
+    """Lets through the scrapers presenting METRICS_TOKEN; /metrics is not served when no token is configured."""
+    if not settings.METRICS_TOKEN:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Not Found")
+    scheme, _, token = request.headers.get("authorization", "").partition(" ")
+    if scheme.lower() != "bearer" or not secrets.compare_digest(token.encode(), settings.METRICS_TOKEN.encode()):
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Unauthorized access",
+            headers={"WWW-Authenticate": "Bearer"},
         )
-        return response
+
+
+if METRICS_ENABLED:
+    register_stats_gauges()
+    app.add_middleware(MetricsMiddleware)
+
+    @app.get("/metrics", include_in_schema=False, dependencies=[Depends(authorized_metrics_scraper)])
+    async def get_metrics():
+        return PlainTextResponse(registry.render(), media_type=METRICS_CONTENT_TYPE)
 
 
 @app.get("/")
-def welcome():
+async def welcome():
     return {"api": "User Authentication Demo", "version": "v1"}
 
 
 @app.get("/financial-markets/")
-def get_financial_news(
+async def get_financial_news(
     token: str = Depends(oauth2_scheme),
-    session: Session = Depends(get_session),
-    auth_user: db_User = Depends(authenticated_user),
+    session: DBSession = Depends(get_db_session),
+    auth_user: Principal = Depends(authenticated_user),
 ):
     return {
         "title": "The Latest News from the Financial Markets",
@@ -63,10 +180,10 @@ def get_financial_news(
 
 
 @app.get("/company-insights/")
-def get_staff_updates(
+async def get_staff_updates(
     token: str = Depends(oauth2_scheme),
-    session: Session = Depends(get_session),
-    auth_user: db_User = Depends(authenticated_staff_user),
+    session: DBSession = Depends(get_db_session),
+    auth_user: Principal = Depends(authenticated_staff_user),
 ):
     return {
         "title": "Company Insights",
@@ -76,10 +193,10 @@ def get_staff_updates(
 
 
 @app.get("/system-administration/")
-def access_system_administration_resources(
+async def access_system_administration_resources(
     token: str = Depends(oauth2_scheme),
-    session: Session = Depends(get_session),
-    auth_user: db_User = Depends(authenticated_admin_user),
+    session: DBSession = Depends(get_db_session),
+    auth_user: Principal = Depends(authenticated_admin_user),
 ):
     return {
         "title": "System Administration",
@@ -88,6 +205,74 @@ def access_system_administration_resources(
     }
 
 
+@app.get("/system-administration/principal-cache/")
+async def get_principal_cache_stats(
+    token: str = Depends(oauth2_scheme),
+    session: DBSession = Depends(get_db_session),
+    auth_user: Principal = Depends(authenticated_admin_user),
+):
+    return principal_cache.stats()
+
+
+@app.get("/system-administration/db-pool/")
+async def get_db_pool_stats(
+    token: str = Depends(oauth2_scheme),
+    session: DBSession = Depends(get_db_session),
+    auth_user: Principal = Depends(authenticated_admin_user),
+):
+    engine = current_engine()
+    return {"status": engine.pool.status(), **pool_stats.stats()}
+
+
+@app.get("/system-administration/logging/")
+async def get_logging_stats(
+    token: str = Depends(oauth2_scheme),
+    session: DBSession = Depends(get_db_session),
+    auth_user: Principal = Depends(authenticated_admin_user),
+):
+    return logging_stats()
+
+
+@app.get("/system-administration/profiling/")
+async def get_profiling_config(
+    token: str = Depends(oauth2_scheme),
+    session: DBSession = Depends(get_db_session),
+    auth_user: Principal = Depends(authenticated_admin_user),
+):
+    return request_profiler.stats()
+
+
+@app.put("/system-administration/profiling/")
+async def update_profiling_config(
+    config: ProfilingConfig,
+    token: str = Depends(oauth2_scheme),
+    session: DBSession = Depends(get_db_session),
+    auth_user: Principal = Depends(authenticated_admin_user),
+):
+    """
+    Turns request profiling on or off, and changes which requests are profiled, without a restart.
+
+    Only the worker serving this request is reconfigured, and each worker keeps its own stacks: with
+    several workers, set the PROFILING_* settings and restart them instead.
+    """
+    request_profiler.configure(config)
+    return request_profiler.stats()
+
+
+@app.get("/system-administration/profiling/stacks/", response_class=PlainTextResponse)
+async def get_profiling_stacks(
+    reset: bool = False,
+    token: str = Depends(oauth2_scheme),
+    session: DBSession = Depends(get_db_session),
+    auth_user: Principal = Depends(authenticated_admin_user),
+):
+    """Aggregated collapsed stacks of the profiled requests, for flamegraph.pl or speedscope."""
+    collapsed = request_profiler.collapsed()
+    if reset:
+        request_profiler.clear()
+    return collapsed
+
+
 app.include_router(auth_router.router)
 app.include_router(user_router.router)
 app.include_router(user_admin_router.router)
@@ -0,0 +1,263 @@
+import functools
+import math
+import threading
+import time
+from bisect import bisect_left
+from typing import Any, Callable, Iterable, Iterator, Optional, Sequence
+
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+HASHING_BUCKETS = (0.01, 0.025, 0.05, 0.1, 0.2, 0.3, 0.5, 0.75, 1.0, 2.0, 5.0)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def _format_value(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+def _format_labels(label_names: Sequence[str], label_values: Sequence[Any]) -> str:
+    if not label_names:
+        return ""
+    pairs = []
+    for name, value in zip(label_names, label_values):
+        escaped = str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+        pairs.append(f'{name}="{escaped}"')
+    return "{" + ",".join(pairs) + "}"
+
+
+class _ShardedMetric:
+    """
+    Base for metrics aggregated per thread.
+
+    Every thread writes to its own shard, so recording a value takes no lock: a shard is only ever
+    mutated by the thread that owns it. The lock is taken once per thread, when its shard is created,
+    and at scrape time, when the shards are summed.
+    """
+
+    type_name = ""
+
+    def __init__(self, name: str, documentation: str, label_names: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = tuple(label_names)
+        self._local = threading.local()
+        self._shards: list[dict] = []
+        self._lock = threading.Lock()
+
+    def _shard(self) -> dict:
+        try:
+            return self._local.shard
+        except AttributeError:
+            shard: dict = {}
+            with self._lock:
+                self._shards.append(shard)
+            self._local.shard = shard
+            return shard
+
+    def _snapshots(self) -> list[list[tuple]]:
+        with self._lock:
+            shards = list(self._shards)
+        # copying a dict of plain keys happens under the GIL, so a concurrent write cannot tear it
+        return [list(shard.items()) for shard in shards]
+
+    def reset(self) -> None:
+        with self._lock:
+            for shard in self._shards:
+                shard.clear()
+
+    def samples(self) -> Iterator[str]:
+        raise NotImplementedError
+
+    def render(self) -> Iterator[str]:
+        yield f"# HELP {self.name} {self.documentation}"
+        yield f"# TYPE {self.name} {self.type_name}"
+        yield from self.samples()
+
+
+class Counter(_ShardedMetric):
+    type_name = "counter"
+
+    def inc(self, *label_values: Any, amount: float = 1.0) -> None:
+        shard = self._shard()
+        shard[label_values] = shard.get(label_values, 0.0) + amount
+
+    def values(self) -> dict[tuple, float]:
+        totals: dict[tuple, float] = {}
+        for snapshot in self._snapshots():
+            for label_values, value in snapshot:
+                totals[label_values] = totals.get(label_values, 0.0) + value
+        return totals
+
+    def value(self, *label_values: Any) -> float:
+        return self.values().get(label_values, 0.0)
+
+    def samples(self) -> Iterator[str]:
+        for label_values, value in sorted(self.values().items()):
+            yield f"{self.name}_total{_format_labels(self.label_names, label_values)} {_format_value(value)}"
+
+
+class Histogram(_ShardedMetric):
+    type_name = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        label_names: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_BUCKETS,
+    ):
+        super().__init__(name, documentation, label_names)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value: float, *label_values: Any) -> None:
+        shard = self._shard()
+        series = shard.get(label_values)
+        if series is None:
+            # one count per bucket plus +Inf, then the running sum
+            series = shard[label_values] = [0] * (len(self.buckets) + 1) + [0.0]
+        series[bisect_left(self.buckets, value)] += 1
+        series[-1] += value
+
+    def time(self, *label_values: Any) -> Callable:
+        """Decorator recording the duration of every call of the decorated function."""
+
+        def decorator(fn: Callable) -> Callable:
+            @functools.wraps(fn)
+            def wrapper(*args, **kwargs):
+                start = time.perf_counter()
+                try:
+                    return fn(*args, **kwargs)
+                finally:
+                    self.observe(time.perf_counter() - start, *label_values)
+
+            return wrapper
+
+        return decorator
+
+    def series(self) -> dict[tuple, tuple[list[int], float]]:
+        """Returns, per label set, the non-cumulative bucket counts (last one is +Inf) and the sum."""
+        totals: dict[tuple, list] = {}
+        for snapshot in self._snapshots():
+            for label_values, series in snapshot:
+                series = list(series)
+                total = totals.get(label_values)
+                if total is None:
+                    totals[label_values] = series
+                else:
+                    for index, value in enumerate(series):
+                        total[index] += value
+        return {label_values: (series[:-1], series[-1]) for label_values, series in totals.items()}
+
+    def count(self, *label_values: Any) -> int:
+        counts, _ = self.series().get(label_values, ([], 0.0))
+        return sum(counts)
+
+    def samples(self) -> Iterator[str]:
+        label_names = (*self.label_names, "le")
+        for label_values, (counts, total) in sorted(self.series().items()):
+            cumulative = 0
+            for upper_bound, count in zip((*self.buckets, math.inf), counts):
+                cumulative += count
+                labels = _format_labels(label_names, (*label_values, _format_value(upper_bound)))
+                yield f"{self.name}_bucket{labels} {cumulative}"
+            labels = _format_labels(self.label_names, label_values)
+            yield f"{self.name}_sum{labels} {_format_value(total)}"
+            yield f"{self.name}_count{labels} {cumulative}"
+
+
+class CallbackGauge:
+    """
+    Gauge read from existing stats when the registry is scraped, so nothing is recorded on the hot path.
+
+    `callback` returns either a single number, or a mapping of label value tuples to numbers.
+    """
+
+    type_name = "gauge"
+
+    def __init__(self, name: str, documentation: str, callback: Callable[[], Any], label_names: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.callback = callback
+        self.label_names = tuple(label_names)
+
+    def render(self) -> Iterator[str]:
+        yield f"# HELP {self.name} {self.documentation}"
+        yield f"# TYPE {self.name} {self.type_name}"
+        values = self.callback()
+        if not isinstance(values, dict):
+            values = {(): values}
+        for label_values, value in sorted(values.items()):
+            yield f"{self.name}{_format_labels(self.label_names, label_values)} {_format_value(value)}"
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._metrics: dict[str, Any] = {}
+        self._lock = threading.Lock()
+
+    def register(self, metric):
+        with self._lock:
+            if metric.name in self._metrics:
+                raise ValueError(f"Metric {metric.name} is already registered")
+            self._metrics[metric.name] = metric
+        return metric
+
+    def unregister(self, name: str) -> None:
+        with self._lock:
+            self._metrics.pop(name, None)
+
+    def get(self, name: str) -> Optional[Any]:
+        return self._metrics.get(name)
+
+    def metrics(self) -> Iterable:
+        with self._lock:
+            return list(self._metrics.values())
+
+    def render(self) -> str:
+        lines: list[str] = []
+        for metric in self.metrics():
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+registry = MetricsRegistry()
+
+http_request_duration = registry.register(
+    Histogram(
+        "http_request_duration_seconds",
+        "HTTP request latency by route template",
+        ("method", "route", "status"),
+    )
+)
+login_attempts = registry.register(Counter("login_attempts", "Password login attempts by outcome", ("outcome",)))
+token_refreshes = registry.register(Counter("token_refreshes", "Refresh token exchanges by outcome", ("outcome",)))
+password_hashing_duration = registry.register(
+    Histogram(
+        "password_hashing_duration_seconds",
+        "Time spent hashing or verifying a password, excluding the wait for a worker",
+        ("operation",),
+        buckets=HASHING_BUCKETS,
+    )
+)
+db_operation_duration = registry.register(
+    Histogram("db_operation_duration_seconds", "Duration of the functions in app.db.operations", ("operation",))
+)
+db_pool_checkout_wait = registry.register(
+    Histogram("db_pool_checkout_wait_seconds", "Time spent waiting for a pooled database connection")
+)
+token_decode_failures = registry.register(
+    Counter("token_decode_failures", "Access tokens rejected while decoding, by reason", ("reason",))
+)
+
+
+def timed_operation(histogram: Histogram) -> Callable[[Callable], Callable]:
+    """Decorator recording the duration of each call in `histogram`, labelled with the function name."""
+
+    def decorator(fn: Callable) -> Callable:
+        return histogram.time(fn.__name__)(fn)
+
+    return decorator
@@ -0,0 +1,181 @@
+import hmac
+import itertools
+import os
+import threading
+from collections import defaultdict
+from typing import Optional
+
+from pydantic import BaseModel, Field
+
+from app.settings import settings
+
+try:
+    import pyinstrument
+except ImportError:  # pragma: no cover - optional dependency
+    pyinstrument = None
+
+PROFILING_ENABLED = settings.PROFILING_ENABLED
+PROFILING_SAMPLE_EVERY = settings.PROFILING_SAMPLE_EVERY
+PROFILING_HEADER = settings.PROFILING_HEADER
+PROFILING_HEADER_SECRET = settings.PROFILING_HEADER_SECRET
+PROFILING_MAX_STACKS = settings.PROFILING_MAX_STACKS
+# cProfile call graphs can expand combinatorially into stacks: deeper stacks are cut, and call
+# paths carrying less time than this are not followed
+MAX_STACK_DEPTH = 64
+MIN_PATH_SECONDS = 1e-5
+
+
+class ProfilingConfig(BaseModel):
+    enabled: bool
+    # profile every Nth request, 0 profiles only requests carrying the profiling header and its secret
+    sample_every: int = Field(ge=0)
+    header_enabled: bool = True
+
+
+def frame_label(function: str, file_path: Optional[str], line_no: Optional[int]) -> str:
+    label = f"{function} ({os.path.basename(file_path)}:{line_no})" if file_path else function
+    # ";" separates frames in the collapsed format
+    return label.replace(";", ",")
+
+
+def pyinstrument_stacks(root_frame) -> dict[str, float]:
+    """Self time in seconds per call stack of a pyinstrument frame tree."""
+    stacks: dict[str, float] = defaultdict(float)
+
+    def walk(frame, path: tuple[str, ...]) -> None:
+        path = (*path, frame_label(frame.function, frame.file_path_short, frame.line_no))
+        self_time = frame.time - sum(child.time for child in frame.children)
+        if self_time > 0:
+            stacks[";".join(path)] += self_time
+        if len(path) < MAX_STACK_DEPTH:
+            for child in frame.children:
+                walk(child, path)
+
+    if root_frame is not None:
+        walk(root_frame, ())
+    return stacks
+
+
+def cprofile_stacks(stats: dict) -> dict[str, float]:
+    """
+    Self time in seconds per call stack, rebuilt from `pstats.Stats.stats`.
+
+    cProfile records caller -> callee edges rather than stacks, so a function's time is split between
+    its call paths in proportion to the cumulative time each caller spent in it (as gprof does).
+    Recursive calls are folded into their first occurrence on the stack, and paths carrying less than
+    `MIN_PATH_SECONDS` are dropped.
+    """
+    callees: dict[tuple, dict[tuple, float]] = defaultdict(dict)
+    for function, (_, _, _, _, callers) in stats.items():
+        for caller, caller_stats in callers.items():
+            callees[caller][function] = caller_stats[3]
+
+    stacks: dict[str, float] = defaultdict(float)
+
+    def walk(function: tuple, path: tuple[str, ...], on_path: frozenset, cumulative: float) -> None:
+        _, _, total_time, cumulative_time, _ = stats[function]
+        share = cumulative / cumulative_time if cumulative_time else 0.0
+        file_path, line_no, name = function
+        path = (*path, frame_label(name, None if file_path == "~" else file_path, line_no))
+        if total_time * share > 0:
+            stacks[";".join(path)] += total_time * share
+        if len(path) >= MAX_STACK_DEPTH:
+            return
+        for callee, callee_cumulative in callees[function].items():
+            if callee not in on_path and callee_cumulative * share >= MIN_PATH_SECONDS:
+                walk(callee, path, on_path | {callee}, callee_cumulative * share)
+
+    for function, (_, _, _, cumulative_time, callers) in stats.items():
+        if not callers:
+            walk(function, (), frozenset({function}), cumulative_time)
+    return stacks
+
+
+class RequestProfiler:
+    """
+    Decides which requests to profile and aggregates their call stacks, reconfigurable at runtime.
+
+    Requests are profiled with pyinstrument when it is installed: it follows the request's own task
+    across awaits. Otherwise the standard library cProfile is used, one request at a time, and its
+    profile also includes whatever other requests ran on the event loop meanwhile. Stacks are kept
+    per worker process as self time, in seconds, per collapsed stack.
+
+    A request asks to be profiled by sending `header` with `header_secret` as its value; without a
+    secret configured the header is ignored, so clients cannot make the server profile their requests.
+    The configuration is per worker process too.
+    """
+
+    def __init__(
+        self,
+        enabled: bool = PROFILING_ENABLED,
+        sample_every: int = PROFILING_SAMPLE_EVERY,
+        header: str = PROFILING_HEADER,
+        header_secret: Optional[str] = PROFILING_HEADER_SECRET,
+        header_enabled: bool = True,
+        max_stacks: int = PROFILING_MAX_STACKS,
+    ):
+        self.enabled = enabled
+        self.sample_every = sample_every
+        self.header = header.lower().encode("latin-1")
+        self.header_secret = header_secret.encode("latin-1") if header_secret else None
+        self.header_enabled = header_enabled
+        self.max_stacks = max_stacks
+        self.backend = "pyinstrument" if pyinstrument is not None else "cprofile"
+        self._requests = itertools.count(1)
+        self._stacks: dict[str, float] = defaultdict(float)
+        self._lock = threading.Lock()
+        self.profiled = 0
+        self.skipped = 0
+        self.dropped_stacks = 0
+
+    def configure(self, config: ProfilingConfig) -> None:
+        self.enabled = config.enabled
+        self.sample_every = config.sample_every
+        self.header_enabled = config.header_enabled
+
+    def should_profile(self, headers: list[tuple[bytes, bytes]]) -> bool:
+        if not self.enabled:
+            return False
+        if self.header_enabled and self.header_secret is not None:
+            for name, value in headers:
+                if name == self.header and hmac.compare_digest(value, self.header_secret):
+                    return True
+        return self.sample_every > 0 and next(self._requests) % self.sample_every == 0
+
+    def record(self, stacks: dict[str, float]) -> None:
+        with self._lock:
+            self.profiled += 1
+            for stack, seconds in stacks.items():
+                if stack not in self._stacks and len(self._stacks) >= self.max_stacks:
+                    self.dropped_stacks += 1
+                    continue
+                self._stacks[stack] += seconds
+
+    def collapsed(self) -> str:
+        """Collapsed stacks as read by flamegraph.pl and speedscope, weighted in microseconds."""
+        with self._lock:
+            stacks = sorted(self._stacks.items())
+        return "".join(f"{stack} {round(seconds * 1_000_000)}\n" for stack, seconds in stacks if seconds >= 5e-7)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._stacks.clear()
+            self.profiled = 0
+            self.skipped = 0
+            self.dropped_stacks = 0
+
+    def stats(self) -> dict:
+        return {
+            "enabled": self.enabled,
+            "sample_every": self.sample_every,
+            "header": self.header.decode("latin-1"),
+            "header_enabled": self.header_enabled,
+            "backend": self.backend,
+            "profiled_requests": self.profiled,
+            "skipped_requests": self.skipped,
+            "stacks": len(self._stacks),
+            "dropped_stacks": self.dropped_stacks,
+        }
+
+
+request_profiler = RequestProfiler()
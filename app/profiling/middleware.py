@@ -0,0 +1,58 @@
+import cProfile
+import pstats
+import threading
+
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+from . import cprofile_stacks, pyinstrument, pyinstrument_stacks, request_profiler
+
+# cProfile allows a single active profiler per process
+cprofile_lock = threading.Lock()
+
+
+class ProfilingMiddleware:
+    """
+    Pure ASGI middleware profiling the requests selected by `request_profiler`.
+
+    Requests that are not selected cost one attribute check while profiling is disabled. With the
+    cProfile backend, a request selected while another one is being profiled runs unprofiled.
+
+    Only the event loop thread is profiled. Password hashing runs on the hashing executor threads, and
+    with the sync DB mode queries are compiled and executed on the Starlette threadpool, so their frames
+    are missing: pyinstrument shows the time spent awaiting them under the awaiting function, and cProfile
+    does not show it at all. Their durations are in the password_hashing_duration_seconds and
+    db_operation_duration_seconds histograms on /metrics.
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or not request_profiler.should_profile(scope["headers"]):
+            await self.app(scope, receive, send)
+            return
+
+        if pyinstrument is not None:
+            profiler = pyinstrument.Profiler(async_mode="enabled")
+            profiler.start()
+            try:
+                await self.app(scope, receive, send)
+            finally:
+                session = profiler.stop()
+                request_profiler.record(pyinstrument_stacks(session.root_frame()))
+            return
+
+        if not cprofile_lock.acquire(blocking=False):
+            request_profiler.skipped += 1
+            await self.app(scope, receive, send)
+            return
+        profile = cProfile.Profile()
+        try:
+            profile.enable()
+            try:
+                await self.app(scope, receive, send)
+            finally:
+                profile.disable()
+        finally:
+            cprofile_lock.release()
+        request_profiler.record(cprofile_stacks(pstats.Stats(profile).stats))  # type: ignore[attr-defined]
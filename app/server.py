@@ -0,0 +1,181 @@
+"""
+Production entry point, tuned through the SERVER_* settings:
+
+    python -m app.server
+
+With gunicorn installed, the app is imported once in the master process and forked into uvicorn workers
+(SERVER_PRELOAD). Otherwise uvicorn's own supervisor spawns the workers, each importing the app. Either
+way, a worker that has served SERVER_MAX_REQUESTS requests or outgrown SERVER_MAX_MEMORY_MB shuts down
+gracefully and is replaced while the other workers keep serving.
+"""
+
+import inspect
+import logging
+import os
+import resource
+import signal
+import sys
+import time
+
+import uvicorn
+from starlette.types import ASGIApp, Receive, Scope, Send
+from uvicorn.supervisors import Multiprocess
+
+from app.db.connection import get_async_engine, get_engine
+from app.db.schema import create_tables
+from app.logging import restart_queue_listener
+from app.main import app
+from app.settings import settings
+
+try:
+    from gunicorn.app.base import BaseApplication
+    from uvicorn.workers import UvicornWorker
+except ImportError:  # pragma: no cover - optional dependency
+    BaseApplication = None
+
+SERVER_WORKERS = settings.SERVER_WORKERS or os.cpu_count() or 1
+SERVER_MAX_MEMORY_MB = settings.SERVER_MAX_MEMORY_MB
+SERVER_MEMORY_CHECK_INTERVAL_SECONDS = settings.SERVER_MEMORY_CHECK_INTERVAL_SECONDS
+PAGE_SIZE = os.sysconf("SC_PAGE_SIZE")
+# only recent uvicorn releases spread worker restarts with a jitter
+UVICORN_MAX_REQUESTS_JITTER = "limit_max_requests_jitter" in inspect.signature(uvicorn.Config).parameters
+
+logger = logging.getLogger(__name__)
+
+
+def resident_memory_bytes() -> int:
+    try:
+        with open("/proc/self/statm") as statm:
+            return int(statm.read().split()[1]) * PAGE_SIZE
+    except OSError:
+        # without /proc, fall back to the peak resident memory: KiB on Linux, bytes on macOS
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak if sys.platform == "darwin" else peak * 1024
+
+
+class MemoryRecyclingMiddleware:
+    """
+    Pure ASGI middleware asking its worker to shut down once resident memory exceeds `max_memory_bytes`.
+
+    Memory is read after a request at most every `check_interval` seconds. The worker sends itself SIGTERM,
+    which uvicorn handles as a graceful shutdown, and the supervisor starts a replacement. Only install it
+    under a supervisor: a standalone server would just stop.
+    """
+
+    def __init__(
+        self, app: ASGIApp, max_memory_bytes: int, check_interval: float = SERVER_MEMORY_CHECK_INTERVAL_SECONDS
+    ):
+        self.app = app
+        self.max_memory_bytes = max_memory_bytes
+        self.check_interval = check_interval
+        self._next_check = time.monotonic() + check_interval
+        self.recycling = False
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        await self.app(scope, receive, send)
+        if scope["type"] != "http" or self.recycling or time.monotonic() < self._next_check:
+            return
+        self._next_check = time.monotonic() + self.check_interval
+        memory = resident_memory_bytes()
+        if memory > self.max_memory_bytes:
+            self.recycling = True
+            logger.warning(f"Worker {os.getpid()} uses {memory >> 20} MiB of memory, restarting it")
+            os.kill(os.getpid(), signal.SIGTERM)
+
+
+def create_application() -> ASGIApp:
+    if SERVER_MAX_MEMORY_MB:
+        return MemoryRecyclingMiddleware(app, max_memory_bytes=SERVER_MAX_MEMORY_MB << 20)
+    return app
+
+
+def reset_after_fork() -> None:
+    """Drops the state a forked worker must not share with the master process."""
+    # pooled connections were opened by the master: forget them without closing the master's sockets
+    get_engine().dispose(close=False)
+    if get_async_engine.cache_info().currsize:
+        get_async_engine().sync_engine.dispose(close=False)
+    restart_queue_listener()
+
+
+def uvicorn_config(workers: int = SERVER_WORKERS) -> uvicorn.Config:
+    options = {}
+    if UVICORN_MAX_REQUESTS_JITTER:
+        options["limit_max_requests_jitter"] = settings.SERVER_MAX_REQUESTS_JITTER
+    return uvicorn.Config(
+        "app.server:create_application",
+        factory=True,
+        host=settings.SERVER_HOST,
+        port=settings.SERVER_PORT,
+        workers=workers,
+        loop=settings.SERVER_LOOP,
+        http=settings.SERVER_HTTP,
+        backlog=settings.SERVER_BACKLOG,
+        timeout_keep_alive=settings.SERVER_KEEPALIVE_SECONDS,
+        timeout_graceful_shutdown=settings.SERVER_GRACEFUL_TIMEOUT_SECONDS,
+        limit_max_requests=settings.SERVER_MAX_REQUESTS or None,
+        **options,
+    )
+
+
+def run_uvicorn(workers: int = SERVER_WORKERS) -> None:
+    """Runs the workers under uvicorn's supervisor, even a single one, so that recycled workers are replaced."""
+    config = uvicorn_config(workers)
+    Multiprocess(config, sockets=[config.bind_socket()]).run()
+
+
+def gunicorn_options(workers: int = SERVER_WORKERS) -> dict:
+    return {
+        "bind": f"{settings.SERVER_HOST}:{settings.SERVER_PORT}",
+        "workers": workers,
+        "preload_app": settings.SERVER_PRELOAD,
+        "backlog": settings.SERVER_BACKLOG,
+        "keepalive": settings.SERVER_KEEPALIVE_SECONDS,
+        "graceful_timeout": settings.SERVER_GRACEFUL_TIMEOUT_SECONDS,
+        "max_requests": settings.SERVER_MAX_REQUESTS,
+        "max_requests_jitter": settings.SERVER_MAX_REQUESTS_JITTER,
+        "post_fork": lambda arbiter, worker: reset_after_fork(),
+    }
+
+
+if BaseApplication is not None:
+
+    class AppUvicornWorker(UvicornWorker):
+        CONFIG_KWARGS = {"loop": settings.SERVER_LOOP, "http": settings.SERVER_HTTP}
+
+    class GunicornServer(BaseApplication):
+        def __init__(self, options: dict):
+            self.options = {**options, "worker_class": AppUvicornWorker}
+            super().__init__()
+
+        def load_config(self) -> None:
+            for name, value in self.options.items():
+                self.cfg.set(name, value)
+
+        def load(self) -> ASGIApp:
+            return create_application()
+
+
+def warn_about_per_worker_state(workers: int = SERVER_WORKERS) -> None:
+    if workers > 1 and settings.LOGIN_RATE_LIMIT_ENABLED and settings.LOGIN_RATE_LIMIT_BACKEND == "memory":
+        logger.warning(
+            "Login rate limits are counted per worker: with %d workers, each limit allows %d times as many "
+            "attempts. Set LOGIN_RATE_LIMIT_BACKEND=database to share them.",
+            workers,
+            workers,
+        )
+
+
+def main() -> None:
+    # create the tables once, before workers racing each other on startup would
+    with get_engine().begin() as connection:
+        create_tables(connection)
+    warn_about_per_worker_state()
+    if BaseApplication is not None:
+        GunicornServer(gunicorn_options()).run()
+    else:
+        run_uvicorn()
+
+
+if __name__ == "__main__":
+    main()
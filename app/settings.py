@@ -1,20 +1,129 @@
+from typing import Literal, Optional
+
 from fastapi.security import OAuth2PasswordBearer
 from passlib.context import CryptContext
+from pydantic import Field
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
 
 class Settings(BaseSettings):
     # DB
     DATABASE_URL: str
+    # Serve routes from an AsyncEngine/AsyncSession instead of the threadpool-bound sync Session
+    ASYNC_DB: bool = False
+    ASYNC_DATABASE_URL: Optional[str] = None  # derived from DATABASE_URL when not set
+    # Connection pool (not used for in-memory SQLite)
+    DB_POOL_SIZE: int = 5
+    DB_MAX_OVERFLOW: int = 10
+    DB_POOL_TIMEOUT: float = 30.0
+    DB_POOL_RECYCLE: int = 1800
+    DB_POOL_PRE_PING: bool = True
+    # Applied on every new connection
+    SQLITE_JOURNAL_MODE: str = "WAL"
+    SQLITE_SYNCHRONOUS: str = "NORMAL"
+    SQLITE_BUSY_TIMEOUT_MS: int = 5000
+    POSTGRES_STATEMENT_TIMEOUT_MS: Optional[int] = None
+
+    # User administration
+    USER_LIST_MAX_LIMIT: int = 1000
+    USER_STREAM_BATCH_SIZE: int = 1000
+    BULK_IMPORT_BATCH_SIZE: int = 500
+    BULK_IMPORT_MAX_ROWS: int = 50_000
+    BULK_MUTATION_CHUNK_SIZE: int = 500
 
     # JWT Token
     SECRET_KEY: str
     ALGORITHM: str
+    # PEM private key signing tokens when ALGORITHM is asymmetric (ES256, RS256, ...)
+    JWT_PRIVATE_KEY_FILE: Optional[str] = None
+    # PEM public keys rotated out but still accepted until their tokens expire
+    JWT_PREVIOUS_PUBLIC_KEY_FILES: list[str] = []
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 30
+    REFRESH_TOKEN_EXPIRE_DAYS: int = 14
+    # How often each worker pulls the access token revocations and role changes made by other workers,
+    # and deletes the expired refresh tokens
+    REVOCATION_SYNC_INTERVAL_SECONDS: float = 10.0
+    # Most tokens accepted by one batch introspection request
+    INTROSPECTION_MAX_BATCH_SIZE: int = 100
+
+    # Login throttling: attempts allowed per sliding window, by username and by client IP
+    LOGIN_RATE_LIMIT_ENABLED: bool = True
+    # memory: counted per worker, so each limit is effectively multiplied by SERVER_WORKERS;
+    # database: counted in the RateLimitWindow table, shared by all workers
+    LOGIN_RATE_LIMIT_BACKEND: Literal["memory", "database"] = "memory"
+    LOGIN_RATE_LIMIT_WINDOW_SECONDS: float = Field(default=60.0, gt=0)
+    # per account, whether it is named by username or email; turn throttling off with LOGIN_RATE_LIMIT_ENABLED
+    LOGIN_RATE_LIMIT_PER_USERNAME: int = Field(default=10, ge=1)
+    LOGIN_RATE_LIMIT_PER_IP: int = Field(default=30, ge=1)
+    LOGIN_RATE_LIMIT_MAX_KEYS: int = 100_000  # memory backend, least recently used keys are evicted
+    # Build principals from token claims on protected routes instead of loading the user from the DB
+    STATELESS_AUTH: bool = False
+    # Cache principals resolved from the DB, keyed by a fingerprint of the bearer token
+    PRINCIPAL_CACHE_ENABLED: bool = False
+    PRINCIPAL_CACHE_MAX_SIZE: int = 10_000
+    PRINCIPAL_CACHE_TTL_SECONDS: float = 60.0
 
     # Logging
     LOG_FILE_LOCATION: str
     ENABLE_CLIENT_LOGGING: bool
+    # Records are written by a background thread; when the queue is full they are dropped or the caller blocks
+    LOG_QUEUE_SIZE: int = 10_000
+    LOG_QUEUE_FULL_POLICY: Literal["drop", "block"] = "drop"
+    LOG_BATCH_SIZE: int = 100
+    # Fraction of requests written to the access log, by outcome
+    ACCESS_LOG_SUCCESS_SAMPLE_RATE: float = 1.0
+    ACCESS_LOG_ERROR_SAMPLE_RATE: float = 1.0
+
+    # Password hashing profile: hashes made with another scheme or fewer bcrypt rounds are upgraded on login
+    PASSWORD_HASH_SCHEME: Literal["bcrypt", "argon2"] = "bcrypt"
+    BCRYPT_ROUNDS: int = 12
+    # argon2id parameters, the argon2 scheme needs the argon2 extra (argon2-cffi)
+    ARGON2_TIME_COST: int = 3
+    ARGON2_MEMORY_COST_KIB: int = 65536
+    ARGON2_PARALLELISM: int = 4
+    # Logins for unknown users verify against a dummy hash, so their timing does not reveal which accounts exist.
+    # "unless_throttled" skips that work once a caller has fewer than UNKNOWN_USER_VERIFY_MIN_REMAINING attempts left,
+    # which saves CPU but lets those last attempts tell existing accounts from unknown ones by their response time
+    UNKNOWN_USER_VERIFY_POLICY: Literal["always", "unless_throttled", "never"] = "always"
+    UNKNOWN_USER_VERIFY_MIN_REMAINING: int = 3
+
+    # Password hashing executor
+    HASHING_MAX_WORKERS: Optional[int] = None  # defaults to the number of CPU cores
+    HASHING_MAX_QUEUE: int = 64
+    HASHING_RETRY_AFTER_SECONDS: int = 1
+
+    # Serialize JSON responses with orjson (needs the fast-json extra) instead of the stdlib json module
+    FAST_JSON_RESPONSES: bool = False
+
+    # Production server, `python -m app.server`: gunicorn with uvicorn workers when installed, else uvicorn alone
+    SERVER_HOST: str = "0.0.0.0"
+    SERVER_PORT: int = 8000
+    SERVER_WORKERS: Optional[int] = None  # defaults to the number of CPU cores
+    SERVER_LOOP: Literal["auto", "asyncio", "uvloop"] = "auto"  # auto picks uvloop when installed
+    SERVER_HTTP: Literal["auto", "h11", "httptools"] = "auto"  # auto picks httptools when installed
+    SERVER_BACKLOG: int = 2048
+    SERVER_KEEPALIVE_SECONDS: int = 5
+    SERVER_GRACEFUL_TIMEOUT_SECONDS: int = 30
+    SERVER_PRELOAD: bool = True  # gunicorn only: import the app once in the master process, then fork workers
+    # Workers are replaced one at a time, the others keep serving: after a number of requests, plus a random
+    # jitter so they do not all restart together, or once their resident memory grows past a limit (0 disables)
+    SERVER_MAX_REQUESTS: int = 10_000
+    SERVER_MAX_REQUESTS_JITTER: int = 1_000
+    SERVER_MAX_MEMORY_MB: int = 0
+    SERVER_MEMORY_CHECK_INTERVAL_SECONDS: float = 10.0
+
+    # Prometheus metrics, served on /metrics only to scrapers sending "Authorization: Bearer <METRICS_TOKEN>":
+    # without a token the endpoint is not served. Values are per worker process, see the README
+    METRICS_ENABLED: bool = True
+    METRICS_TOKEN: Optional[str] = None
+
+    # Request profiling, reconfigurable at runtime on /system-administration/profiling/
+    PROFILING_ENABLED: bool = False
+    PROFILING_SAMPLE_EVERY: int = 0  # profile every Nth request, 0 profiles only requests sending PROFILING_HEADER
+    PROFILING_HEADER: str = "X-Profile"
+    # value PROFILING_HEADER must carry for a request to be profiled, the header is ignored when unset
+    PROFILING_HEADER_SECRET: Optional[str] = None
+    PROFILING_MAX_STACKS: int = 10_000  # distinct call stacks kept, later new stacks are dropped
 
     model_config = SettingsConfigDict(env_file=".env")
 
@@ -38,8 +147,40 @@ class TestSettings(Settings):
 settings = Settings()  # type: ignore[call-arg]
 test_settings = TestSettings()  # type: ignore[call-arg]
 
+
 # Hashing
-pwd_context: CryptContext = CryptContext(schemes=["bcrypt"], deprecated="auto")
+PASSWORD_HASH_SCHEMES = ["bcrypt", "argon2"]
+
+
+def build_pwd_context(
+    scheme: str = settings.PASSWORD_HASH_SCHEME,
+    bcrypt_rounds: int = settings.BCRYPT_ROUNDS,
+    argon2_time_cost: int = settings.ARGON2_TIME_COST,
+    argon2_memory_cost_kib: int = settings.ARGON2_MEMORY_COST_KIB,
+    argon2_parallelism: int = settings.ARGON2_PARALLELISM,
+) -> CryptContext:
+    """
+    Builds a context hashing with `scheme`, that still verifies hashes made with the other schemes.
+
+    Those, and bcrypt hashes below `bcrypt_rounds`, are reported by `verify_and_update` as needing a rehash.
+    """
+    context = CryptContext(
+        schemes=[scheme, *(other for other in PASSWORD_HASH_SCHEMES if other != scheme)],
+        default=scheme,
+        deprecated="auto",
+        bcrypt__rounds=bcrypt_rounds,
+        bcrypt__min_rounds=bcrypt_rounds,
+        argon2__type="ID",
+        argon2__rounds=argon2_time_cost,
+        argon2__memory_cost=argon2_memory_cost_kib,
+        argon2__parallelism=argon2_parallelism,
+    )
+    if not context.handler(scheme).has_backend():
+        raise RuntimeError(f"No backend installed for the {scheme} password hash scheme")
+    return context
+
+
+pwd_context: CryptContext = build_pwd_context()
 
 # OAuth 2.0
 oauth2_scheme: OAuth2PasswordBearer = OAuth2PasswordBearer(tokenUrl="auth/token")
@@ -0,0 +1,108 @@
+import csv
+import io
+import json
+from typing import Any, Sequence
+
+from pydantic import ValidationError
+
+from app.auth.hashing import HashingPoolSaturatedError, hash_passwords
+from app.db.async_operations import find_existing_identities, insert_users
+from app.db.connection import DBSession
+from app.db.operations import normalize_identity
+from app.settings import settings
+from app.users.models import BulkImportResponse, BulkRowError, UserWithRoleCreate
+
+BULK_IMPORT_BATCH_SIZE = settings.BULK_IMPORT_BATCH_SIZE
+
+
+class BulkUploadError(Exception):
+    pass
+
+
+def parse_bulk_upload(body: bytes, content_type: str) -> list[Any]:
+    """Decodes a JSON array, NDJSON or CSV upload into a list of raw (not yet validated) rows."""
+    media_type = content_type.split(";")[0].strip().lower()
+    try:
+        text = body.decode("utf-8-sig")
+        if media_type == "text/csv":
+            return list(csv.DictReader(io.StringIO(text)))
+        if media_type in ("application/x-ndjson", "application/jsonl"):
+            return [json.loads(line) for line in text.splitlines() if line.strip()]
+        if media_type == "application/json":
+            rows = json.loads(text)
+            if not isinstance(rows, list):
+                raise BulkUploadError("Expected a JSON array of users")
+            return rows
+    except (UnicodeDecodeError, json.JSONDecodeError, csv.Error) as exc:
+        raise BulkUploadError(f"Malformed upload: {exc}")
+    raise BulkUploadError(f"Unsupported content type: {media_type or 'none'}")
+
+
+async def import_users(
+    session: DBSession, rows: Sequence[Any], batch_size: int = BULK_IMPORT_BATCH_SIZE
+) -> BulkImportResponse:
+    """
+    Validates, hashes and inserts `rows` batch by batch.
+
+    Rows clashing with an existing user or with an earlier row of the same upload are reported as
+    conflicts and skipped without hashing their password; the rest of the batch is still inserted.
+
+    Each batch is committed on its own. When the hashing pool is saturated, the import stops before the
+    current batch and the report covers the batches already committed, with `retry_from_row` set to the
+    first row that was not imported.
+    """
+    created = 0
+    conflicts: list[BulkRowError] = []
+    invalid: list[BulkRowError] = []
+    seen_usernames: set[str] = set()
+    seen_emails: set[str] = set()
+
+    for batch_start in range(0, len(rows), batch_size):
+        batch_end = batch_start + batch_size
+        batch: list[tuple[int, UserWithRoleCreate]] = []
+        for row_number, raw_row in enumerate(rows[batch_start:batch_end], start=batch_start + 1):
+            try:
+                batch.append((row_number, UserWithRoleCreate.model_validate(raw_row)))
+            except ValidationError as exc:
+                invalid.append(BulkRowError(row=row_number, detail=str(exc.errors(include_url=False)[0]["msg"])))
+
+        existing_usernames, existing_emails = await find_existing_identities(
+            session=session,
+            usernames=[user.username for _, user in batch],
+            emails=[user.email for _, user in batch],
+        )
+        accepted: list[tuple[int, UserWithRoleCreate]] = []
+        for row_number, user in batch:
+            username, email = normalize_identity(user.username), normalize_identity(user.email)
+            if username in existing_usernames or username in seen_usernames:
+                conflicts.append(BulkRowError(row=row_number, detail="Username already exists"))
+            elif email in existing_emails or email in seen_emails:
+                conflicts.append(BulkRowError(row=row_number, detail="Email already exists"))
+            else:
+                accepted.append((row_number, user))
+            seen_usernames.add(username)
+            seen_emails.add(email)
+
+        try:
+            hashed_passwords = await hash_passwords([user.password for _, user in accepted])
+        except HashingPoolSaturatedError:
+            retry_from_row = batch_start + 1
+            return BulkImportResponse(
+                created=created,
+                conflicts=sorted(
+                    (error for error in conflicts if error.row < retry_from_row), key=lambda error: error.row
+                ),
+                invalid=[error for error in invalid if error.row < retry_from_row],
+                retry_from_row=retry_from_row,
+            )
+        insert_rows = [
+            {"username": user.username, "email": user.email, "hashed_password": hashed_password, "role": user.role}
+            for (_, user), hashed_password in zip(accepted, hashed_passwords)
+        ]
+        rejected_positions = await insert_users(session=session, rows=insert_rows)
+        for position in rejected_positions:
+            conflicts.append(BulkRowError(row=accepted[position][0], detail="Username or email already exists"))
+        created += len(insert_rows) - len(rejected_positions)
+
+    conflicts.sort(key=lambda error: error.row)
+    return BulkImportResponse(created=created, conflicts=conflicts, invalid=invalid)
@@ -1,92 +1,208 @@
-from typing import Optional, Type
+import json
+from typing import AsyncIterator, Optional, Sequence
 
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response, status
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
+from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.db.connection import get_session
-from app.db.operations import (
-    UserExistsError,
-    UserNotFoundError,
+from app.db.async_operations import (
     add_user,
+    bulk_delete_users,
+    bulk_update_role,
     delete_user_data,
-    get_all_users,
     get_user_by_id,
+    get_users_page,
+    select_user_ids,
+    stream_user_row_batches,
     update_user_data,
 )
+from app.db.connection import DBSession, get_db_session
+from app.db.operations import UserExistsError, UserNotFoundError
+from app.db.schema import Role
 from app.db.schema import User as db_User
-from app.settings import oauth2_scheme
-from app.users.models import UserWithRoleCreate, UserWithRoleResponse
+from app.settings import oauth2_scheme, settings
+from app.users.models import (
+    BulkDeleteResponse,
+    BulkImportResponse,
+    BulkRoleUpdate,
+    BulkUpdateResponse,
+    BulkUserSelection,
+    UserWithRoleCreate,
+    UserWithRoleResponse,
+    user_list_adapter,
+)
 from app.users.permissions import authenticated_admin_user
+from app.users.principal import Principal
+
+from .bulk import BulkUploadError, import_users, parse_bulk_upload
 
 router = APIRouter()
 
 
 @router.post("/users/", status_code=status.HTTP_201_CREATED)
-def create_user(
+async def create_user(
     user: UserWithRoleCreate,
     token: str = Depends(oauth2_scheme),
-    session: Session = Depends(get_session),
-    auth_user: db_User = Depends(authenticated_admin_user),
+    session: DBSession = Depends(get_db_session),
+    auth_user: Principal = Depends(authenticated_admin_user),
 ) -> UserWithRoleResponse:
 
-    new_user: db_User = add_user(
+    new_user: db_User = await add_user(
         session=session, username=user.username, email=user.email, password=user.password, role=user.role
     )
 
     if not new_user:
         raise HTTPException(status.HTTP_409_CONFLICT, detail="Username or email already exists")
 
-    response = UserWithRoleResponse(
-        id=new_user.id, username=new_user.username, email=new_user.email, role=new_user.role
-    )
+    response = UserWithRoleResponse.model_validate(new_user)
 
     return response
 
 
+async def user_rows_ndjson(
+    session: DBSession, role: Optional[Role] = None, username_prefix: Optional[str] = None
+) -> AsyncIterator[str]:
+    try:
+        async for batch in stream_user_row_batches(session=session, role=role, username_prefix=username_prefix):
+            yield "".join(
+                json.dumps({"id": uid, "username": username, "email": email, "role": Role(user_role).value}) + "\n"
+                for uid, username, email, user_role in batch
+            )
+    finally:
+        # the stream outlives the request scope, release its connection once it is done
+        if isinstance(session, AsyncSession):
+            await session.close()
+        else:
+            await run_in_threadpool(session.close)
+
+
 @router.get("/users/")
-def get_user_list(
+async def get_user_list(
+    limit: Optional[int] = Query(
+        default=None,
+        ge=1,
+        le=settings.USER_LIST_MAX_LIMIT,
+        description="Page size, every matching user is returned when it is not given",
+    ),
+    after: Optional[int] = Query(default=None, description="Return users with an id greater than this cursor"),
+    role: Optional[Role] = None,
+    username_prefix: Optional[str] = None,
+    stream: bool = Query(default=False, description="Stream all matching users as NDJSON, ignoring limit/after"),
     token: str = Depends(oauth2_scheme),
-    session: Session = Depends(get_session),
-    auth_user: db_User = Depends(authenticated_admin_user),
+    session: DBSession = Depends(get_db_session),
+    auth_user: Principal = Depends(authenticated_admin_user),
 ) -> list[UserWithRoleResponse]:
 
-    users: list[Type[db_User]] = get_all_users(session=session)
+    if stream:
+        return StreamingResponse(
+            user_rows_ndjson(session=session, role=role, username_prefix=username_prefix),
+            media_type="application/x-ndjson",
+        )
 
-    response = [
-        UserWithRoleResponse(id=user.id, username=user.username, email=user.email, role=user.role) for user in users
-    ]
+    users: Sequence[db_User] = await get_users_page(
+        session=session, limit=limit, after=after, role=role, username_prefix=username_prefix
+    )
+    # clients that do not ask for a page keep getting the whole list, without a cursor
+    headers = {"X-Next-Cursor": str(users[-1].id)} if limit is not None and len(users) == limit else None
 
-    return response
+    # the page is validated from the ORM users and dumped to JSON in a single pass, skipping the response
+    # model round trip through jsonable_encoder
+    content = user_list_adapter.dump_json(user_list_adapter.validate_python(users, from_attributes=True))
+    return Response(content=content, media_type="application/json", headers=headers)
+
+
+@router.post("/users/bulk/", response_model_exclude_none=True)
+async def bulk_create_users(
+    request: Request,
+    response: Response,
+    token: str = Depends(oauth2_scheme),
+    session: DBSession = Depends(get_db_session),
+    auth_user: Principal = Depends(authenticated_admin_user),
+) -> BulkImportResponse:
+    """Creates users from a JSON array, NDJSON or CSV (username,email,password,role) upload."""
+    try:
+        rows = parse_bulk_upload(await request.body(), request.headers.get("content-type", ""))
+    except BulkUploadError as exc:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(exc))
+    if len(rows) > settings.BULK_IMPORT_MAX_ROWS:
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail=f"Bulk uploads are limited to {settings.BULK_IMPORT_MAX_ROWS} users",
+        )
+
+    report = await import_users(session=session, rows=rows)
+    if report.retry_from_row is not None:
+        # the batches before retry_from_row are committed, the client should upload the remaining rows later
+        response.status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+        response.headers["Retry-After"] = str(settings.HASHING_RETRY_AFTER_SECONDS)
+    return report
+
+
+async def resolve_selection(session: DBSession, selection: BulkUserSelection, auth_user: Principal) -> list[int]:
+    """Ids of the selected users, leaving out the calling admin so that they cannot delete or demote themselves."""
+    user_filter = selection.filter
+    ids = await select_user_ids(
+        session=session,
+        ids=selection.ids,
+        role=user_filter.role if user_filter else None,
+        username_prefix=user_filter.username_prefix if user_filter else None,
+    )
+    return [uid for uid in ids if uid != auth_user.id]
+
+
+@router.patch("/users/bulk/")
+async def bulk_update_users(
+    update: BulkRoleUpdate,
+    token: str = Depends(oauth2_scheme),
+    session: DBSession = Depends(get_db_session),
+    auth_user: Principal = Depends(authenticated_admin_user),
+) -> BulkUpdateResponse:
+    ids = await resolve_selection(session=session, selection=update, auth_user=auth_user)
+    updated = await bulk_update_role(session=session, ids=ids, role=update.role)
+    return BulkUpdateResponse(matched=len(ids), updated=updated)
+
+
+@router.post("/users/bulk/delete/")
+async def bulk_delete(
+    selection: BulkUserSelection,
+    token: str = Depends(oauth2_scheme),
+    session: DBSession = Depends(get_db_session),
+    auth_user: Principal = Depends(authenticated_admin_user),
+) -> BulkDeleteResponse:
+    ids = await resolve_selection(session=session, selection=selection, auth_user=auth_user)
+    deleted = await bulk_delete_users(session=session, ids=ids)
+    return BulkDeleteResponse(deleted=deleted)
 
 
 @router.get("/users/{uid}")
-def get_user(
+async def get_user(
     uid: int,
     token: str = Depends(oauth2_scheme),
-    session: Session = Depends(get_session),
-    auth_user: db_User = Depends(authenticated_admin_user),
+    session: DBSession = Depends(get_db_session),
+    auth_user: Principal = Depends(authenticated_admin_user),
 ) -> UserWithRoleResponse:
 
-    user: Optional[db_User] = get_user_by_id(uid=uid, session=session)
+    user: Optional[db_User] = await get_user_by_id(uid=uid, session=session)
     if not user:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="User not found")
 
-    response = UserWithRoleResponse(id=user.id, username=user.username, email=user.email, role=user.role)
+    response = UserWithRoleResponse.model_validate(user)
 
     return response
 
 
 @router.patch("/users/{uid}")
-def update_user(
+async def update_user(
     uid: int,
     update_data: dict,
     token: str = Depends(oauth2_scheme),
-    session: Session = Depends(get_session),
-    auth_user: db_User = Depends(authenticated_admin_user),
+    session: DBSession = Depends(get_db_session),
+    auth_user: Principal = Depends(authenticated_admin_user),
 ) -> UserWithRoleResponse:
 
     try:
-        user: Optional[db_User] = update_user_data(uid=uid, update_data=update_data, session=session)
+        user: Optional[db_User] = await update_user_data(uid=uid, update_data=update_data, session=session)
     except UserNotFoundError:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="User not found")
     except UserExistsError:
@@ -94,20 +210,20 @@ def update_user(
             status_code=status.HTTP_400_BAD_REQUEST, detail="User with provided username or email already exists"
         )
 
-    response = UserWithRoleResponse(id=user.id, username=user.username, email=user.email, role=user.role)
+    response = UserWithRoleResponse.model_validate(user)
 
     return response
 
 
 @router.delete("/users/{uid}", status_code=status.HTTP_204_NO_CONTENT)
-def delete_user(
+async def delete_user(
     uid: int,
     token: str = Depends(oauth2_scheme),
-    session: Session = Depends(get_session),
-    auth_user: db_User = Depends(authenticated_admin_user),
+    session: DBSession = Depends(get_db_session),
+    auth_user: Principal = Depends(authenticated_admin_user),
 ):
     try:
-        delete_user_data(uid=uid, session=session)
+        await delete_user_data(uid=uid, session=session)
     except UserNotFoundError:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="User not found")
     return {}
@@ -1,4 +1,6 @@
-from pydantic import BaseModel
+from typing import Optional
+
+from pydantic import BaseModel, ConfigDict, TypeAdapter, model_validator
 
 from app.db.schema import Role
 
@@ -21,8 +23,66 @@ class UserWithRoleCreate(UserWithRole):
 
 
 class UserResponse(User):
+    # built straight from ORM users, rows and principals with model_validate
+    model_config = ConfigDict(from_attributes=True)
+
     id: int
 
 
 class UserWithRoleResponse(UserWithRole):
+    model_config = ConfigDict(from_attributes=True)
+
     id: int
+
+
+# validates and serializes a whole page of users to JSON in one call, outside of FastAPI's encoder
+user_list_adapter = TypeAdapter(list[UserWithRoleResponse])
+
+
+class BulkRowError(BaseModel):
+    row: int
+    detail: str
+
+
+class BulkImportResponse(BaseModel):
+    created: int
+    conflicts: list[BulkRowError]
+    invalid: list[BulkRowError]
+    # set when the import stopped early: rows from this one on were not imported and can be uploaded again
+    retry_from_row: Optional[int] = None
+
+
+class UserFilter(BaseModel):
+    role: Optional[Role] = None
+    username_prefix: Optional[str] = None
+
+    @model_validator(mode="after")
+    def check_not_empty(self):
+        # a filter without criteria would select every user
+        if self.role is None and not self.username_prefix:
+            raise ValueError("Provide a role or a non-empty username_prefix")
+        return self
+
+
+class BulkUserSelection(BaseModel):
+    ids: Optional[list[int]] = None
+    filter: Optional[UserFilter] = None
+
+    @model_validator(mode="after")
+    def check_ids_or_filter(self):
+        if (self.ids is None) == (self.filter is None):
+            raise ValueError("Provide either ids or filter")
+        return self
+
+
+class BulkRoleUpdate(BulkUserSelection):
+    role: Role
+
+
+class BulkUpdateResponse(BaseModel):
+    matched: int
+    updated: int
+
+
+class BulkDeleteResponse(BaseModel):
+    deleted: int
@@ -1,53 +1,70 @@
+import time
+
 from fastapi import Depends, HTTPException, status
-from sqlalchemy.orm import Session
 
-from app.auth.token import decode_access_token
-from app.db.connection import get_session
+from app.auth.token import (
+    decode_access_token_claims,
+    principal_from_claims,
+    resolve_principal,
+)
+from app.db.connection import DBSession, get_db_session, run_db
 from app.db.schema import Role
-from app.db.schema import User as db_User
+from app.logging.middleware import add_auth_time
 from app.settings import oauth2_scheme, settings
-
-SECRET_KEY = settings.SECRET_KEY
-ALGORITHM = settings.ALGORITHM
+from app.users.principal import Principal
 
 
-def authenticated_user(
+async def authenticated_user(
     token: str = Depends(oauth2_scheme),
-    session: Session = Depends(get_session),
-) -> db_User:
-    auth_user = decode_access_token(
-        token=token, session=session, secret_key=settings.SECRET_KEY, algorithms=settings.ALGORITHM
-    )
-    if not auth_user:
-        if not auth_user:
+    session: DBSession = Depends(get_db_session),
+) -> Principal:
+    start = time.perf_counter()
+    try:
+        return await resolve_authenticated_user(token=token, session=session)
+    finally:
+        add_auth_time(time.perf_counter() - start)
+
+
+async def resolve_authenticated_user(token: str, session: DBSession) -> Principal:
+    if settings.STATELESS_AUTH:
+        claims = decode_access_token_claims(token=token)
+        if not claims:
             raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Unauthorized access")
-    return auth_user
+        principal = principal_from_claims(claims)
+        if principal:
+            return principal
+
+    # a column-only lookup: no ORM identity, and the password hash is never loaded
+    principal = await run_db(session, resolve_principal, token=token)
+    if not principal:
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Unauthorized access")
+    return principal
 
 
-def authenticated_staff_user(
+async def authenticated_staff_user(
     token: str = Depends(oauth2_scheme),
-    session: Session = Depends(get_session),
-) -> db_User:
-    auth_user = authenticated_user(token=token, session=session)
+    session: DBSession = Depends(get_db_session),
+) -> Principal:
+    auth_user = await authenticated_user(token=token, session=session)
     if auth_user.role != Role.staff:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Unauthorized access")
     return auth_user
 
 
-def authenticated_admin_user(
+async def authenticated_admin_user(
     token: str = Depends(oauth2_scheme),
-    session: Session = Depends(get_session),
-) -> db_User:
-    auth_user: db_User = authenticated_user(token=token, session=session)
+    session: DBSession = Depends(get_db_session),
+) -> Principal:
+    auth_user: Principal = await authenticated_user(token=token, session=session)
     if auth_user.role != Role.admin:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Unauthorized access")
     return auth_user
 
 
-def authenticated_staff_or_admin_user(
-    token: str = Depends(oauth2_scheme), session: Session = Depends(get_session)
-) -> db_User:
-    auth_user: db_User = authenticated_user(token=token, session=session)
+async def authenticated_staff_or_admin_user(
+    token: str = Depends(oauth2_scheme), session: DBSession = Depends(get_db_session)
+) -> Principal:
+    auth_user: Principal = await authenticated_user(token=token, session=session)
     if auth_user.role not in [Role.staff, Role.admin]:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Unauthorized access")
 
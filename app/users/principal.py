@@ -0,0 +1,29 @@
+from dataclasses import dataclass
+from typing import Optional, Union
+
+from sqlalchemy import Row
+
+from app.db.schema import Role
+from app.db.schema import User as db_User
+
+
+@dataclass(frozen=True, slots=True)
+class Principal:
+    """Lightweight, immutable view of an authenticated user, detached from any DB session."""
+
+    id: int
+    username: str
+    role: Role
+    email: Optional[str] = None
+    token_version: int = 0
+
+    @classmethod
+    def from_user(cls, user: Union[db_User, Row]) -> "Principal":
+        """Accepts a user or a row carrying the same columns, such as `get_principal_row`'s."""
+        return cls(
+            id=user.id,
+            username=user.username,
+            role=Role(user.role),
+            email=user.email,
+            token_version=user.token_version or 0,
+        )
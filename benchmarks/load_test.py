@@ -0,0 +1,266 @@
+"""
+Load test of the auth and user endpoints against a local uvicorn server, with JSON baselines.
+
+    python -m benchmarks.load_test run --users 200 --concurrency 32 --output baseline.json
+    python -m benchmarks.load_test run --output current.json
+    python -m benchmarks.load_test compare baseline.json current.json --threshold 0.1
+
+`run` recreates the tables of `--database-url`, seeds the users through `app.db.operations`, starts uvicorn
+on it and records p50/p95/p99 latency and throughput of each scenario. Login rate limiting is disabled on the
+server, every request would otherwise come from the same client IP. `compare` exits with status 1 when a
+scenario's latency grew, or its throughput dropped, by more than the threshold.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+from datetime import UTC, datetime
+from itertools import cycle
+
+import httpx
+
+PASSWORD = "Load-Test-Password-2025"
+ADMIN_USERNAME = "loadtest_admin"
+SCENARIOS = ["login", "users_me", "financial_markets", "user_list"]
+LATENCY_METRICS = ["p50_ms", "p95_ms", "p99_ms"]
+# users logging in during setup, their tokens are shared by the authenticated scenarios
+TOKEN_POOL_SIZE = 50
+
+
+def seed_users(database_url: str, users: int) -> None:
+    """Recreates the tables and inserts `users` basic users plus one admin, all with the same password."""
+    # app.settings reads DATABASE_URL when first imported
+    os.environ["DATABASE_URL"] = database_url
+    from sqlalchemy.orm import Session
+
+    from app.db.connection import get_engine
+    from app.db.operations import insert_users
+    from app.db.schema import Base, Role
+    from app.settings import pwd_context
+
+    engine = get_engine()
+    Base.metadata.drop_all(bind=engine)
+    Base.metadata.create_all(bind=engine)
+    hashed_password = pwd_context.hash(PASSWORD)
+    usernames = [*(f"loadtest_{i}" for i in range(users)), ADMIN_USERNAME]
+    rows = [
+        {
+            "username": username,
+            "email": f"{username}@example.com",
+            "hashed_password": hashed_password,
+            "role": Role.admin if username == ADMIN_USERNAME else Role.basic,
+        }
+        for username in usernames
+    ]
+    with Session(engine) as session:
+        insert_users(session=session, rows=rows)
+    engine.dispose()
+
+
+def start_server(database_url: str, host: str, port: int, extra_env: dict) -> subprocess.Popen:
+    env = {**os.environ, "DATABASE_URL": database_url, "LOGIN_RATE_LIMIT_ENABLED": "false", **extra_env}
+    command = [sys.executable, "-m", "uvicorn", "app.main:app", "--host", host, "--port", str(port)]
+    return subprocess.Popen([*command, "--no-access-log", "--log-level", "warning"], env=env)
+
+
+async def wait_until_ready(client: httpx.AsyncClient, server: subprocess.Popen, timeout: float = 30.0) -> None:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if server.poll() is not None:
+            raise RuntimeError(f"uvicorn exited with status {server.returncode}")
+        try:
+            if (await client.get("/")).status_code == 200:
+                return
+        except httpx.TransportError:
+            pass
+        await asyncio.sleep(0.2)
+    raise RuntimeError(f"uvicorn did not start within {timeout:.0f}s")
+
+
+async def login(client: httpx.AsyncClient, username: str) -> str:
+    response = await client.post("/auth/token/", data={"username": username, "password": PASSWORD})
+    response.raise_for_status()
+    return response.json()["access_token"]
+
+
+def build_requests(scenario: str, usernames: list[str], user_tokens: list[str], admin_token: str):
+    """Endless iterator of (method, url, keyword arguments) for `scenario`."""
+    if scenario == "login":
+        return (
+            ("POST", "/auth/token/", {"data": {"username": name, "password": PASSWORD}}) for name in cycle(usernames)
+        )
+    if scenario == "user_list":
+        return cycle([("GET", "/users/", {"headers": {"Authorization": f"Bearer {admin_token}"}})])
+    url = {"users_me": "/users/me/", "financial_markets": "/financial-markets/"}[scenario]
+    return (("GET", url, {"headers": {"Authorization": f"Bearer {token}"}}) for token in cycle(user_tokens))
+
+
+async def drive(client: httpx.AsyncClient, requests, count: int, concurrency: int) -> tuple[list[float], int, float]:
+    """Sends `count` requests from `concurrency` concurrent workers, returns (latencies, errors, elapsed)."""
+    latencies: list[float] = []
+    errors = 0
+    remaining = count
+
+    async def worker():
+        nonlocal errors, remaining
+        while remaining > 0:
+            remaining -= 1
+            method, url, kwargs = next(requests)
+            start = time.perf_counter()
+            try:
+                response = await client.request(method, url, **kwargs)
+                failed = response.status_code >= 400
+            except httpx.TransportError:
+                failed = True
+            latencies.append(time.perf_counter() - start)
+            errors += failed
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return latencies, errors, time.perf_counter() - start
+
+
+def percentile(sorted_values: list[float], fraction: float) -> float:
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(len(sorted_values) - 1, max(0, round(fraction * len(sorted_values)) - 1))]
+
+
+def summarize(latencies: list[float], errors: int, elapsed: float) -> dict:
+    latencies = sorted(latencies)
+    return {
+        "requests": len(latencies),
+        "errors": errors,
+        "throughput_rps": round(len(latencies) / elapsed, 1) if elapsed else 0.0,
+        "p50_ms": round(percentile(latencies, 0.50) * 1000, 2),
+        "p95_ms": round(percentile(latencies, 0.95) * 1000, 2),
+        "p99_ms": round(percentile(latencies, 0.99) * 1000, 2),
+    }
+
+
+async def run_scenarios(base_url: str, server: subprocess.Popen, arguments: argparse.Namespace) -> dict:
+    limits = httpx.Limits(max_connections=arguments.concurrency, max_keepalive_connections=arguments.concurrency)
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=60.0) as client:
+        await wait_until_ready(client, server)
+        usernames = [f"loadtest_{i}" for i in range(arguments.users)]
+        user_tokens = [await login(client, username) for username in usernames[:TOKEN_POOL_SIZE]]
+        admin_token = await login(client, ADMIN_USERNAME)
+
+        results = {}
+        for scenario in arguments.scenarios:
+            requests = build_requests(scenario, usernames, user_tokens, admin_token)
+            await drive(client, requests, arguments.warmup, arguments.concurrency)
+            results[scenario] = summarize(*await drive(client, requests, arguments.requests, arguments.concurrency))
+            print(f"{scenario:<20}" + "".join(f"{key}={value:<10}" for key, value in results[scenario].items()))
+        return results
+
+
+def run(arguments: argparse.Namespace) -> None:
+    seed_users(arguments.database_url, arguments.users)
+    extra_env = dict(variable.split("=", 1) for variable in arguments.env)
+    server = start_server(arguments.database_url, arguments.host, arguments.port, extra_env)
+    try:
+        results = asyncio.run(run_scenarios(f"http://{arguments.host}:{arguments.port}", server, arguments))
+    finally:
+        server.terminate()
+        server.wait(timeout=30)
+
+    baseline = {
+        "created_at": datetime.now(UTC).isoformat(timespec="seconds"),
+        "config": {
+            "users": arguments.users,
+            "concurrency": arguments.concurrency,
+            "requests": arguments.requests,
+            "database_url": arguments.database_url,
+            "env": extra_env,
+            "python": platform.python_version(),
+            "cpu_count": os.cpu_count(),
+        },
+        "scenarios": results,
+    }
+    with open(arguments.output, "w") as output:
+        json.dump(baseline, output, indent=2)
+    print(f"Results written to {arguments.output}")
+
+
+def find_regressions(baseline: dict, current: dict, threshold: float) -> list[str]:
+    """Latency above, or throughput below, the baseline by more than `threshold` (a fraction)."""
+    regressions = []
+    for scenario, before in baseline["scenarios"].items():
+        after = current["scenarios"].get(scenario)
+        if after is None:
+            continue
+        for metric in LATENCY_METRICS:
+            if before[metric] and after[metric] > before[metric] * (1 + threshold):
+                regressions.append(f"{scenario} {metric}: {before[metric]} -> {after[metric]}")
+        if after["throughput_rps"] < before["throughput_rps"] * (1 - threshold):
+            regressions.append(f"{scenario} throughput_rps: {before['throughput_rps']} -> {after['throughput_rps']}")
+        if after["errors"] > before["errors"]:
+            regressions.append(f"{scenario} errors: {before['errors']} -> {after['errors']}")
+    return regressions
+
+
+def compare(arguments: argparse.Namespace) -> None:
+    with open(arguments.baseline) as baseline_file, open(arguments.current) as current_file:
+        baseline, current = json.load(baseline_file), json.load(current_file)
+
+    print(f"{'scenario':<20}{'metric':<16}{'baseline':>12}{'current':>12}{'change':>10}")
+    for scenario, before in baseline["scenarios"].items():
+        after = current["scenarios"].get(scenario)
+        if after is None:
+            print(f"{scenario:<20}missing from {arguments.current}")
+            continue
+        for metric in [*LATENCY_METRICS, "throughput_rps"]:
+            change = (after[metric] - before[metric]) / before[metric] if before[metric] else 0.0
+            print(f"{scenario:<20}{metric:<16}{before[metric]:>12}{after[metric]:>12}{change:>+10.1%}")
+
+    regressions = find_regressions(baseline, current, arguments.threshold)
+    if regressions:
+        print(f"\n{len(regressions)} regression(s) beyond {arguments.threshold:.0%}:")
+        for regression in regressions:
+            print(f"  {regression}")
+        sys.exit(1)
+    print(f"\nNo regression beyond {arguments.threshold:.0%}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    run_parser = commands.add_parser("run", help="seed users, load the endpoints and write a JSON baseline")
+    run_parser.add_argument("--users", type=int, default=100, help="basic users to seed")
+    run_parser.add_argument("--concurrency", type=int, default=16, help="requests in flight")
+    run_parser.add_argument("--requests", type=int, default=500, help="measured requests per scenario")
+    run_parser.add_argument("--warmup", type=int, default=50, help="unmeasured requests per scenario")
+    run_parser.add_argument("--scenario", action="append", dest="scenarios", choices=SCENARIOS, help="repeatable")
+    run_parser.add_argument(
+        "--database-url", default="sqlite:///./load_test.db", help="dedicated database, its tables are recreated"
+    )
+    run_parser.add_argument("--host", default="127.0.0.1")
+    run_parser.add_argument("--port", type=int, default=8765)
+    run_parser.add_argument(
+        "--env", action="append", default=[], metavar="NAME=VALUE", help="extra server setting, repeatable"
+    )
+    run_parser.add_argument("--output", default="load_test.json", help="JSON file receiving the results")
+
+    compare_parser = commands.add_parser("compare", help="compare two JSON results, exit 1 on regressions")
+    compare_parser.add_argument("baseline")
+    compare_parser.add_argument("current")
+    compare_parser.add_argument("--threshold", type=float, default=0.1, help="tolerated change, as a fraction")
+
+    arguments = parser.parse_args()
+    if arguments.command == "run":
+        arguments.scenarios = arguments.scenarios or SCENARIOS
+        run(arguments)
+    else:
+        compare(arguments)
+
+
+if __name__ == "__main__":
+    main()
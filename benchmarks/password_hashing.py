@@ -0,0 +1,84 @@
+"""
+Compares password hashing profiles: verify latency on one core, and verify throughput per core.
+
+    python -m benchmarks.password_hashing
+    python -m benchmarks.password_hashing --profile bcrypt:10 --profile bcrypt:12 --profile argon2:3:65536:4
+
+Profiles are `bcrypt:<rounds>` or `argon2:<time cost>:<memory cost KiB>:<parallelism>`; argon2 profiles
+are skipped when argon2-cffi is not installed.
+"""
+
+import argparse
+import os
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from passlib.context import CryptContext
+
+from app.settings import build_pwd_context
+
+DEFAULT_PROFILES = ["bcrypt:10", "bcrypt:11", "bcrypt:12", "bcrypt:13", "argon2:2:19456:1", "argon2:3:65536:4"]
+PASSWORD = "correct horse battery staple"
+
+
+def parse_profile(profile: str) -> CryptContext:
+    scheme, *parameters = profile.split(":")
+    if scheme == "bcrypt":
+        (rounds,) = parameters
+        return build_pwd_context(scheme="bcrypt", bcrypt_rounds=int(rounds))
+    if scheme == "argon2":
+        time_cost, memory_cost_kib, parallelism = parameters
+        return build_pwd_context(
+            scheme="argon2",
+            argon2_time_cost=int(time_cost),
+            argon2_memory_cost_kib=int(memory_cost_kib),
+            argon2_parallelism=int(parallelism),
+        )
+    raise argparse.ArgumentTypeError(f"Unknown password hash scheme: {scheme}")
+
+
+def measure_latencies(context: CryptContext, hashed_password: str, iterations: int) -> list[float]:
+    latencies = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        context.verify(PASSWORD, hashed_password)
+        latencies.append(time.perf_counter() - start)
+    return latencies
+
+
+def measure_throughput(context: CryptContext, hashed_password: str, iterations: int, workers: int) -> float:
+    """Verifications per second with `workers` threads, bcrypt and argon2 both release the GIL."""
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        start = time.perf_counter()
+        list(executor.map(lambda _: context.verify(PASSWORD, hashed_password), range(iterations * workers)))
+        return iterations * workers / (time.perf_counter() - start)
+
+
+def run(profiles: list[str], iterations: int, workers: int) -> None:
+    print(f"{'profile':<22}{'p50 ms':>10}{'p95 ms':>10}{'hashes/s/core':>16}{f'hashes/s x{workers}':>18}")
+    for profile in profiles:
+        try:
+            context = parse_profile(profile)
+        except RuntimeError as exc:
+            print(f"{profile:<22}skipped: {exc}")
+            continue
+        hashed_password = context.hash(PASSWORD)
+        latencies = sorted(measure_latencies(context, hashed_password, iterations))
+        median = statistics.median(latencies)
+        p95 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))]
+        throughput = measure_throughput(context, hashed_password, iterations, workers)
+        print(f"{profile:<22}{median * 1000:>10.1f}{p95 * 1000:>10.1f}{1 / median:>16.1f}{throughput:>18.1f}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--profile", action="append", dest="profiles", help="profile to measure, repeatable")
+    parser.add_argument("--iterations", type=int, default=20, help="verifications per profile and worker")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="threads for the throughput run")
+    arguments = parser.parse_args()
+    run(arguments.profiles or DEFAULT_PROFILES, arguments.iterations, arguments.workers)
+
+
+if __name__ == "__main__":
+    main()
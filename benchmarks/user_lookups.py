@@ -0,0 +1,85 @@
+"""
+Per-call overhead of the user lookups on the authenticated hot path, against an in-memory SQLite database.
+
+    python -m benchmarks.user_lookups
+    python -m benchmarks.user_lookups --users 10000 --iterations 20000
+
+Compares a legacy `session.query(...).filter(...)` and a `select()` built on every call with the pre-built
+statements of `app.db.operations`, loading the full user or only the columns permission checks need.
+"""
+
+import argparse
+import statistics
+import time
+from typing import Callable
+
+from sqlalchemy import create_engine, func, insert, select
+from sqlalchemy.orm import Session
+from sqlalchemy.pool import StaticPool
+
+from app.db.operations import get_principal_row, get_user, get_user_by_id
+from app.db.schema import Base, Role
+from app.db.schema import User as db_User
+
+
+def seed(session: Session, users: int) -> None:
+    rows = [
+        {"username": f"user_{i}", "email": f"user_{i}@example.com", "hashed_password": "x" * 60, "role": Role.basic}
+        for i in range(users)
+    ]
+    session.execute(insert(db_User), rows)
+    session.commit()
+
+
+def lookups(users: int) -> dict[str, Callable[[Session, int], object]]:
+    def username(i: int) -> str:
+        return f"user_{i % users}"
+
+    return {
+        "query by username": lambda session, i: session.query(db_User)
+        .filter(func.lower(db_User.username) == username(i))
+        .first(),
+        "select by username": lambda session, i: session.scalars(
+            select(db_User).where(func.lower(db_User.username) == username(i)).limit(1)
+        ).first(),
+        "get_user": lambda session, i: get_user(session=session, username_or_email=username(i)),
+        "get_principal_row": lambda session, i: get_principal_row(session=session, username=username(i)),
+        "query by id": lambda session, i: session.query(db_User).filter(db_User.id == i % users + 1).first(),
+        "get_user_by_id": lambda session, i: get_user_by_id(uid=i % users + 1, session=session),
+    }
+
+
+def measure(session: Session, lookup: Callable[[Session, int], object], iterations: int, rounds: int) -> float:
+    """Median over `rounds` of the mean seconds per call, the identity map is emptied between calls."""
+    timings = []
+    for _ in range(rounds):
+        start = time.perf_counter()
+        for i in range(iterations):
+            lookup(session, i)
+            session.expunge_all()
+        timings.append((time.perf_counter() - start) / iterations)
+    return statistics.median(timings)
+
+
+def run(users: int, iterations: int, rounds: int) -> None:
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    Base.metadata.create_all(bind=engine)
+    with Session(engine) as session:
+        seed(session, users)
+        print(f"{'lookup':<22}{'us/call':>10}")
+        for name, lookup in lookups(users).items():
+            measure(session, lookup, iterations // 10 or 1, 1)  # warm up the compiled statement cache
+            print(f"{name:<22}{measure(session, lookup, iterations, rounds) * 1_000_000:>10.1f}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=1000, help="users seeded in the database")
+    parser.add_argument("--iterations", type=int, default=5000, help="lookups per round")
+    parser.add_argument("--rounds", type=int, default=5, help="rounds per lookup, the median is reported")
+    arguments = parser.parse_args()
+    run(arguments.users, arguments.iterations, arguments.rounds)
+
+
+if __name__ == "__main__":
+    main()
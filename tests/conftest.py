@@ -2,13 +2,18 @@ from datetime import UTC, datetime, timedelta
 from typing import Generator, Optional
 
 import pytest
+import pytest_asyncio
 from fastapi.testclient import TestClient
 from jose import jwt
-from sqlalchemy import QueuePool, create_engine
+from sqlalchemy import NullPool, QueuePool, StaticPool, create_engine
 from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
 from sqlalchemy.orm import Session, sessionmaker
 
+from app.auth.rate_limit import login_rate_limiter
+from app.auth.revocation import revocation_list
 from app.auth.token import create_access_token
+from app.auth.token_versions import token_versions
 from app.db.connection import get_session
 from app.db.schema import Base
 from app.db.schema import User as db_User
@@ -47,6 +52,14 @@ def auth_client(session: Session, user: db_User, expired=False) -> TestClient:
     return test_client
 
 
+@pytest.fixture(autouse=True)
+def reset_token_versions():
+    yield
+    token_versions.clear()
+    revocation_list.clear()
+    login_rate_limiter.clear()
+
+
 @pytest.fixture
 def demo_user_data():
     return {"username": "demo", "email": "demo@example.com", "password": "hello_demo"}
@@ -56,7 +69,7 @@ def demo_user_data():
 def basic_user_data() -> dict:
     return {
         "username": "basic_user",
-        "email": "basic_user@gmail.com",  # valid email domain is required when validating an email address
+        "email": "basic_user@gmail.com",
         "password": "hello_basic_user",
     }
 
@@ -164,6 +177,20 @@ def session():
     db_session.close()
 
 
+@pytest_asyncio.fixture
+async def async_session():
+    engine = create_async_engine("sqlite+aiosqlite:///:memory:", poolclass=StaticPool)
+    async with engine.begin() as connection:
+        await connection.run_sync(Base.metadata.create_all)
+    session_local = async_sessionmaker(engine, expire_on_commit=False)
+    db_session = session_local()
+
+    yield db_session
+
+    await db_session.close()
+    await engine.dispose()
+
+
 @pytest.fixture(scope="function")
 def non_empty_db_session(session, basic_user, staff_user, admin_user) -> Generator[Session, None, None]:
     users: list[db_User] = [basic_user, staff_user, admin_user]
@@ -180,6 +207,26 @@ def client(session):
     return test_client
 
 
+@pytest.fixture
+def async_client(tmp_path):
+    database_url = f"sqlite:///{tmp_path / 'test.db'}"
+    sync_engine = create_engine(database_url)
+    Base.metadata.create_all(bind=sync_engine)
+    sync_engine.dispose()
+    # NullPool: each request opens its aiosqlite connection on the TestClient event loop
+    engine = create_async_engine(database_url.replace("sqlite://", "sqlite+aiosqlite://"), poolclass=NullPool)
+    session_local = async_sessionmaker(engine, expire_on_commit=False)
+
+    async def get_async_test_session():
+        async with session_local() as db_session:
+            yield db_session
+
+    app.dependency_overrides |= {get_session: get_async_test_session}
+    test_client = TestClient(app)
+    yield test_client
+    app.dependency_overrides.pop(get_session)
+
+
 @pytest.fixture
 def client_with_non_empty_db(non_empty_db_session):
     db_session = non_empty_db_session
@@ -0,0 +1,149 @@
+import time
+
+import pytest
+
+from app.auth.cache import PrincipalCache, principal_cache
+from app.auth.revocation import revoke_token
+from app.auth.token import (
+    create_access_token,
+    decode_access_token_claims,
+    resolve_principal,
+)
+from app.db.operations import delete_user_data, get_principal_row, update_user_data
+from app.db.schema import Role
+from app.settings import settings
+from app.users.principal import Principal
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def principal():
+    return Principal(id=1, username="basic_user", role=Role.basic, email="basic_user@gmail.com")
+
+
+@pytest.fixture
+def enabled_principal_cache(monkeypatch):
+    monkeypatch.setattr(settings, "PRINCIPAL_CACHE_ENABLED", True)
+    principal_cache.clear()
+    yield principal_cache
+    principal_cache.clear()
+
+
+class TestPrincipalCache:
+    def test_get_and_put(self, principal):
+        cache = PrincipalCache(max_size=10, ttl_seconds=60)
+
+        assert cache.get("token") is None
+        cache.put("token", principal)
+
+        assert cache.get("token") == principal
+        assert cache.stats()["hits"] == 1
+        assert cache.stats()["misses"] == 1
+
+    def test_entry_expires_after_ttl(self, principal):
+        clock = FakeClock()
+        cache = PrincipalCache(max_size=10, ttl_seconds=60, clock=clock)
+        cache.put("token", principal)
+
+        clock.now = 61
+
+        assert cache.get("token") is None
+        assert len(cache) == 0
+
+    def test_entry_never_outlives_token(self, principal):
+        cache = PrincipalCache(max_size=10, ttl_seconds=60)
+        cache.put("token", principal, token_expires_at=time.time() - 1)
+
+        assert cache.get("token") is None
+
+    def test_least_recently_used_entry_is_evicted(self, principal):
+        cache = PrincipalCache(max_size=2, ttl_seconds=60)
+        cache.put("token1", principal)
+        cache.put("token2", principal)
+        cache.get("token1")
+        cache.put("token3", principal)
+
+        assert cache.get("token2") is None
+        assert cache.get("token1") == principal
+        assert cache.get("token3") == principal
+        assert cache.stats()["evictions"] == 1
+
+    def test_invalidate_user(self, principal):
+        cache = PrincipalCache(max_size=10, ttl_seconds=60)
+        other_principal = Principal(id=2, username="staff_user", role=Role.staff)
+        cache.put("token1", principal)
+        cache.put("token2", principal)
+        cache.put("token3", other_principal)
+
+        cache.invalidate_user(principal.id)
+
+        assert cache.get("token1") is None
+        assert cache.get("token2") is None
+        assert cache.get("token3") == other_principal
+
+    def test_put_refuses_entry_resolved_before_an_invalidation(self, principal):
+        cache = PrincipalCache(max_size=10, ttl_seconds=60)
+        generation = cache.generation
+
+        cache.invalidate_token_id("token-id")
+        cache.put("token", principal, token_id="token-id", generation=generation)
+
+        assert cache.get("token") is None
+        cache.put("token", principal, token_id="token-id", generation=cache.generation)
+        assert cache.get("token") == principal
+
+
+class TestResolvePrincipal:
+    def test_resolve_principal_is_cached(self, non_empty_db_session, basic_user, enabled_principal_cache):
+        non_empty_db_session.refresh(basic_user)
+        access_token = create_access_token(data={"sub": basic_user.username})
+
+        first = resolve_principal(token=access_token, session=non_empty_db_session)
+        second = resolve_principal(token=access_token, session=None)
+
+        assert first == Principal.from_user(basic_user)
+        assert second == first
+        assert enabled_principal_cache.stats()["hits"] == 1
+
+    def test_update_user_data_invalidates_cache(self, non_empty_db_session, basic_user, enabled_principal_cache):
+        non_empty_db_session.refresh(basic_user)
+        access_token = create_access_token(data={"sub": basic_user.username})
+        resolve_principal(token=access_token, session=non_empty_db_session)
+
+        update_user_data(
+            uid=basic_user.id, update_data={"email": "new_email@example.com"}, session=non_empty_db_session
+        )
+        principal = resolve_principal(token=access_token, session=non_empty_db_session)
+
+        assert principal.email == "new_email@example.com"
+
+    def test_delete_user_data_invalidates_cache(self, non_empty_db_session, basic_user, enabled_principal_cache):
+        non_empty_db_session.refresh(basic_user)
+        access_token = create_access_token(data={"sub": basic_user.username})
+        resolve_principal(token=access_token, session=non_empty_db_session)
+
+        delete_user_data(uid=basic_user.id, session=non_empty_db_session)
+
+        assert resolve_principal(token=access_token, session=non_empty_db_session) is None
+
+    def test_revocation_during_lookup_is_not_lost(
+        self, non_empty_db_session, basic_user, enabled_principal_cache, monkeypatch
+    ):
+        access_token = create_access_token(data={"sub": basic_user.username})
+        claims = decode_access_token_claims(access_token)
+
+        def revoke_during_lookup(session, username):
+            revoke_token(non_empty_db_session, jti=claims["jti"], expires_at=claims["exp"])
+            return get_principal_row(session, username)
+
+        monkeypatch.setattr("app.auth.token.get_principal_row", revoke_during_lookup)
+        resolve_principal(token=access_token, session=non_empty_db_session)
+
+        assert resolve_principal(token=access_token, session=non_empty_db_session) is None
@@ -36,3 +36,66 @@ class TestGetAccessToke:
         actual_response_data = response.json()
         assert response.status_code == 401
         assert actual_response_data == expected_response_data
+
+
+class TestRefreshAccessToken:
+    def get_tokens(self, test_client, user_data) -> dict:
+        form_data = {"username": user_data["username"], "password": user_data["password"]}
+        return test_client.post("/auth/token/", data=form_data).json()
+
+    def test_refresh_access_token(self, client_with_non_empty_db, basic_user_data):
+        test_client = client_with_non_empty_db
+        tokens = self.get_tokens(test_client, basic_user_data)
+
+        response = test_client.post("/auth/token/refresh/", data={"refresh_token": tokens["refresh_token"]})
+        actual_response_data = response.json()
+
+        assert response.status_code == 200
+        assert actual_response_data["refresh_token"] != tokens["refresh_token"]
+        me = test_client.get("/users/me/", headers={"Authorization": f"Bearer {actual_response_data['access_token']}"})
+        assert me.status_code == 200
+        assert me.json()["username"] == basic_user_data["username"]
+
+    def test_refresh_access_token_reused(self, client_with_non_empty_db, basic_user_data):
+        test_client = client_with_non_empty_db
+        tokens = self.get_tokens(test_client, basic_user_data)
+        rotated = test_client.post("/auth/token/refresh/", data={"refresh_token": tokens["refresh_token"]}).json()
+
+        reuse_response = test_client.post("/auth/token/refresh/", data={"refresh_token": tokens["refresh_token"]})
+        rotated_response = test_client.post("/auth/token/refresh/", data={"refresh_token": rotated["refresh_token"]})
+
+        assert reuse_response.status_code == 401
+        assert rotated_response.status_code == 401
+
+    def test_refresh_access_token_invalid(self, client_with_non_empty_db):
+        test_client = client_with_non_empty_db
+        expected_response_data = {"detail": "Invalid refresh token"}
+
+        response = test_client.post("/auth/token/refresh/", data={"refresh_token": "invalid"})
+
+        assert response.status_code == 401
+        assert response.json() == expected_response_data
+
+
+class TestRevokeAccessToken:
+    def test_revoke_access_token(self, client_with_non_empty_db, basic_user_data):
+        test_client = client_with_non_empty_db
+        form_data = {"username": basic_user_data["username"], "password": basic_user_data["password"]}
+        tokens = test_client.post("/auth/token/", data=form_data).json()
+        headers = {"Authorization": f"Bearer {tokens['access_token']}"}
+
+        response = test_client.post(
+            "/auth/token/revoke/", data={"refresh_token": tokens["refresh_token"]}, headers=headers
+        )
+
+        assert response.status_code == 204
+        assert test_client.get("/users/me/", headers=headers).status_code == 403
+        refresh_response = test_client.post("/auth/token/refresh/", data={"refresh_token": tokens["refresh_token"]})
+        assert refresh_response.status_code == 401
+
+    def test_revoke_access_token_unauthenticated(self, client_with_non_empty_db):
+        test_client = client_with_non_empty_db
+
+        response = test_client.post("/auth/token/revoke/")
+
+        assert response.status_code == 401
@@ -0,0 +1,107 @@
+import threading
+
+import pytest
+
+from app.auth import hashing
+from app.auth.hashing import (
+    HashingExecutor,
+    HashingPoolSaturatedError,
+    hash_password,
+    verify_password,
+)
+
+
+@pytest.fixture
+def blocked_executor():
+    release = threading.Event()
+    executor = HashingExecutor(max_workers=1, max_queue=1)
+    yield executor, release
+    release.set()
+    executor.shutdown()
+
+
+class TestHashingExecutor:
+    def test_submit_returns_result(self):
+        executor = HashingExecutor(max_workers=2, max_queue=2)
+        future = executor.submit(lambda a, b: a + b, 1, 2)
+
+        assert future.result() == 3
+        executor.shutdown()
+        assert executor.pending == 0
+
+    def test_submit_rejects_when_saturated(self, blocked_executor):
+        executor, release = blocked_executor
+        executor.submit(release.wait)
+        executor.submit(release.wait)
+
+        assert executor.pending == 2
+        assert executor.queue_depth == 1
+
+        with pytest.raises(HashingPoolSaturatedError):
+            executor.submit(release.wait)
+        assert executor.rejected == 1
+
+    def test_pending_is_released_after_completion(self, blocked_executor):
+        executor, release = blocked_executor
+        futures = [executor.submit(release.wait), executor.submit(release.wait)]
+        release.set()
+        for future in futures:
+            future.result()
+
+        assert executor.pending == 0
+        assert executor.queue_depth == 0
+
+
+class TestHashingExecutorMap:
+    @pytest.mark.asyncio
+    async def test_map_preserves_order(self):
+        executor = HashingExecutor(max_workers=2, max_queue=0)
+
+        results = await executor.map(lambda value: value * 2, list(range(10)))
+
+        assert results == [value * 2 for value in range(10)]
+        assert executor.pending == 0
+        executor.shutdown()
+
+    @pytest.mark.asyncio
+    async def test_map_raises_when_pool_saturated_by_others(self):
+        executor = HashingExecutor(max_workers=1, max_queue=0)
+        executor._pending = 1
+
+        with pytest.raises(HashingPoolSaturatedError):
+            await executor.map(str, [1, 2])
+
+
+class TestHashPassword:
+    @pytest.mark.asyncio
+    async def test_hash_and_verify_password(self):
+        hashed_password = await hash_password("secret_password")
+
+        assert hashed_password != "secret_password"
+        assert await verify_password("secret_password", hashed_password) is True
+        assert await verify_password("wrong_password", hashed_password) is False
+
+
+class TestHashingBackpressure:
+    def test_get_access_token_when_hashing_pool_saturated(self, client_with_non_empty_db, basic_user_data, monkeypatch):
+        test_client = client_with_non_empty_db
+        saturated_executor = HashingExecutor(max_workers=1, max_queue=0)
+        saturated_executor._pending = 1
+        monkeypatch.setattr(hashing, "hashing_executor", saturated_executor)
+        form_data = {"username": basic_user_data["username"], "password": basic_user_data["password"]}
+
+        response = test_client.post("/auth/token", data=form_data)
+
+        assert response.status_code == 503
+        assert "Retry-After" in response.headers
+
+    def test_register_new_user_when_hashing_pool_saturated(self, client, demo_user_data, monkeypatch):
+        test_client = client
+        saturated_executor = HashingExecutor(max_workers=1, max_queue=0)
+        saturated_executor._pending = 1
+        monkeypatch.setattr(hashing, "hashing_executor", saturated_executor)
+
+        response = test_client.post("/register/", json=demo_user_data)
+
+        assert response.status_code == 503
+        assert "Retry-After" in response.headers
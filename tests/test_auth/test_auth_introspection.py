@@ -0,0 +1,62 @@
+from app.auth.token import create_access_token
+from app.db.operations import get_users_by_usernames, update_user_data
+from app.db.schema import Role
+from app.settings import settings
+
+
+class TestGetUsersByUsernames:
+    def test_get_users_by_usernames(self, non_empty_db_session, basic_user, staff_user):
+        users = get_users_by_usernames(
+            session=non_empty_db_session, usernames=[basic_user.username, staff_user.username, "unknown"]
+        )
+
+        assert set(users) == {basic_user.username, staff_user.username}
+        assert users[staff_user.username].role == Role.staff
+
+
+class TestIntrospectToken:
+    def test_introspect_active_token(self, client_admin, basic_user):
+        access_token = create_access_token(data={"sub": basic_user.username}, user=basic_user)
+
+        response = client_admin.post("/auth/introspect/", data={"token": access_token})
+        actual_response_data = response.json()
+
+        assert response.status_code == 200
+        assert actual_response_data["active"] is True
+        assert actual_response_data["username"] == basic_user.username
+        assert actual_response_data["role"] == Role.basic.value
+        assert "exp" in actual_response_data
+
+    def test_introspect_expired_token(self, client_admin, basic_user_token_expired):
+        response = client_admin.post("/auth/introspect/", data={"token": basic_user_token_expired})
+
+        assert response.status_code == 200
+        assert response.json() == {"active": False}
+
+    def test_introspect_token_requires_staff_or_admin(self, client_basic, basic_user_token):
+        response = client_basic.post("/auth/introspect/", data={"token": basic_user_token})
+
+        assert response.status_code == 401
+
+
+class TestIntrospectTokenBatch:
+    def test_introspect_token_batch(self, client_admin, non_empty_db_session, basic_user, staff_user):
+        basic_token = create_access_token(data={"sub": basic_user.username}, user=basic_user)
+        staff_token = create_access_token(data={"sub": staff_user.username}, user=staff_user)
+        unknown_user_token = create_access_token(data={"sub": "unknown"})
+        update_user_data(uid=staff_user.id, update_data={"role": Role.basic}, session=non_empty_db_session)
+        tokens = [basic_token, "not-a-token", staff_token, unknown_user_token]
+
+        response = client_admin.post("/auth/introspect/batch/", json={"tokens": tokens})
+        actual_results = response.json()["results"]
+
+        assert response.status_code == 200
+        assert [result["active"] for result in actual_results] == [True, False, False, False]
+        assert actual_results[0]["uid"] == basic_user.id
+
+    def test_introspect_token_batch_too_large(self, client_admin, basic_user_token):
+        tokens = [basic_user_token] * (settings.INTROSPECTION_MAX_BATCH_SIZE + 1)
+
+        response = client_admin.post("/auth/introspect/batch/", json={"tokens": tokens})
+
+        assert response.status_code == 422
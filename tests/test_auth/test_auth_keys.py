@@ -0,0 +1,106 @@
+import pytest
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric import ec
+from jose import jwk, jwt
+
+from app.auth import router as auth_router
+from app.auth import token as auth_token
+from app.auth.keys import KeyRing, UnknownKeyError, get_key_ring
+from app.auth.token import create_access_token, decode_access_token_claims
+from app.metrics import token_decode_failures
+
+
+def generate_private_key_pem() -> str:
+    private_key = ec.generate_private_key(ec.SECP256R1())
+    return private_key.private_bytes(
+        serialization.Encoding.PEM, serialization.PrivateFormat.PKCS8, serialization.NoEncryption()
+    ).decode()
+
+
+def public_key_pem(private_key_pem: str) -> str:
+    return jwk.construct(private_key_pem, "ES256").public_key().to_pem().decode()
+
+
+@pytest.fixture
+def es256_key_pem() -> str:
+    return generate_private_key_pem()
+
+
+@pytest.fixture
+def use_key_ring(monkeypatch):
+    def install(key_ring: KeyRing) -> KeyRing:
+        monkeypatch.setattr(auth_token, "get_key_ring", lambda: key_ring)
+        monkeypatch.setattr(auth_router, "get_key_ring", lambda: key_ring)
+        return key_ring
+
+    return install
+
+
+class TestKeyRing:
+    def test_symmetric_key_ring_publishes_no_keys(self):
+        key_ring = get_key_ring()
+
+        assert key_ring.jwks() == {"keys": []}
+
+    def test_verification_key_without_kid_is_signing_key(self, es256_key_pem):
+        key_ring = KeyRing.from_pem("ES256", es256_key_pem)
+
+        assert key_ring.verification_key(None).kid == key_ring.signing_kid
+
+    def test_unknown_kid(self, es256_key_pem):
+        key_ring = KeyRing.from_pem("ES256", es256_key_pem)
+
+        with pytest.raises(UnknownKeyError):
+            key_ring.verification_key("unknown")
+
+
+class TestAsymmetricTokens:
+    def test_create_and_decode_access_token(self, es256_key_pem, use_key_ring):
+        key_ring = use_key_ring(KeyRing.from_pem("ES256", es256_key_pem))
+
+        access_token = create_access_token(data={"sub": "demo_user"})
+
+        assert jwt.get_unverified_header(access_token) == {"alg": "ES256", "kid": key_ring.signing_kid, "typ": "JWT"}
+        assert decode_access_token_claims(access_token)["sub"] == "demo_user"
+
+    def test_token_can_be_verified_with_published_jwks(self, es256_key_pem, use_key_ring):
+        key_ring = use_key_ring(KeyRing.from_pem("ES256", es256_key_pem))
+        access_token = create_access_token(data={"sub": "demo_user"})
+
+        claims = jwt.decode(access_token, key_ring.jwks(), algorithms=["ES256"])
+
+        assert claims["sub"] == "demo_user"
+
+    def test_rotated_key_still_verifies_its_tokens(self, es256_key_pem, use_key_ring):
+        use_key_ring(KeyRing.from_pem("ES256", es256_key_pem))
+        old_access_token = create_access_token(data={"sub": "demo_user"})
+        rotated_key_ring = use_key_ring(
+            KeyRing.from_pem("ES256", generate_private_key_pem(), [("ES256", public_key_pem(es256_key_pem))])
+        )
+
+        new_access_token = create_access_token(data={"sub": "demo_user"})
+
+        assert decode_access_token_claims(old_access_token)["sub"] == "demo_user"
+        assert decode_access_token_claims(new_access_token)["sub"] == "demo_user"
+        assert len(rotated_key_ring.jwks()["keys"]) == 2
+
+    def test_token_signed_with_unknown_key(self, es256_key_pem, use_key_ring):
+        use_key_ring(KeyRing.from_pem("ES256", generate_private_key_pem()))
+        access_token = create_access_token(data={"sub": "demo_user"})
+        use_key_ring(KeyRing.from_pem("ES256", es256_key_pem))
+        before = token_decode_failures.value("unknown_key")
+
+        assert decode_access_token_claims(access_token) is None
+        assert token_decode_failures.value("unknown_key") == before + 1
+
+
+class TestJwksEndpoint:
+    def test_get_jwks(self, client, es256_key_pem, use_key_ring):
+        key_ring = use_key_ring(KeyRing.from_pem("ES256", es256_key_pem))
+
+        response = client.get("/.well-known/jwks.json")
+        actual_response_data = response.json()
+
+        assert response.status_code == 200
+        assert [key["kid"] for key in actual_response_data["keys"]] == [key_ring.signing_kid]
+        assert "d" not in actual_response_data["keys"][0]
@@ -1,5 +1,18 @@
-from app.auth.operations import authenticate_user
+import pytest
+
+from app.auth import operations
+from app.auth.hashing import dummy_password_hash
+from app.auth.operations import (
+    authenticate_user,
+    authenticate_user_async,
+    should_verify_unknown_user,
+)
+from app.auth.rate_limit import ALLOWED, RateLimitDecision
+from app.db.operations import create_user
 from app.db.schema import User as db_User
+from app.settings import build_pwd_context, pwd_context, settings
+
+LOW_COST_CONTEXT = build_pwd_context(scheme="bcrypt", bcrypt_rounds=4)
 
 
 class TestAuthenticateUser:
@@ -25,6 +38,16 @@ class TestAuthenticateUser:
         assert user is not None
         assert isinstance(user, db_User)
 
+    def test_authenticate_user_by_email_ignores_case(self, non_empty_db_session, basic_user_data):
+        user = authenticate_user(
+            session=non_empty_db_session,
+            username_or_email=basic_user_data["email"].upper(),
+            password=basic_user_data["password"],
+        )
+
+        assert user is not None
+        assert user.email == basic_user_data["email"]
+
     def test_authenticate_user_invalid_password(self, non_empty_db_session, basic_user_data):
         db_session = non_empty_db_session
         user_data: dict = basic_user_data
@@ -55,3 +78,125 @@ class TestAuthenticateUser:
 
         assert user1 is None
         assert user2 is None
+
+
+class TestUnknownUserVerification:
+    @pytest.fixture
+    def dummy_verifications(self, monkeypatch):
+        passwords = []
+
+        async def verify_dummy_password(password):
+            passwords.append(password)
+
+        monkeypatch.setattr(operations, "verify_dummy_password", verify_dummy_password)
+        return passwords
+
+    @pytest.mark.asyncio
+    async def test_unknown_user_verifies_dummy_hash(self, async_session, dummy_verifications):
+        user = await authenticate_user_async(session=async_session, username_or_email="nobody", password="secret")
+
+        assert user is None
+        assert dummy_verifications == ["secret"]
+
+    @pytest.mark.asyncio
+    async def test_unknown_user_skips_dummy_hash(self, async_session, dummy_verifications):
+        user = await authenticate_user_async(
+            session=async_session, username_or_email="nobody", password="secret", verify_unknown=False
+        )
+
+        assert user is None
+        assert dummy_verifications == []
+
+    def test_dummy_hash_uses_current_profile(self):
+        assert dummy_password_hash() == dummy_password_hash()
+        assert not pwd_context.needs_update(dummy_password_hash())
+
+    @pytest.mark.parametrize(
+        "policy, remaining, expected",
+        [
+            ("always", 0, True),
+            ("never", 100, False),
+            ("unless_throttled", 3, True),
+            ("unless_throttled", 2.5, False),
+        ],
+    )
+    def test_should_verify_unknown_user(self, policy, remaining, expected):
+        decision = RateLimitDecision(allowed=True, remaining=remaining)
+
+        assert should_verify_unknown_user(decision, policy=policy, min_remaining=3) is expected
+
+    def test_should_verify_unknown_user_without_rate_limit(self):
+        assert should_verify_unknown_user(ALLOWED, policy="unless_throttled", min_remaining=3)
+
+    def test_unknown_users_are_always_verified_by_default(self):
+        throttled = RateLimitDecision(allowed=True, remaining=0)
+
+        assert should_verify_unknown_user(throttled)
+
+
+class TestPasswordRehash:
+    def test_authenticate_user_upgrades_outdated_hash(self, session, demo_user_data):
+        outdated_hash = LOW_COST_CONTEXT.hash(demo_user_data["password"])
+        create_user(
+            session=session,
+            username=demo_user_data["username"],
+            email=demo_user_data["email"],
+            hashed_password=outdated_hash,
+        )
+
+        user = authenticate_user(
+            session=session, username_or_email=demo_user_data["username"], password=demo_user_data["password"]
+        )
+
+        assert user is not None
+        assert user.hashed_password != outdated_hash
+        assert user.hashed_password.startswith(f"$2b${settings.BCRYPT_ROUNDS:02d}$")
+
+    def test_authenticate_user_keeps_hash_on_invalid_password(self, session, demo_user_data):
+        outdated_hash = LOW_COST_CONTEXT.hash(demo_user_data["password"])
+        db_user = create_user(
+            session=session,
+            username=demo_user_data["username"],
+            email=demo_user_data["email"],
+            hashed_password=outdated_hash,
+        )
+
+        user = authenticate_user(session=session, username_or_email=demo_user_data["username"], password="wrong")
+
+        assert user is None
+        assert db_user.hashed_password == outdated_hash
+
+    @pytest.mark.asyncio
+    async def test_authenticate_user_async_upgrades_outdated_hash(self, async_session, demo_user_data):
+        outdated_hash = LOW_COST_CONTEXT.hash(demo_user_data["password"])
+        await async_session.run_sync(
+            lambda sync_session: create_user(
+                session=sync_session,
+                username=demo_user_data["username"],
+                email=demo_user_data["email"],
+                hashed_password=outdated_hash,
+            )
+        )
+
+        user = await authenticate_user_async(
+            session=async_session, username_or_email=demo_user_data["email"], password=demo_user_data["password"]
+        )
+
+        assert user is not None
+        assert user.hashed_password.startswith(f"$2b${settings.BCRYPT_ROUNDS:02d}$")
+
+
+class TestBuildPwdContext:
+    def test_other_schemes_are_deprecated(self):
+        context = build_pwd_context(scheme="bcrypt", bcrypt_rounds=4)
+
+        assert context.default_scheme() == "bcrypt"
+        assert context.needs_update(LOW_COST_CONTEXT.hash("secret")) is False
+        assert build_pwd_context(scheme="bcrypt", bcrypt_rounds=5).needs_update(LOW_COST_CONTEXT.hash("secret"))
+
+    def test_missing_backend(self):
+        if build_pwd_context(scheme="bcrypt", bcrypt_rounds=4).handler("argon2").has_backend():
+            pytest.skip("argon2-cffi is installed")
+
+        with pytest.raises(RuntimeError):
+            build_pwd_context(scheme="argon2")
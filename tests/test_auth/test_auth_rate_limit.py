@@ -0,0 +1,170 @@
+import pytest
+from pydantic import ValidationError
+from sqlalchemy import create_engine
+from sqlalchemy.orm import Session
+
+from app.auth import rate_limit
+from app.auth.rate_limit import (
+    DatabaseRateLimitStore,
+    LoginRateLimiter,
+    MemoryRateLimitStore,
+    SlidingWindow,
+)
+from app.db.schema import Base, RateLimitWindow
+from app.settings import Settings
+
+
+class FakeClock:
+    def __init__(self, now: float = 6000.0):
+        self.now = now
+
+    def __call__(self) -> float:
+        return self.now
+
+
+class TestSlidingWindow:
+    def test_hit_until_limit(self):
+        window = SlidingWindow()
+
+        decisions = [window.hit(now=6000.0, window_seconds=60, limit=3) for _ in range(4)]
+
+        assert [decision.allowed for decision in decisions] == [True, True, True, False]
+        assert [decision.remaining for decision in decisions[:3]] == [2, 1, 0]
+        assert decisions[3].retry_after == 61
+
+    def test_previous_window_is_weighted_by_overlap(self):
+        window = SlidingWindow()
+        for _ in range(4):
+            window.hit(now=6000.0, window_seconds=60, limit=10)
+
+        window.advance(now=6075.0, window_seconds=60)
+
+        assert window.previous_count == 4
+        assert window.estimate(now=6075.0, window_seconds=60) == 3.0
+
+    def test_stale_windows_are_dropped(self):
+        window = SlidingWindow()
+        window.hit(now=6000.0, window_seconds=60, limit=10)
+
+        window.advance(now=6200.0, window_seconds=60)
+
+        assert window.estimate(now=6200.0, window_seconds=60) == 0
+
+    def test_retry_after_waits_for_previous_window_to_decay(self):
+        window = SlidingWindow(window_start=6000.0, previous_count=8, current_count=1)
+
+        retry_after = window.hit(now=6000.0, window_seconds=60, limit=5).retry_after
+
+        assert retry_after == 31
+        assert not window.hit(now=6000.0 + retry_after - 1, window_seconds=60, limit=5).allowed
+        assert window.hit(now=6000.0 + retry_after, window_seconds=60, limit=5).allowed
+
+
+class TestMemoryRateLimitStore:
+    def test_least_recently_used_keys_are_evicted(self):
+        store = MemoryRateLimitStore(max_keys=2, clock=FakeClock())
+        store.hit("first", limit=5, window_seconds=60)
+        store.hit("second", limit=5, window_seconds=60)
+        store.hit("first", limit=5, window_seconds=60)
+        store.hit("third", limit=5, window_seconds=60)
+
+        assert len(store) == 2
+        assert store.evictions == 1
+        assert "second" not in store._windows
+
+
+class TestDatabaseRateLimitStore:
+    def test_hit_and_reset(self, session):
+        store = DatabaseRateLimitStore(clock=FakeClock())
+
+        decisions = [store.hit(session, key="ip:1.2.3.4", limit=2, window_seconds=60) for _ in range(3)]
+
+        assert [decision.allowed for decision in decisions] == [True, True, False]
+        assert session.get(RateLimitWindow, "ip:1.2.3.4").current_count == 2
+        store.reset(session, key="ip:1.2.3.4")
+        assert session.get(RateLimitWindow, "ip:1.2.3.4") is None
+
+    def test_hits_from_several_workers_are_shared(self, tmp_path):
+        engine = create_engine(f"sqlite:///{tmp_path / 'rate_limit.db'}")
+        Base.metadata.create_all(bind=engine)
+        store = DatabaseRateLimitStore(clock=FakeClock())
+
+        with Session(engine) as first_worker, Session(engine) as second_worker:
+            store.hit(first_worker, key="ip:1.2.3.4", limit=5, window_seconds=60)
+            decision = store.hit(second_worker, key="ip:1.2.3.4", limit=5, window_seconds=60)
+            store.hit(first_worker, key="ip:1.2.3.4", limit=5, window_seconds=60)
+
+            assert decision.remaining == 3
+            assert first_worker.get(RateLimitWindow, "ip:1.2.3.4").current_count == 3
+        engine.dispose()
+
+
+class TestLoginRateLimiter:
+    @pytest.mark.asyncio
+    async def test_username_limit_is_case_insensitive(self):
+        limiter = LoginRateLimiter(MemoryRateLimitStore(clock=FakeClock()), per_username=2, per_ip=100)
+
+        decisions = [await limiter.check(None, username=username, ip=None) for username in ("Demo", "demo", "DEMO")]
+
+        assert [decision.allowed for decision in decisions] == [True, True, False]
+        assert decisions[1].remaining == 0
+        assert decisions[2].retry_after > 0
+
+    @pytest.mark.asyncio
+    async def test_disabled_limiter_allows_everything(self):
+        limiter = LoginRateLimiter(MemoryRateLimitStore(), per_username=0, per_ip=0, enabled=False)
+
+        decision = await limiter.check(None, username="demo", ip="1.2.3.4")
+
+        assert decision.allowed
+
+
+class TestLoginThrottling:
+    @pytest.fixture
+    def strict_limiter(self, monkeypatch):
+        limiter = LoginRateLimiter(MemoryRateLimitStore(), per_username=2, per_ip=100)
+        monkeypatch.setattr("app.auth.router.login_rate_limiter", limiter)
+        return limiter
+
+    def test_failed_logins_are_throttled(self, client_with_non_empty_db, basic_user_data, strict_limiter):
+        test_client = client_with_non_empty_db
+        form_data = {"username": basic_user_data["username"], "password": "wrong_password"}
+
+        responses = [test_client.post("/auth/token/", data=form_data) for _ in range(3)]
+
+        assert [response.status_code for response in responses] == [401, 401, 429]
+        assert int(responses[2].headers["Retry-After"]) > 0
+
+    def test_successful_login_resets_username_limit(self, client_with_non_empty_db, basic_user_data, strict_limiter):
+        test_client = client_with_non_empty_db
+        wrong_form_data = {"username": basic_user_data["username"], "password": "wrong_password"}
+        form_data = {"username": basic_user_data["username"], "password": basic_user_data["password"]}
+
+        test_client.post("/auth/token/", data=wrong_form_data)
+        test_client.post("/auth/token/", data=form_data)
+        response = test_client.post("/auth/token/", data=wrong_form_data)
+
+        assert response.status_code == 401
+
+    def test_username_and_email_share_the_account_limit(
+        self, client_with_non_empty_db, basic_user_data, strict_limiter
+    ):
+        test_client = client_with_non_empty_db
+        identifiers = [basic_user_data["username"], basic_user_data["email"], basic_user_data["username"]]
+
+        responses = [
+            test_client.post("/auth/token/", data={"username": identifier, "password": "wrong_password"})
+            for identifier in identifiers
+        ]
+
+        assert [response.status_code for response in responses] == [401, 401, 429]
+
+
+@pytest.mark.parametrize("name", ["LOGIN_RATE_LIMIT_PER_USERNAME", "LOGIN_RATE_LIMIT_PER_IP"])
+def test_limits_must_allow_an_attempt(name):
+    with pytest.raises(ValidationError):
+        Settings(DATABASE_URL="sqlite://", SECRET_KEY="secret", **{name: 0})
+
+
+def test_default_limiter_uses_memory_store():
+    assert isinstance(rate_limit.login_rate_limiter.store, MemoryRateLimitStore)
@@ -0,0 +1,92 @@
+from datetime import timedelta
+
+import pytest
+from sqlalchemy import select
+
+from app.auth.refresh import (
+    InvalidRefreshTokenError,
+    RefreshTokenReuseError,
+    hash_refresh_token,
+    issue_refresh_token,
+    prune_refresh_tokens,
+    rotate_refresh_token,
+    utcnow,
+)
+from app.db.operations import delete_user_data
+from app.db.schema import RefreshToken
+
+
+def stored_token(session, token: str) -> RefreshToken:
+    return session.scalars(select(RefreshToken).where(RefreshToken.token_hash == hash_refresh_token(token))).one()
+
+
+class TestIssueRefreshToken:
+    def test_token_is_stored_hashed(self, non_empty_db_session, basic_user):
+        token = issue_refresh_token(non_empty_db_session, user_id=basic_user.id)
+
+        refresh_token = stored_token(non_empty_db_session, token)
+        assert refresh_token.token_hash != token
+        assert refresh_token.user_id == basic_user.id
+        assert refresh_token.used_at is None
+        assert refresh_token.expires_at > utcnow()
+
+
+class TestRotateRefreshToken:
+    def test_rotate_refresh_token(self, non_empty_db_session, basic_user):
+        token = issue_refresh_token(non_empty_db_session, user_id=basic_user.id)
+
+        user, next_token = rotate_refresh_token(non_empty_db_session, token=token)
+
+        assert user.id == basic_user.id
+        assert next_token != token
+        assert stored_token(non_empty_db_session, token).used_at is not None
+        family_id = stored_token(non_empty_db_session, token).family_id
+        assert stored_token(non_empty_db_session, next_token).family_id == family_id
+
+    def test_rotate_unknown_refresh_token(self, non_empty_db_session):
+        with pytest.raises(InvalidRefreshTokenError):
+            rotate_refresh_token(non_empty_db_session, token="unknown")
+
+    def test_rotate_expired_refresh_token(self, non_empty_db_session, basic_user):
+        token = issue_refresh_token(non_empty_db_session, user_id=basic_user.id)
+        stored_token(non_empty_db_session, token).expires_at = utcnow() - timedelta(seconds=1)
+        non_empty_db_session.commit()
+
+        with pytest.raises(InvalidRefreshTokenError):
+            rotate_refresh_token(non_empty_db_session, token=token)
+
+    def test_reuse_revokes_token_family(self, non_empty_db_session, basic_user):
+        token = issue_refresh_token(non_empty_db_session, user_id=basic_user.id)
+        _, next_token = rotate_refresh_token(non_empty_db_session, token=token)
+        other_login_token = issue_refresh_token(non_empty_db_session, user_id=basic_user.id)
+
+        with pytest.raises(RefreshTokenReuseError):
+            rotate_refresh_token(non_empty_db_session, token=token)
+        with pytest.raises(InvalidRefreshTokenError):
+            rotate_refresh_token(non_empty_db_session, token=next_token)
+        rotate_refresh_token(non_empty_db_session, token=other_login_token)
+
+    def test_deleted_user_tokens_are_removed(self, non_empty_db_session, basic_user):
+        token = issue_refresh_token(non_empty_db_session, user_id=basic_user.id)
+
+        delete_user_data(uid=basic_user.id, session=non_empty_db_session)
+
+        with pytest.raises(InvalidRefreshTokenError):
+            rotate_refresh_token(non_empty_db_session, token=token)
+
+
+class TestPruneRefreshTokens:
+    def test_prune_refresh_tokens(self, non_empty_db_session, basic_user):
+        session = non_empty_db_session
+        expired = issue_refresh_token(session, user_id=basic_user.id)
+        used_expired = issue_refresh_token(session, user_id=basic_user.id)
+        _, current = rotate_refresh_token(session, token=used_expired)
+        for token in (expired, used_expired):
+            stored_token(session, token).expires_at = utcnow() - timedelta(seconds=1)
+        session.commit()
+
+        assert prune_refresh_tokens(session) == 2
+
+        remaining = session.scalars(select(RefreshToken.token_hash)).all()
+        assert remaining == [hash_refresh_token(current)]
+        rotate_refresh_token(session, token=current)
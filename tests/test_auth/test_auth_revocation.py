@@ -0,0 +1,112 @@
+import time
+from datetime import timedelta
+
+from sqlalchemy import select
+
+from app.auth.cache import PrincipalCache
+from app.auth.revocation import (
+    RevocationList,
+    revocation_list,
+    revoke_token,
+    sync_revocations,
+    to_datetime,
+)
+from app.auth.token import create_access_token, decode_access_token_claims
+from app.db.schema import RevokedToken
+from app.users.principal import Principal
+
+
+def stored_revocation(session, jti: str):
+    return session.scalars(select(RevokedToken).where(RevokedToken.jti == jti)).first()
+
+
+class TestRevocationList:
+    def test_add_and_prune(self):
+        now = [1000.0]
+        revoked = RevocationList(clock=lambda: now[0])
+
+        assert revoked.add("first", expires_at=1010.0) is True
+        assert revoked.add("first", expires_at=1010.0) is False
+        assert revoked.add("expired", expires_at=999.0) is False
+        revoked.add("second", expires_at=1020.0)
+        now[0] = 1015.0
+
+        assert revoked.prune() == 1
+        assert not revoked.is_revoked("first")
+        assert revoked.is_revoked("second")
+        assert len(revoked) == 1
+
+
+class TestRevokeToken:
+    def test_revoked_token_is_rejected(self, non_empty_db_session, basic_user):
+        access_token = create_access_token(data={"sub": basic_user.username})
+        claims = decode_access_token_claims(access_token)
+
+        revoke_token(non_empty_db_session, jti=claims["jti"], expires_at=claims["exp"])
+
+        assert decode_access_token_claims(access_token) is None
+        assert stored_revocation(non_empty_db_session, claims["jti"]) is not None
+
+    def test_revoke_token_twice(self, non_empty_db_session):
+        expires_at = time.time() + 60
+        revoke_token(non_empty_db_session, jti="token-id", expires_at=expires_at)
+        revocation_list.clear()
+
+        revoke_token(non_empty_db_session, jti="token-id", expires_at=expires_at)
+
+        assert revocation_list.is_revoked("token-id")
+        assert len(non_empty_db_session.scalars(select(RevokedToken)).all()) == 1
+
+    def test_revoke_drops_cached_principal(self, non_empty_db_session, basic_user, monkeypatch):
+        cache = PrincipalCache()
+        monkeypatch.setattr("app.auth.revocation.principal_cache", cache)
+        principal = Principal(id=1, username="demo", role=basic_user.role)
+        cache.put("token", principal, token_id="token-id")
+
+        revoke_token(non_empty_db_session, jti="token-id", expires_at=time.time() + 60)
+
+        assert cache.get("token") is None
+
+
+class TestSyncRevocations:
+    def test_sync_loads_revocations_from_other_workers(self, non_empty_db_session):
+        now = to_datetime(time.time())
+        non_empty_db_session.add_all(
+            [
+                RevokedToken(jti="active", expires_at=now + timedelta(minutes=5), revoked_at=now),
+                RevokedToken(jti="expired", expires_at=now - timedelta(minutes=5), revoked_at=now),
+            ]
+        )
+        non_empty_db_session.commit()
+
+        assert sync_revocations(non_empty_db_session) == 1
+        assert revocation_list.is_revoked("active")
+        assert not revocation_list.is_revoked("expired")
+        assert stored_revocation(non_empty_db_session, "expired") is None
+        assert revocation_list.cursor.watermark == stored_revocation(non_empty_db_session, "active").id
+
+    def test_sync_is_incremental(self, non_empty_db_session):
+        now = to_datetime(time.time())
+        non_empty_db_session.add(RevokedToken(jti="old", expires_at=now + timedelta(minutes=5), revoked_at=now))
+        non_empty_db_session.commit()
+        sync_revocations(non_empty_db_session)
+        later = now + timedelta(minutes=1)
+        non_empty_db_session.add(RevokedToken(jti="new", expires_at=now + timedelta(minutes=5), revoked_at=later))
+        non_empty_db_session.commit()
+
+        assert sync_revocations(non_empty_db_session) == 1
+        assert revocation_list.is_revoked("new")
+        assert revocation_list.cursor.watermark == stored_revocation(non_empty_db_session, "new").id
+
+    def test_sync_does_not_depend_on_revoking_worker_clock(self, non_empty_db_session):
+        now = to_datetime(time.time())
+        non_empty_db_session.add(RevokedToken(jti="first", expires_at=now + timedelta(minutes=5), revoked_at=now))
+        non_empty_db_session.commit()
+        sync_revocations(non_empty_db_session)
+        # written by a worker whose clock runs a minute behind
+        skewed = now - timedelta(minutes=1)
+        non_empty_db_session.add(RevokedToken(jti="skewed", expires_at=now + timedelta(minutes=5), revoked_at=skewed))
+        non_empty_db_session.commit()
+
+        assert sync_revocations(non_empty_db_session) == 1
+        assert revocation_list.is_revoked("skewed")
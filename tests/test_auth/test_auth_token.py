@@ -3,9 +3,17 @@ from typing import Optional
 
 from jose import jwt
 
-from app.auth.token import create_access_token, decode_access_token
+from app.auth.token import (
+    create_access_token,
+    decode_access_token,
+    decode_access_token_claims,
+    principal_from_claims,
+)
+from app.auth.token_versions import token_versions
+from app.db.schema import Role
 from app.db.schema import User as db_User
 from app.settings import settings
+from app.users.principal import Principal
 
 
 class TestCreateToken:
@@ -43,6 +51,36 @@ class TestCreateToken:
         assert decoded_access_token_data["sub"] == token_data["sub"]
         assert decoded_access_token_data["exp"] == token_data["exp"]
 
+    def test_create_token_with_user_claims(self, non_empty_db_session, staff_user):
+        non_empty_db_session.refresh(staff_user)
+        access_token = create_access_token(data={"sub": staff_user.username}, user=staff_user)
+        decoded_access_token_data = jwt.decode(access_token, settings.SECRET_KEY, algorithms=settings.ALGORITHM)
+
+        assert decoded_access_token_data["uid"] == staff_user.id
+        assert decoded_access_token_data["role"] == "staff"
+        assert decoded_access_token_data["ver"] == 0
+
+
+class TestPrincipalFromClaims:
+    def test_principal_from_claims(self):
+        claims = {"sub": "staff_user", "uid": 7, "role": "staff", "ver": 0}
+
+        principal = principal_from_claims(claims)
+
+        assert principal == Principal(id=7, username="staff_user", role=Role.staff, token_version=0)
+
+    def test_principal_from_claims_without_user_claims(self):
+        assert principal_from_claims({"sub": "staff_user"}) is None
+
+    def test_principal_from_claims_superseded_version(self):
+        claims = {"sub": "staff_user", "uid": 7, "role": "staff", "ver": 0}
+        token_versions.bump(uid=7, version=1)
+
+        assert principal_from_claims(claims) is None
+
+    def test_decode_access_token_claims_invalid_token(self):
+        assert decode_access_token_claims("invalid.token.string") is None
+
 
 class TestDecodeAccessToken:
     def test_decode_access_token(self, non_empty_db_session, basic_user, basic_user_token):
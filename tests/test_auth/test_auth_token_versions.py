@@ -0,0 +1,96 @@
+from datetime import datetime
+
+from sqlalchemy import select
+
+from app.auth.cache import PrincipalCache
+from app.auth.token_versions import (
+    TokenVersionRegistry,
+    sync_token_versions,
+    token_versions,
+)
+from app.db.operations import delete_user_data, update_user_data
+from app.db.schema import Role, TokenVersionChange
+from app.users.principal import Principal
+
+
+class TestTokenVersionRegistry:
+    def test_unknown_user_accepts_any_version(self):
+        registry = TokenVersionRegistry()
+        assert registry.is_current(uid=1, version=0)
+
+    def test_bump_rejects_older_versions(self):
+        registry = TokenVersionRegistry()
+        registry.bump(uid=1, version=2)
+
+        assert not registry.is_current(uid=1, version=1)
+        assert registry.is_current(uid=1, version=2)
+        assert registry.is_current(uid=2, version=0)
+
+    def test_bump_never_lowers_version(self):
+        registry = TokenVersionRegistry()
+        registry.bump(uid=1, version=3)
+        registry.bump(uid=1, version=1)
+
+        assert not registry.is_current(uid=1, version=2)
+
+    def test_revoke_all_rejects_every_version(self):
+        registry = TokenVersionRegistry()
+        registry.revoke_all(uid=1)
+
+        assert not registry.is_current(uid=1, version=100)
+
+    def test_prune_drops_entries_older_than_tokens(self):
+        now = [1000.0]
+        registry = TokenVersionRegistry(clock=lambda: now[0])
+        registry.revoke_all(uid=1)
+        now[0] = 1500.0
+        registry.bump(uid=2, version=1)
+        now[0] = 2000.0
+
+        assert registry.prune(max_age_seconds=600) == 1
+        assert registry.is_current(uid=1, version=0)
+        assert not registry.is_current(uid=2, version=0)
+        assert len(registry) == 1
+
+
+class TestSyncTokenVersions:
+    def test_sync_applies_changes_made_by_other_workers(self, non_empty_db_session, basic_user, staff_user):
+        update_user_data(uid=basic_user.id, update_data={"role": Role.staff}, session=non_empty_db_session)
+        delete_user_data(uid=staff_user.id, session=non_empty_db_session)
+        # a worker that did not make the changes, or started after them
+        token_versions.clear()
+
+        assert sync_token_versions(non_empty_db_session) == 2
+        assert not token_versions.is_current(uid=basic_user.id, version=0)
+        assert token_versions.is_current(uid=basic_user.id, version=1)
+        assert not token_versions.is_current(uid=staff_user.id, version=100)
+        assert sync_token_versions(non_empty_db_session) == 0
+
+    def test_sync_drops_cached_principals(self, non_empty_db_session, basic_user, monkeypatch):
+        cache = PrincipalCache()
+        monkeypatch.setattr("app.auth.token_versions.principal_cache", cache)
+        cache.put("token", Principal(id=basic_user.id, username=basic_user.username, role=Role.basic))
+        update_user_data(uid=basic_user.id, update_data={"role": Role.admin}, session=non_empty_db_session)
+
+        sync_token_versions(non_empty_db_session)
+
+        assert cache.get("token") is None
+
+    def test_sync_prunes_changes_older_than_tokens(self, non_empty_db_session, basic_user):
+        non_empty_db_session.add(
+            TokenVersionChange(user_id=basic_user.id, min_version=1, changed_at=datetime(2000, 1, 1))
+        )
+        non_empty_db_session.commit()
+
+        assert sync_token_versions(non_empty_db_session) == 0
+        assert non_empty_db_session.scalars(select(TokenVersionChange)).first() is None
+
+    def test_sync_drops_registry_entries_older_than_tokens(self, non_empty_db_session, basic_user, monkeypatch):
+        now = [1000.0]
+        monkeypatch.setattr(token_versions, "_clock", lambda: now[0])
+        token_versions.revoke_all(uid=basic_user.id)
+        now[0] += 60 * 60
+
+        sync_token_versions(non_empty_db_session, token_expire_minutes=30)
+
+        assert len(token_versions) == 0
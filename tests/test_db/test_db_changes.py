@@ -0,0 +1,49 @@
+from sqlalchemy import column
+
+from app.db.changes import ChangeCursor
+
+
+class TestChangeCursor:
+    def test_first_sync_reads_every_row(self):
+        cursor = ChangeCursor()
+
+        assert str(cursor.unread(column("id"))) == "true"
+
+    def test_advance_moves_watermark(self):
+        cursor = ChangeCursor()
+        cursor.advance([1, 2, 3])
+
+        assert cursor.watermark == 3
+        assert cursor.gaps == []
+        assert str(cursor.unread(column("id"))) == "id > :id_1"
+
+    def test_missing_ids_are_read_again_until_they_fill(self):
+        cursor = ChangeCursor()
+        cursor.advance([1])
+        cursor.advance([2, 5])
+
+        assert cursor.watermark == 5
+        assert cursor.gaps == [3, 4]
+        assert "IN" in str(cursor.unread(column("id")))
+
+        cursor.advance([4])
+
+        assert cursor.gaps == [3]
+        assert cursor.watermark == 5
+
+    def test_gaps_expire(self):
+        now = [0.0]
+        cursor = ChangeCursor(gap_timeout=60, clock=lambda: now[0])
+        cursor.advance([1, 3])
+        now[0] = 61.0
+        cursor.advance([])
+
+        assert cursor.gaps == []
+        assert cursor.watermark == 3
+
+    def test_gaps_are_bounded(self):
+        cursor = ChangeCursor(max_gaps=10)
+        cursor.advance([1])
+        cursor.advance([1000])
+
+        assert cursor.gaps == list(range(990, 1000))
@@ -1,16 +1,29 @@
+from datetime import datetime
 from typing import Optional, Type
 
 import pytest
+from sqlalchemy import select
 
+from app.auth.token_versions import token_versions
 from app.db.operations import (
     UserNotFoundError,
     add_user,
+    bulk_delete_users,
+    bulk_update_role,
     delete_user_data,
+    find_existing_identities,
     get_all_users,
+    get_principal_row,
     get_user,
     get_user_by_id,
+    get_users_page,
+    insert_or_ignore,
+    insert_users,
+    iter_user_row_batches,
+    select_user_ids,
     update_user_data,
 )
+from app.db.schema import RevokedToken, Role
 from app.db.schema import User as db_User
 
 
@@ -50,6 +63,64 @@ class TestAddUser:
         assert db_user is None
 
 
+class TestFindExistingIdentities:
+    def test_find_existing_identities(self, non_empty_db_session, basic_user, staff_user):
+        usernames, emails = find_existing_identities(
+            session=non_empty_db_session,
+            usernames=[basic_user.username, "new_user"],
+            emails=[staff_user.email, "new_user@example.com"],
+        )
+
+        assert usernames == {basic_user.username}
+        assert emails == {staff_user.email}
+
+    def test_find_existing_identities_with_non_ascii_uppercase(self, session):
+        add_user(session=session, username="Ørjan", email="Ørjan@example.com", password="secret")
+
+        usernames, emails = find_existing_identities(
+            session=session, usernames=["Ørjan", "Åse"], emails=["Ørjan@EXAMPLE.com"]
+        )
+
+        assert usernames == {"ørjan"}
+        assert emails == {"ørjan@example.com"}
+
+
+class TestInsertOrIgnore:
+    def test_insert_or_ignore(self, session):
+        values = {"jti": "token-id", "expires_at": datetime(2030, 1, 1), "revoked_at": datetime(2029, 1, 1)}
+
+        assert insert_or_ignore(session, RevokedToken, values) is True
+        assert insert_or_ignore(session, RevokedToken, values) is False
+        session.commit()
+
+        assert [row.jti for row in session.scalars(select(RevokedToken))] == ["token-id"]
+
+
+class TestInsertUsers:
+    def test_insert_users(self, session):
+        rows = [
+            {"username": f"user_{i}", "email": f"user_{i}@example.com", "hashed_password": "x", "role": "basic"}
+            for i in range(3)
+        ]
+
+        conflicts = insert_users(session=session, rows=rows)
+
+        assert conflicts == []
+        assert len(get_all_users(session)) == 3
+
+    def test_insert_users_reports_conflicting_rows(self, non_empty_db_session, basic_user):
+        rows = [
+            {"username": "user_1", "email": "user_1@example.com", "hashed_password": "x", "role": "basic"},
+            {"username": basic_user.username, "email": "user_2@example.com", "hashed_password": "x", "role": "basic"},
+            {"username": "user_3", "email": "user_3@example.com", "hashed_password": "x", "role": "basic"},
+        ]
+
+        conflicts = insert_users(session=non_empty_db_session, rows=rows)
+
+        assert conflicts == [1]
+        assert len(get_all_users(non_empty_db_session)) == 5
+
+
 class TestGetUser:
     def test_get_user_by_username(self, non_empty_db_session, basic_user):
         db_session = non_empty_db_session
@@ -87,6 +158,76 @@ class TestGetUser:
         actual_user = get_user(session=db_session, username_or_email=email)
         assert actual_user is None
 
+    def test_get_user_is_case_insensitive(self, non_empty_db_session, basic_user):
+        db_session = non_empty_db_session
+        db_session.refresh(basic_user)
+
+        assert get_user(session=db_session, username_or_email=basic_user.username.upper()) == basic_user
+        assert get_user(session=db_session, username_or_email=basic_user.email.upper()) == basic_user
+
+    def test_get_user_by_username_containing_at_sign(self, session):
+        db_user = add_user(session=session, username="at@home", email="home@example.com", password="secret")
+
+        assert get_user(session=session, username_or_email="at@home") == db_user
+
+    def test_get_user_with_non_ascii_uppercase_username(self, session):
+        db_user = add_user(session=session, username="Émile", email="Émile@example.com", password="secret")
+
+        assert get_user(session=session, username_or_email="Émile") == db_user
+        assert get_user(session=session, username_or_email="ÉMILE") == db_user
+        assert get_user(session=session, username_or_email="Émile@Example.com") == db_user
+
+    def test_get_user_prefers_email_match(self, session):
+        add_user(session=session, username="TAKEN@example.com", email="other@example.com", password="secret")
+        email_owner = add_user(session=session, username="owner", email="taken@example.com", password="secret")
+
+        assert get_user(session=session, username_or_email="taken@example.com") == email_owner
+        assert get_user(session=session, username_or_email="Taken@Example.com") == email_owner
+
+
+class TestGetPrincipalRow:
+    def test_get_principal_row(self, non_empty_db_session, basic_user):
+        db_session = non_empty_db_session
+        db_session.refresh(basic_user)
+
+        row = get_principal_row(session=db_session, username=basic_user.username.upper())
+
+        assert row._fields == ("id", "username", "email", "role", "token_version")
+        assert (row.id, row.username, row.role) == (basic_user.id, basic_user.username, basic_user.role)
+
+    def test_get_principal_row_matches_usernames_only(self, non_empty_db_session, basic_user):
+        db_session = non_empty_db_session
+
+        assert get_principal_row(session=db_session, username=basic_user.email) is None
+
+    def test_get_principal_row_with_non_ascii_uppercase_username(self, session):
+        db_user = add_user(session=session, username="Ørjan", email="orjan@example.com", password="secret")
+
+        row = get_principal_row(session=session, username="Ørjan")
+
+        assert row is not None
+        assert row.id == db_user.id
+
+
+class TestIdentityUniqueness:
+    def test_add_user_with_username_differing_in_case(self, non_empty_db_session, basic_user):
+        db_user = add_user(
+            session=non_empty_db_session,
+            username=basic_user.username.upper(),
+            email="another_email@example.com",
+            password="secret",
+        )
+
+        assert db_user is None
+
+    def test_find_existing_identities_is_case_insensitive(self, non_empty_db_session, basic_user, staff_user):
+        usernames, emails = find_existing_identities(
+            session=non_empty_db_session, usernames=[basic_user.username.upper()], emails=[staff_user.email.upper()]
+        )
+
+        assert usernames == {basic_user.username.lower()}
+        assert emails == {staff_user.email.lower()}
+
 
 class TestGetAllUsers:
     def test_get_all_users(self, non_empty_db_session):
@@ -106,6 +247,42 @@ class TestGetAllUsers:
         assert len(users) == 0
 
 
+class TestGetUsersPage:
+    def test_get_users_page(self, non_empty_db_session):
+        users = get_users_page(session=non_empty_db_session, limit=2)
+
+        assert [user.id for user in users] == [1, 2]
+
+    def test_get_users_page_without_limit(self, non_empty_db_session):
+        users = get_users_page(session=non_empty_db_session, after=1)
+
+        assert [user.id for user in users] == [2, 3]
+
+    def test_get_users_page_after_cursor(self, non_empty_db_session):
+        users = get_users_page(session=non_empty_db_session, limit=2, after=2)
+
+        assert [user.id for user in users] == [3]
+
+    def test_get_users_page_username_prefix_is_escaped(self, non_empty_db_session):
+        users = get_users_page(session=non_empty_db_session, username_prefix="%")
+
+        assert len(users) == 0
+
+
+class TestIterUserRowBatches:
+    def test_iter_user_row_batches(self, non_empty_db_session):
+        batches = list(iter_user_row_batches(session=non_empty_db_session, batch_size=2))
+
+        assert [len(batch) for batch in batches] == [2, 1]
+        assert batches[0][0].username == "basic_user"
+
+    def test_iter_user_row_batches_filtered_by_role(self, non_empty_db_session):
+        batches = list(iter_user_row_batches(session=non_empty_db_session, role=Role.staff))
+        rows = [row for batch in batches for row in batch]
+
+        assert [row.username for row in rows] == ["staff_user"]
+
+
 class TestGetUserById:
     def test_get_user_by_id(self, non_empty_db_session):
         db_session = non_empty_db_session
@@ -178,3 +355,35 @@ class TestDeleteUserData:
         non_existing_user_id = 1
         with pytest.raises(UserNotFoundError):
             delete_user_data(uid=non_existing_user_id, session=db_session)
+
+
+class TestSelectUserIds:
+    def test_select_user_ids_by_ids(self, non_empty_db_session):
+        assert select_user_ids(session=non_empty_db_session, ids=[3, 1, 1, 42], chunk_size=2) == [1, 3]
+
+    def test_select_user_ids_by_filter(self, non_empty_db_session):
+        assert select_user_ids(session=non_empty_db_session, role=Role.admin) == [3]
+
+
+class TestBulkUpdateRole:
+    def test_bulk_update_role(self, non_empty_db_session, basic_user):
+        db_session = non_empty_db_session
+
+        updated = bulk_update_role(session=db_session, ids=[1, 2, 3], role=Role.staff, chunk_size=2)
+        db_session.refresh(basic_user)
+
+        assert updated == 2
+        assert basic_user.role == Role.staff
+        assert basic_user.token_version == 1
+        assert not token_versions.is_current(uid=basic_user.id, version=0)
+
+
+class TestBulkDeleteUsers:
+    def test_bulk_delete_users(self, non_empty_db_session):
+        db_session = non_empty_db_session
+
+        deleted = bulk_delete_users(session=db_session, ids=[1, 2], chunk_size=1)
+
+        assert deleted == 2
+        assert select_user_ids(session=db_session, ids=[1, 2, 3]) == [3]
+        assert not token_versions.is_current(uid=1, version=0)
@@ -0,0 +1,39 @@
+from sqlalchemy import create_engine, inspect, text
+from sqlalchemy.orm import Session
+
+from app.db.operations import add_user, get_principal_row
+from app.db.schema import create_tables
+
+# the User table as created before token versions and case-insensitive identities were added
+BASELINE_USER_TABLE = """
+CREATE TABLE "User" (
+    id INTEGER NOT NULL PRIMARY KEY,
+    username VARCHAR NOT NULL UNIQUE,
+    email VARCHAR NOT NULL UNIQUE,
+    hashed_password VARCHAR NOT NULL,
+    role VARCHAR(5) NOT NULL
+)
+"""
+
+
+class TestCreateTables:
+    def test_upgrades_baseline_user_table(self, tmp_path):
+        engine = create_engine(f"sqlite:///{tmp_path / 'baseline.db'}")
+        with engine.begin() as connection:
+            connection.execute(text(BASELINE_USER_TABLE))
+            connection.execute(text("""INSERT INTO "User" VALUES (1, 'demo', 'demo@example.com', 'x', 'basic')"""))
+
+        with engine.begin() as connection:
+            create_tables(connection)
+            # idempotent on an up to date schema
+            create_tables(connection)
+
+        inspector = inspect(engine)
+        assert "token_version" in {column["name"] for column in inspector.get_columns("User")}
+        with engine.connect() as connection:
+            indexes = set(connection.scalars(text("SELECT name FROM sqlite_master WHERE type = 'index'")))
+        assert {"ix_user_username_lower", "ix_user_email_lower"} <= indexes
+        with Session(engine) as session:
+            assert get_principal_row(session=session, username="DEMO").token_version == 0
+            assert add_user(session=session, username="new", email="new@example.com", password="secret") is not None
+        engine.dispose()
@@ -0,0 +1,83 @@
+import logging
+import queue
+
+from app.logging import (
+    BatchingQueueListener,
+    BoundedQueueHandler,
+    DeferredFlushMixin,
+    logging_stats,
+)
+
+
+class RecordingHandler(DeferredFlushMixin, logging.Handler):
+    def __init__(self):
+        super().__init__()
+        self.records = []
+        self.batch_flushes = 0
+
+    def emit(self, record):
+        self.records.append(record.getMessage())
+
+    def flush_batch(self):
+        self.batch_flushes += 1
+
+
+def make_record(message: str) -> logging.LogRecord:
+    return logging.LogRecord("test", logging.INFO, __file__, 0, message, None, None)
+
+
+class TestBoundedQueueHandler:
+    def test_drop_policy_counts_dropped_records(self):
+        log_queue = queue.Queue(maxsize=1)
+        handler = BoundedQueueHandler(log_queue, policy="drop")
+
+        handler.handle(make_record("first"))
+        handler.handle(make_record("second"))
+
+        assert log_queue.qsize() == 1
+        assert handler.dropped == 1
+
+    def test_block_policy_enqueues_every_record(self):
+        log_queue = queue.Queue(maxsize=2)
+        handler = BoundedQueueHandler(log_queue, policy="block")
+
+        handler.handle(make_record("first"))
+        handler.handle(make_record("second"))
+
+        assert log_queue.qsize() == 2
+        assert handler.dropped == 0
+
+
+class TestBatchingQueueListener:
+    def test_records_are_handled_in_batches(self):
+        log_queue = queue.Queue(maxsize=10)
+        recording_handler = RecordingHandler()
+        listener = BatchingQueueListener(log_queue, recording_handler, batch_size=5)
+        for index in range(4):
+            log_queue.put(make_record(f"record {index}"))
+        listener.enqueue_sentinel()
+
+        listener.start()
+        listener._thread.join()
+
+        assert recording_handler.records == [f"record {index}" for index in range(4)]
+        # the four records and the stop sentinel are drained in a single batch
+        assert recording_handler.batch_flushes == 1
+
+    def test_stop_waits_for_room_in_full_queue(self):
+        log_queue = queue.Queue(maxsize=1)
+        recording_handler = RecordingHandler()
+        listener = BatchingQueueListener(log_queue, recording_handler, batch_size=5)
+        log_queue.put(make_record("record"))
+
+        listener.start()
+        listener.stop()
+
+        assert recording_handler.records == ["record"]
+
+
+class TestLoggingStats:
+    def test_logging_stats(self):
+        stats = logging_stats()
+
+        assert set(stats) == {"queue_size", "queue_max_size", "dropped_records"}
@@ -0,0 +1,83 @@
+import json
+
+import pytest
+from fastapi import FastAPI, HTTPException
+from fastapi.testclient import TestClient
+
+from app.logging import middleware
+from app.logging.middleware import AccessLogMiddleware, add_auth_time, add_db_time
+
+
+@pytest.fixture
+def access_log(monkeypatch):
+    entries = []
+
+    class RecordingLogger:
+        def info(self, message, *args):
+            entries.append(json.loads(message % args))
+
+    monkeypatch.setattr(middleware, "client_logger", RecordingLogger())
+    return entries
+
+
+def make_client(success_sample_rate: float = 1.0, error_sample_rate: float = 1.0) -> TestClient:
+    demo_app = FastAPI()
+    demo_app.add_middleware(
+        AccessLogMiddleware, success_sample_rate=success_sample_rate, error_sample_rate=error_sample_rate
+    )
+
+    @demo_app.get("/ok/")
+    async def ok():
+        add_auth_time(0.002)
+        add_db_time(0.001)
+        return {"status": "ok"}
+
+    @demo_app.get("/missing/")
+    async def missing():
+        raise HTTPException(status_code=404, detail="Not found")
+
+    return TestClient(demo_app)
+
+
+class TestAccessLogMiddleware:
+    def test_access_log_entry(self, access_log):
+        test_client = make_client()
+
+        response = test_client.get("/ok/")
+
+        assert response.status_code == 200
+        assert len(access_log) == 1
+        entry = access_log[0]
+        assert entry["method"] == "GET"
+        assert entry["path"] == "/ok/"
+        assert entry["status"] == 200
+        assert entry["response_bytes"] == len(response.content)
+        assert entry["auth_ms"] == 2.0
+        assert entry["db_ms"] == 1.0
+        assert entry["duration_ms"] >= 0
+        assert entry["request_id"] == response.headers["x-request-id"]
+
+    def test_request_id_is_propagated(self, access_log):
+        test_client = make_client()
+
+        response = test_client.get("/ok/", headers={"X-Request-ID": "request-1"})
+
+        assert response.headers["x-request-id"] == "request-1"
+        assert access_log[0]["request_id"] == "request-1"
+
+    def test_successful_requests_are_sampled(self, access_log):
+        test_client = make_client(success_sample_rate=0.0, error_sample_rate=1.0)
+
+        test_client.get("/ok/")
+        test_client.get("/missing/")
+
+        assert [entry["status"] for entry in access_log] == [404]
+
+    def test_db_time_is_recorded(self, access_log, client_basic):
+        test_client = client_basic
+
+        test_client.get("/financial-markets/")
+
+        assert access_log[-1]["status"] == 200
+        assert access_log[-1]["db_ms"] > 0
+        assert access_log[-1]["auth_ms"] >= access_log[-1]["db_ms"]
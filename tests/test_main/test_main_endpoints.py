@@ -1,3 +1,28 @@
+import pytest
+from fastapi.responses import JSONResponse, ORJSONResponse
+
+from app import main
+from app.settings import settings
+
+
+class TestDefaultResponseClass:
+    def test_stdlib_json_by_default(self):
+        assert main.default_response_class() is JSONResponse
+
+    def test_fast_json_responses(self, monkeypatch):
+        pytest.importorskip("orjson")
+        monkeypatch.setattr(settings, "FAST_JSON_RESPONSES", True)
+
+        assert main.default_response_class() is ORJSONResponse
+
+    def test_fast_json_responses_without_orjson(self, monkeypatch):
+        monkeypatch.setattr(settings, "FAST_JSON_RESPONSES", True)
+        monkeypatch.setattr(main, "orjson", None)
+
+        with pytest.raises(RuntimeError):
+            main.default_response_class()
+
+
 class TestWelcome:
     def test_welcome(self, client):
         test_client = client
@@ -0,0 +1,90 @@
+import pytest
+
+from app import logging as app_logging
+from app import server
+from app.settings import settings
+
+
+async def empty_app(scope, receive, send):
+    pass
+
+
+class TestMemoryRecyclingMiddleware:
+    @pytest.fixture
+    def kills(self, monkeypatch):
+        signals = []
+        monkeypatch.setattr(server.os, "kill", lambda pid, sig: signals.append(sig))
+        return signals
+
+    @pytest.mark.asyncio
+    async def test_restarts_worker_above_limit(self, monkeypatch, kills):
+        monkeypatch.setattr(server, "resident_memory_bytes", lambda: 200 << 20)
+        middleware = server.MemoryRecyclingMiddleware(empty_app, max_memory_bytes=100 << 20, check_interval=0)
+
+        await middleware({"type": "http"}, None, None)
+        await middleware({"type": "http"}, None, None)
+
+        assert kills == [server.signal.SIGTERM]
+        assert middleware.recycling
+
+    @pytest.mark.asyncio
+    async def test_keeps_worker_below_limit(self, monkeypatch, kills):
+        monkeypatch.setattr(server, "resident_memory_bytes", lambda: 50 << 20)
+        middleware = server.MemoryRecyclingMiddleware(empty_app, max_memory_bytes=100 << 20, check_interval=0)
+
+        await middleware({"type": "http"}, None, None)
+
+        assert kills == []
+
+    def test_resident_memory_bytes(self):
+        assert server.resident_memory_bytes() > 0
+
+
+class TestServerConfig:
+    def test_uvicorn_config(self, monkeypatch):
+        monkeypatch.setattr(settings, "SERVER_MAX_REQUESTS", 0)
+
+        config = server.uvicorn_config(workers=3)
+
+        assert config.workers == 3
+        assert config.factory
+        assert config.limit_max_requests is None
+
+    def test_uvicorn_config_without_max_requests_jitter(self, monkeypatch):
+        monkeypatch.setattr(server, "UVICORN_MAX_REQUESTS_JITTER", False)
+
+        config = server.uvicorn_config(workers=2)
+
+        assert config.workers == 2
+        assert getattr(config, "limit_max_requests_jitter", 0) == 0
+
+    def test_gunicorn_options(self):
+        options = server.gunicorn_options(workers=3)
+
+        assert options["workers"] == 3
+        assert options["preload_app"] is settings.SERVER_PRELOAD
+        assert options["max_requests_jitter"] == settings.SERVER_MAX_REQUESTS_JITTER
+
+    @pytest.mark.parametrize(
+        "workers, backend, warned", [(4, "memory", True), (1, "memory", False), (4, "database", False)]
+    )
+    def test_warn_about_per_worker_state(self, monkeypatch, caplog, workers, backend, warned):
+        monkeypatch.setattr(settings, "LOGIN_RATE_LIMIT_BACKEND", backend)
+
+        server.warn_about_per_worker_state(workers)
+
+        assert ("LOGIN_RATE_LIMIT_BACKEND" in caplog.text) is warned
+
+    def test_create_application_without_memory_limit(self, monkeypatch):
+        monkeypatch.setattr(server, "SERVER_MAX_MEMORY_MB", 0)
+
+        assert server.create_application() is server.app
+
+    def test_reset_after_fork_restarts_log_listener(self):
+        old_queue = app_logging.log_queue
+
+        server.reset_after_fork()
+
+        assert app_logging.log_queue is not old_queue
+        assert app_logging.queue_handler.queue is app_logging.log_queue
+        assert app_logging.queue_listener._thread.is_alive()
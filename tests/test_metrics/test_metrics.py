@@ -0,0 +1,138 @@
+import threading
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.auth.token import create_access_token, decode_access_token_claims
+from app.metrics import (
+    CallbackGauge,
+    Counter,
+    Histogram,
+    MetricsRegistry,
+    http_request_duration,
+    token_decode_failures,
+)
+from app.metrics.middleware import UNMATCHED_ROUTE, MetricsMiddleware
+
+
+class TestCounter:
+    def test_inc_aggregates_across_threads(self):
+        counter = Counter("demo", "Demo counter", ("outcome",))
+
+        def work():
+            for _ in range(1000):
+                counter.inc("success")
+
+        threads = [threading.Thread(target=work) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        counter.inc("failure", amount=2)
+
+        assert counter.value("success") == 4000
+        assert counter.value("failure") == 2
+        assert len(counter._shards) == 5
+
+    def test_render(self):
+        counter = Counter("demo", "Demo counter", ("outcome",))
+        counter.inc("success")
+
+        assert list(counter.render()) == [
+            "# HELP demo Demo counter",
+            "# TYPE demo counter",
+            'demo_total{outcome="success"} 1',
+        ]
+
+
+class TestHistogram:
+    def test_observe_buckets_are_cumulative(self):
+        histogram = Histogram("latency", "Demo latency", buckets=(0.1, 1.0))
+        for value in (0.05, 0.1, 0.5, 3.0):
+            histogram.observe(value)
+
+        lines = list(histogram.render())
+
+        assert 'latency_bucket{le="0.1"} 2' in lines
+        assert 'latency_bucket{le="1"} 3' in lines
+        assert 'latency_bucket{le="+Inf"} 4' in lines
+        assert "latency_sum 3.65" in lines
+        assert "latency_count 4" in lines
+
+    def test_time_decorator(self):
+        histogram = Histogram("calls", "Demo calls", ("operation",))
+        timed_sum = histogram.time("sum")(sum)
+
+        assert timed_sum([1, 2]) == 3
+        assert histogram.count("sum") == 1
+
+    def test_time_decorator_records_failures(self):
+        histogram = Histogram("calls", "Demo calls", ("operation",))
+
+        @histogram.time("fail")
+        def fail():
+            raise ValueError
+
+        with pytest.raises(ValueError):
+            fail()
+        assert histogram.count("fail") == 1
+
+
+class TestMetricsRegistry:
+    def test_render_includes_callback_gauges(self):
+        registry = MetricsRegistry()
+        registry.register(CallbackGauge("queue_depth", "Demo gauge", lambda: 3))
+
+        assert registry.render() == "# HELP queue_depth Demo gauge\n# TYPE queue_depth gauge\nqueue_depth 3\n"
+
+    def test_register_duplicate_name(self):
+        registry = MetricsRegistry()
+        registry.register(Counter("demo", "Demo counter"))
+
+        with pytest.raises(ValueError):
+            registry.register(Counter("demo", "Demo counter"))
+
+
+class TestMetricsMiddleware:
+    def test_latency_is_labelled_with_route_template(self):
+        demo_app = FastAPI()
+        demo_app.add_middleware(MetricsMiddleware)
+
+        @demo_app.get("/items/{item_id}")
+        async def get_item(item_id: int):
+            return {"id": item_id}
+
+        test_client = TestClient(demo_app)
+        before = http_request_duration.count("GET", "/items/{item_id}", 200)
+        unmatched_before = http_request_duration.count("GET", UNMATCHED_ROUTE, 404)
+
+        test_client.get("/items/1")
+        test_client.get("/items/2")
+        test_client.get("/missing")
+
+        assert http_request_duration.count("GET", "/items/{item_id}", 200) == before + 2
+        assert http_request_duration.count("GET", UNMATCHED_ROUTE, 404) == unmatched_before + 1
+
+
+class TestTokenDecodeFailures:
+    @pytest.mark.parametrize(
+        "token_data, secret_key, reason",
+        [
+            ({"sub": "demo_user", "exp": 1}, "secret", "expired"),
+            ({"sub": "demo_user"}, "other_secret", "invalid_signature"),
+            ({"role": "basic"}, "secret", "missing_subject"),
+        ],
+    )
+    def test_decode_failure_reason(self, token_data, secret_key, reason):
+        token = create_access_token(data=token_data, secret_key=secret_key, algorithm="HS256")
+        before = token_decode_failures.value(reason)
+
+        assert decode_access_token_claims(token, secret_key="secret", algorithms="HS256") is None
+        assert token_decode_failures.value(reason) == before + 1
+
+    def test_malformed_token(self):
+        before = token_decode_failures.value("malformed")
+
+        assert decode_access_token_claims("not-a-token", secret_key="secret", algorithms="HS256") is None
+        assert token_decode_failures.value("malformed") == before + 1
@@ -0,0 +1,51 @@
+import pytest
+
+from app.metrics import db_operation_duration, login_attempts, password_hashing_duration
+from app.settings import settings
+
+METRICS_TOKEN = "Test-Metrics-Token"
+
+
+@pytest.fixture
+def metrics_token(monkeypatch):
+    monkeypatch.setattr(settings, "METRICS_TOKEN", METRICS_TOKEN)
+    return METRICS_TOKEN
+
+
+class TestMetricsEndpoint:
+    def test_get_metrics(self, client_with_non_empty_db, basic_user_data, metrics_token):
+        test_client = client_with_non_empty_db
+        successes, failures = login_attempts.value("success"), login_attempts.value("failure")
+        verifications = password_hashing_duration.count("verify")
+        lookups = db_operation_duration.count("get_user")
+
+        test_client.post(
+            "/auth/token/", data={"username": basic_user_data["username"], "password": basic_user_data["password"]}
+        )
+        test_client.post("/auth/token/", data={"username": basic_user_data["username"], "password": "wrong"})
+        response = test_client.get("/metrics", headers={"Authorization": f"Bearer {metrics_token}"})
+
+        assert response.status_code == 200
+        assert response.headers["content-type"].startswith("text/plain; version=0.0.4")
+        assert login_attempts.value("success") == successes + 1
+        assert login_attempts.value("failure") == failures + 1
+        assert password_hashing_duration.count("verify") == verifications + 2
+        assert db_operation_duration.count("get_user") == lookups + 2
+        assert 'http_request_duration_seconds_count{method="POST",route="/auth/token/",status="200"}' in response.text
+        assert "password_hashing_pending 0" in response.text
+        assert "password_hashing_queue_depth 0" in response.text
+
+    def test_get_metrics_wrong_token(self, client, metrics_token):
+        response = client.get("/metrics", headers={"Authorization": "Bearer wrong"})
+
+        assert response.status_code == 401
+
+    def test_get_metrics_without_token(self, client, metrics_token):
+        response = client.get("/metrics")
+
+        assert response.status_code == 401
+
+    def test_get_metrics_not_served_without_configured_token(self, client):
+        response = client.get("/metrics", headers={"Authorization": f"Bearer {METRICS_TOKEN}"})
+
+        assert response.status_code == 404
@@ -0,0 +1,95 @@
+import cProfile
+import pstats
+from types import SimpleNamespace
+
+from app.profiling import (
+    ProfilingConfig,
+    RequestProfiler,
+    cprofile_stacks,
+    frame_label,
+    pyinstrument_stacks,
+)
+
+
+def busy_leaf():
+    return sum(i * i for i in range(20_000))
+
+
+def busy_caller():
+    return busy_leaf() + busy_leaf()
+
+
+class TestRequestProfiler:
+    def test_disabled_profiles_nothing(self):
+        profiler = RequestProfiler(enabled=False, sample_every=1)
+
+        assert not profiler.should_profile([(b"x-profile", b"1")])
+
+    def test_profiles_every_nth_request(self):
+        profiler = RequestProfiler(enabled=True, sample_every=3)
+
+        selected = [profiler.should_profile([]) for _ in range(6)]
+
+        assert selected == [False, False, True, False, False, True]
+
+    def test_profiles_requests_with_header(self):
+        profiler = RequestProfiler(enabled=True, sample_every=0, header="X-Profile", header_secret="s3cret")
+
+        assert profiler.should_profile([(b"x-profile", b"s3cret")])
+        assert not profiler.should_profile([(b"x-profile", b"guess")])
+        assert not profiler.should_profile([(b"x-other", b"s3cret")])
+
+        profiler.configure(ProfilingConfig(enabled=True, sample_every=0, header_enabled=False))
+
+        assert not profiler.should_profile([(b"x-profile", b"s3cret")])
+
+    def test_header_is_ignored_without_secret(self):
+        profiler = RequestProfiler(enabled=True, sample_every=0, header="X-Profile", header_secret=None)
+
+        assert not profiler.should_profile([(b"x-profile", b"")])
+        assert not profiler.should_profile([(b"x-profile", b"1")])
+
+    def test_record_aggregates_collapsed_stacks(self):
+        profiler = RequestProfiler(enabled=True, max_stacks=2)
+
+        profiler.record({"a;b": 0.001, "a": 0.002})
+        profiler.record({"a;b": 0.003, "a;c": 0.5})
+
+        assert profiler.collapsed() == "a 2000\na;b 4000\n"
+        assert profiler.stats()["profiled_requests"] == 2
+        assert profiler.stats()["dropped_stacks"] == 1
+
+        profiler.clear()
+
+        assert profiler.collapsed() == ""
+
+
+class TestStacks:
+    def test_cprofile_stacks(self):
+        profile = cProfile.Profile()
+        profile.enable()
+        busy_caller()
+        profile.disable()
+
+        stacks = cprofile_stacks(pstats.Stats(profile).stats)
+
+        caller = frame_label("busy_caller", __file__, busy_caller.__code__.co_firstlineno)
+        leaf = frame_label("busy_leaf", __file__, busy_leaf.__code__.co_firstlineno)
+        leaf_stacks = [stack for stack in stacks if f"{caller};{leaf}" in stack]
+        assert leaf_stacks
+        assert all(seconds >= 0 for seconds in stacks.values())
+
+    def test_pyinstrument_stacks(self):
+        leaf = SimpleNamespace(
+            function="verify", file_path_short="passlib/context.py", line_no=10, time=0.3, children=[]
+        )
+        root = SimpleNamespace(
+            function="endpoint", file_path_short="app/router.py", line_no=1, time=0.5, children=[leaf]
+        )
+
+        stacks = pyinstrument_stacks(root)
+
+        assert stacks == {
+            "endpoint (router.py:1)": 0.2,
+            "endpoint (router.py:1);verify (context.py:10)": 0.3,
+        }
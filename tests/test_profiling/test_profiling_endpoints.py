@@ -0,0 +1,44 @@
+import pytest
+
+from app.profiling import ProfilingConfig, request_profiler
+
+
+@pytest.fixture(autouse=True)
+def reset_request_profiler():
+    yield
+    request_profiler.configure(ProfilingConfig(enabled=False, sample_every=0))
+    request_profiler.clear()
+
+
+class TestProfilingEndpoints:
+    def test_profile_requests_with_header(self, client_admin, monkeypatch):
+        test_client = client_admin
+        monkeypatch.setattr(request_profiler, "header_secret", b"s3cret")
+
+        response = test_client.put("/system-administration/profiling/", json={"enabled": True, "sample_every": 0})
+
+        assert response.status_code == 200
+        assert response.json()["enabled"] is True
+
+        test_client.get("/users/me/")
+        test_client.get("/users/me/", headers={"X-Profile": "1"})
+        assert request_profiler.stats()["profiled_requests"] == 0
+        test_client.get("/users/me/", headers={"X-Profile": "s3cret"})
+        response = test_client.get("/system-administration/profiling/stacks/", params={"reset": True})
+
+        assert response.status_code == 200
+        assert response.headers["content-type"].startswith("text/plain")
+        assert "get_user_me" in response.text
+        assert request_profiler.stats()["profiled_requests"] == 0
+
+    def test_get_profiling_config(self, client_admin):
+        response = client_admin.get("/system-administration/profiling/")
+
+        assert response.status_code == 200
+        assert response.json()["enabled"] is False
+
+    def test_profiling_no_access_for_staff_users(self, client_staff):
+        response = client_staff.put("/system-administration/profiling/", json={"enabled": True, "sample_every": 1})
+
+        assert response.status_code == 401
+        assert request_profiler.enabled is False
@@ -0,0 +1,227 @@
+import json
+
+import pytest
+
+from app.auth.hashing import HashingPoolSaturatedError
+from app.db.schema import User as db_User
+from app.user_administration import bulk
+from app.user_administration.bulk import (
+    BulkUploadError,
+    import_users,
+    parse_bulk_upload,
+)
+
+
+@pytest.fixture
+def bulk_users():
+    return [
+        {"username": "bulk_user_1", "email": "bulk_user_1@example.com", "password": "secret_1", "role": "basic"},
+        {"username": "bulk_user_2", "email": "bulk_user_2@example.com", "password": "secret_2", "role": "staff"},
+    ]
+
+
+class TestParseBulkUpload:
+    def test_parse_json_array(self, bulk_users):
+        rows = parse_bulk_upload(json.dumps(bulk_users).encode(), "application/json")
+        assert rows == bulk_users
+
+    def test_parse_ndjson(self, bulk_users):
+        body = "\n".join(json.dumps(user) for user in bulk_users).encode()
+        rows = parse_bulk_upload(body, "application/x-ndjson")
+        assert rows == bulk_users
+
+    def test_parse_csv(self, bulk_users):
+        lines = ["username,email,password,role"] + [",".join(user.values()) for user in bulk_users]
+        rows = parse_bulk_upload("\n".join(lines).encode(), "text/csv; charset=utf-8")
+        assert rows == bulk_users
+
+    def test_parse_json_object_is_rejected(self):
+        with pytest.raises(BulkUploadError):
+            parse_bulk_upload(b'{"username": "user"}', "application/json")
+
+    def test_parse_unsupported_content_type(self):
+        with pytest.raises(BulkUploadError):
+            parse_bulk_upload(b"", "application/xml")
+
+
+class TestBulkCreateUsers:
+    def test_bulk_create_users(self, client_admin, non_empty_db_session, bulk_users):
+        test_client = client_admin
+
+        response = test_client.post("/users/bulk/", json=bulk_users)
+        actual_response_data = response.json()
+
+        assert response.status_code == 200
+        assert actual_response_data == {"created": 2, "conflicts": [], "invalid": []}
+        created_user = non_empty_db_session.query(db_User).filter(db_User.username == "bulk_user_2").first()
+        assert created_user.role == "staff"
+        assert created_user.hashed_password != "secret_2"
+
+    def test_bulk_create_users_reports_conflicts_and_invalid_rows(self, client_admin, bulk_users, basic_user_data):
+        test_client = client_admin
+        rows = [
+            bulk_users[0],
+            {**basic_user_data, "role": "basic"},
+            {**bulk_users[1], "username": "bulk_user_1"},
+            {"username": "missing_fields"},
+        ]
+        body = "\n".join(json.dumps(row) for row in rows)
+
+        response = test_client.post("/users/bulk/", content=body, headers={"content-type": "application/x-ndjson"})
+        actual_response_data = response.json()
+
+        assert response.status_code == 200
+        assert actual_response_data["created"] == 1
+        assert [error["row"] for error in actual_response_data["conflicts"]] == [2, 3]
+        assert [error["row"] for error in actual_response_data["invalid"]] == [4]
+
+    def test_bulk_create_users_malformed_upload(self, client_admin):
+        test_client = client_admin
+
+        response = test_client.post("/users/bulk/", content=b"[{", headers={"content-type": "application/json"})
+
+        assert response.status_code == 400
+
+    def test_bulk_create_users_saturated_hashing_pool(self, client_admin, bulk_users, monkeypatch):
+        test_client = client_admin
+
+        async def saturated(passwords):
+            raise HashingPoolSaturatedError()
+
+        monkeypatch.setattr(bulk, "hash_passwords", saturated)
+        response = test_client.post("/users/bulk/", json=bulk_users)
+
+        assert response.status_code == 503
+        assert "Retry-After" in response.headers
+        assert response.json() == {"created": 0, "conflicts": [], "invalid": [], "retry_from_row": 1}
+
+    def test_bulk_create_users_basic_user_cant_perform_operation(self, client_basic, bulk_users):
+        test_client = client_basic
+
+        response = test_client.post("/users/bulk/", json=bulk_users)
+
+        assert response.status_code == 401
+
+
+class TestImportUsers:
+    @pytest.mark.asyncio
+    async def test_import_reports_committed_batches_when_hashing_pool_saturates(
+        self, non_empty_db_session, bulk_users, monkeypatch
+    ):
+        hash_passwords = bulk.hash_passwords
+        calls = []
+
+        async def saturates_on_second_batch(passwords):
+            calls.append(passwords)
+            if len(calls) > 1:
+                raise HashingPoolSaturatedError()
+            return await hash_passwords(passwords)
+
+        monkeypatch.setattr(bulk, "hash_passwords", saturates_on_second_batch)
+        rows = [bulk_users[0], {"username": "missing_fields"}, bulk_users[1]]
+
+        report = await import_users(session=non_empty_db_session, rows=rows, batch_size=2)
+
+        assert report.created == 1
+        assert [error.row for error in report.invalid] == [2]
+        assert report.retry_from_row == 3
+        assert non_empty_db_session.query(db_User).filter(db_User.username == "bulk_user_1").first() is not None
+        assert non_empty_db_session.query(db_User).filter(db_User.username == "bulk_user_2").first() is None
+
+
+class TestBulkUpdateUsers:
+    def test_bulk_update_users_by_ids(self, client_admin, non_empty_db_session):
+        test_client = client_admin
+
+        response = test_client.patch("/users/bulk/", json={"ids": [1, 2, 99], "role": "staff"})
+
+        assert response.status_code == 200
+        assert response.json() == {"matched": 2, "updated": 1}
+        non_empty_db_session.expire_all()
+        assert non_empty_db_session.get(db_User, 1).role == "staff"
+
+    def test_bulk_update_users_by_filter(self, client_admin, non_empty_db_session):
+        test_client = client_admin
+
+        response = test_client.patch("/users/bulk/", json={"filter": {"username_prefix": "basic"}, "role": "staff"})
+
+        assert response.status_code == 200
+        assert response.json() == {"matched": 1, "updated": 1}
+
+    def test_bulk_update_users_requires_ids_or_filter(self, client_admin):
+        test_client = client_admin
+
+        response = test_client.patch("/users/bulk/", json={"role": "staff"})
+
+        assert response.status_code == 422
+
+    @pytest.mark.parametrize("user_filter", [{}, {"username_prefix": ""}, {"role": None, "username_prefix": None}])
+    def test_bulk_update_users_rejects_empty_filter(self, client_admin, non_empty_db_session, user_filter):
+        test_client = client_admin
+
+        response = test_client.patch("/users/bulk/", json={"filter": user_filter, "role": "basic"})
+
+        assert response.status_code == 422
+        non_empty_db_session.expire_all()
+        assert non_empty_db_session.get(db_User, 3).role == "admin"
+
+    def test_bulk_update_users_never_demotes_caller(self, client_admin, non_empty_db_session, admin_user):
+        test_client = client_admin
+
+        response = test_client.patch("/users/bulk/", json={"filter": {"role": "admin"}, "role": "basic"})
+
+        assert response.status_code == 200
+        assert response.json() == {"matched": 0, "updated": 0}
+        non_empty_db_session.expire_all()
+        assert non_empty_db_session.get(db_User, admin_user.id).role == "admin"
+
+    def test_bulk_update_users_staff_user_cant_perform_operation(self, client_staff):
+        test_client = client_staff
+
+        response = test_client.patch("/users/bulk/", json={"ids": [1], "role": "admin"})
+
+        assert response.status_code == 401
+
+
+class TestBulkDeleteUsers:
+    def test_bulk_delete_users_by_ids(self, client_admin, non_empty_db_session):
+        test_client = client_admin
+
+        response = test_client.post("/users/bulk/delete/", json={"ids": [1, 2, 99]})
+
+        assert response.status_code == 200
+        assert response.json() == {"deleted": 2}
+        assert non_empty_db_session.query(db_User).count() == 1
+
+    def test_bulk_delete_users_by_filter(self, client_admin, non_empty_db_session):
+        test_client = client_admin
+
+        response = test_client.post("/users/bulk/delete/", json={"filter": {"role": "staff"}})
+
+        assert response.status_code == 200
+        assert response.json() == {"deleted": 1}
+
+    def test_bulk_delete_users_basic_user_cant_perform_operation(self, client_basic):
+        test_client = client_basic
+
+        response = test_client.post("/users/bulk/delete/", json={"ids": [1]})
+
+        assert response.status_code == 401
+
+    def test_bulk_delete_users_rejects_empty_filter(self, client_admin, non_empty_db_session):
+        test_client = client_admin
+
+        response = test_client.post("/users/bulk/delete/", json={"filter": {}})
+
+        assert response.status_code == 422
+        assert non_empty_db_session.query(db_User).count() == 3
+
+    def test_bulk_delete_users_never_deletes_caller(self, client_admin, non_empty_db_session, admin_user):
+        test_client = client_admin
+
+        response = test_client.post("/users/bulk/delete/", json={"ids": [1, admin_user.id]})
+
+        assert response.status_code == 200
+        assert response.json() == {"deleted": 1}
+        non_empty_db_session.expire_all()
+        assert non_empty_db_session.get(db_User, admin_user.id) is not None
@@ -1,7 +1,10 @@
+import json
 from typing import Optional
 
 import pytest
 
+from app.db.operations import insert_users
+from app.db.schema import Role
 from app.db.schema import User as db_User
 from app.users.models import UserWithRoleCreate
 
@@ -176,6 +179,89 @@ class TestGetUserList:
             assert "email" in item
             assert "role" in item
 
+    def test_get_user_list_first_page(self, client_admin):
+        test_client = client_admin
+
+        response = test_client.get("/users/", params={"limit": 2})
+        response_data = response.json()
+
+        assert response.status_code == 200
+        assert [item["id"] for item in response_data] == [1, 2]
+        assert response.headers["X-Next-Cursor"] == "2"
+
+    def test_get_user_list_next_page(self, client_admin):
+        test_client = client_admin
+
+        response = test_client.get("/users/", params={"limit": 2, "after": 2})
+        response_data = response.json()
+
+        assert response.status_code == 200
+        assert [item["id"] for item in response_data] == [3]
+        assert "X-Next-Cursor" not in response.headers
+
+    def test_get_user_list_without_limit_returns_every_user(self, client_admin, non_empty_db_session):
+        test_client = client_admin
+        insert_users(
+            session=non_empty_db_session,
+            rows=[
+                {"username": f"user_{i}", "email": f"user_{i}@example.com", "hashed_password": "x", "role": Role.basic}
+                for i in range(5)
+            ],
+        )
+
+        response = test_client.get("/users/")
+
+        assert response.status_code == 200
+        assert len(response.json()) == 8
+        assert "X-Next-Cursor" not in response.headers
+
+    def test_get_user_list_filtered_by_role(self, client_admin):
+        test_client = client_admin
+
+        response = test_client.get("/users/", params={"role": "staff"})
+        response_data = response.json()
+
+        assert response.status_code == 200
+        assert [item["username"] for item in response_data] == ["staff_user"]
+
+    def test_get_user_list_filtered_by_username_prefix(self, client_admin):
+        test_client = client_admin
+
+        response = test_client.get("/users/", params={"username_prefix": "adm"})
+        response_data = response.json()
+
+        assert response.status_code == 200
+        assert [item["username"] for item in response_data] == ["admin_user"]
+
+    def test_get_user_list_limit_out_of_range(self, client_admin):
+        test_client = client_admin
+
+        response = test_client.get("/users/", params={"limit": 0})
+
+        assert response.status_code == 422
+
+    def test_get_user_list_stream(self, client_admin):
+        test_client = client_admin
+
+        response = test_client.get("/users/", params={"stream": True})
+        response_data = [json.loads(line) for line in response.text.splitlines()]
+
+        assert response.status_code == 200
+        assert response.headers["content-type"] == "application/x-ndjson"
+        assert [item["id"] for item in response_data] == [1, 2, 3]
+        assert set(response_data[0]) == {"id", "username", "email", "role"}
+
+    def test_get_user_list_stream_filtered_by_role(self, client_admin):
+        test_client = client_admin
+
+        response = test_client.get("/users/", params={"stream": True, "role": "admin"})
+        response_data = [json.loads(line) for line in response.text.splitlines()]
+
+        assert response.status_code == 200
+        assert response_data == [
+            {"id": 3, "username": "admin_user", "email": "admin_user@example.com", "role": "admin"}
+        ]
+
     def test_get_user_list_admin_token_expired(self, client_admin_expired):
         test_client = client_admin_expired
         expected_response_date = {"detail": "Unauthorized access"}
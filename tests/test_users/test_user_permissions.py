@@ -1,118 +1,189 @@
 import pytest
 from fastapi import HTTPException
 
-from app.db.schema import User as db_User
+from app.auth.token import create_access_token
+from app.db.operations import update_user_data
+from app.settings import settings
 from app.users.permissions import (
     authenticated_admin_user,
     authenticated_staff_user,
     authenticated_user,
 )
+from app.users.principal import Principal
 
 
 class TestAuthenticatedUser:
-    def test_authenticated_user(self, non_empty_db_session, basic_user, basic_user_token):
+    @pytest.mark.asyncio
+    async def test_authenticated_user(self, non_empty_db_session, basic_user, basic_user_token):
         db_session = non_empty_db_session
         access_token = basic_user_token
         db_session.refresh(basic_user)
         expected_auth_user = basic_user
 
-        actual_auth_user = authenticated_user(token=access_token, session=db_session)
+        actual_auth_user = await authenticated_user(token=access_token, session=db_session)
 
-        assert isinstance(actual_auth_user, db_User)
-        assert actual_auth_user == expected_auth_user
+        assert isinstance(actual_auth_user, Principal)
+        assert actual_auth_user == Principal.from_user(expected_auth_user)
 
-    def test_authenticated_user_when_token_expired(self, non_empty_db_session, basic_user, basic_user_token_expired):
+    @pytest.mark.asyncio
+    async def test_authenticated_user_loads_no_orm_identity(self, non_empty_db_session, basic_user_token):
+        db_session = non_empty_db_session
+        db_session.expunge_all()
+
+        await authenticated_user(token=basic_user_token, session=db_session)
+
+        assert len(db_session.identity_map) == 0
+
+    @pytest.mark.asyncio
+    async def test_authenticated_user_when_token_expired(
+        self, non_empty_db_session, basic_user, basic_user_token_expired
+    ):
         db_session = non_empty_db_session
         access_token = basic_user_token_expired
 
         with pytest.raises(HTTPException):
-            authenticated_user(token=access_token, session=db_session)
+            await authenticated_user(token=access_token, session=db_session)
 
-    def test_authenticated_user_when_token_invalid(self, non_empty_db_session):
+    @pytest.mark.asyncio
+    async def test_authenticated_user_when_token_invalid(self, non_empty_db_session):
         db_session = non_empty_db_session
         access_token = "invalid.token.string"
 
         with pytest.raises(HTTPException):
-            authenticated_user(token=access_token, session=db_session)
+            await authenticated_user(token=access_token, session=db_session)
 
 
 class TestAuthenticatedStaffUser:
-    def test_authenticated_staff_user(self, non_empty_db_session, staff_user, staff_user_token):
+    @pytest.mark.asyncio
+    async def test_authenticated_staff_user(self, non_empty_db_session, staff_user, staff_user_token):
         db_session = non_empty_db_session
         db_session.refresh(staff_user)
         access_token = staff_user_token
         expected_user = staff_user
 
-        actual_user = authenticated_staff_user(token=access_token, session=db_session)
+        actual_user = await authenticated_staff_user(token=access_token, session=db_session)
 
-        assert isinstance(actual_user, db_User)
-        assert actual_user == expected_user
+        assert isinstance(actual_user, Principal)
+        assert actual_user == Principal.from_user(expected_user)
 
-    def test_authenticated_staff_user_when_token_expired(self, non_empty_db_session, staff_user_token_expired):
+    @pytest.mark.asyncio
+    async def test_authenticated_staff_user_when_token_expired(self, non_empty_db_session, staff_user_token_expired):
         db_session = non_empty_db_session
         access_token = staff_user_token_expired
 
         with pytest.raises(HTTPException):
-            authenticated_staff_user(token=access_token, session=db_session)
+            await authenticated_staff_user(token=access_token, session=db_session)
 
-    def test_authenticated_staff_user_when_token_invalid(self, non_empty_db_session):
+    @pytest.mark.asyncio
+    async def test_authenticated_staff_user_when_token_invalid(self, non_empty_db_session):
         db_session = non_empty_db_session
         access_token = "invalid.token.string"
 
         with pytest.raises(HTTPException):
-            authenticated_staff_user(token=access_token, session=db_session)
+            await authenticated_staff_user(token=access_token, session=db_session)
 
-    def test_authenticated_staff_user_when_basic_user_token(self, non_empty_db_session, basic_user_token):
+    @pytest.mark.asyncio
+    async def test_authenticated_staff_user_when_basic_user_token(self, non_empty_db_session, basic_user_token):
         db_session = non_empty_db_session
         access_token = basic_user_token
 
         with pytest.raises(HTTPException):
-            authenticated_staff_user(token=access_token, session=db_session)
+            await authenticated_staff_user(token=access_token, session=db_session)
 
-    def test_authenticated_staff_user_when_admin_user_token(self, non_empty_db_session, admin_user_token):
+    @pytest.mark.asyncio
+    async def test_authenticated_staff_user_when_admin_user_token(self, non_empty_db_session, admin_user_token):
         db_session = non_empty_db_session
         access_token = admin_user_token
 
         with pytest.raises(HTTPException):
-            authenticated_staff_user(token=access_token, session=db_session)
+            await authenticated_staff_user(token=access_token, session=db_session)
 
 
 class TestAuthenticatedAdminUser:
-    def test_authenticated_admin_user(self, non_empty_db_session, admin_user, admin_user_token):
+    @pytest.mark.asyncio
+    async def test_authenticated_admin_user(self, non_empty_db_session, admin_user, admin_user_token):
         db_session = non_empty_db_session
         db_session.refresh(admin_user)
         access_token = admin_user_token
         expected_user = admin_user
 
-        actual_user = authenticated_admin_user(token=access_token, session=db_session)
+        actual_user = await authenticated_admin_user(token=access_token, session=db_session)
 
-        assert isinstance(actual_user, db_User)
-        assert actual_user == expected_user
+        assert isinstance(actual_user, Principal)
+        assert actual_user == Principal.from_user(expected_user)
 
-    def test_authenticated_admin_user_when_token_expired(self, non_empty_db_session, admin_user_token_expired):
+    @pytest.mark.asyncio
+    async def test_authenticated_admin_user_when_token_expired(self, non_empty_db_session, admin_user_token_expired):
         db_session = non_empty_db_session
         access_token = admin_user_token_expired
 
         with pytest.raises(HTTPException):
-            authenticated_admin_user(token=access_token, session=db_session)
+            await authenticated_admin_user(token=access_token, session=db_session)
 
-    def test_authenticated_admin_user_when_token_invalid(self, non_empty_db_session):
+    @pytest.mark.asyncio
+    async def test_authenticated_admin_user_when_token_invalid(self, non_empty_db_session):
         db_session = non_empty_db_session
         access_token = "invalid.token.string"
 
         with pytest.raises(HTTPException):
-            authenticated_admin_user(token=access_token, session=db_session)
+            await authenticated_admin_user(token=access_token, session=db_session)
 
-    def test_authenticated_admin_user_when_basic_user_token(self, non_empty_db_session, basic_user_token):
+    @pytest.mark.asyncio
+    async def test_authenticated_admin_user_when_basic_user_token(self, non_empty_db_session, basic_user_token):
         db_session = non_empty_db_session
         access_token = basic_user_token
 
         with pytest.raises(HTTPException):
-            authenticated_admin_user(token=access_token, session=db_session)
+            await authenticated_admin_user(token=access_token, session=db_session)
 
-    def test_authenticated_admin_user_when_staff_user_token(self, non_empty_db_session, staff_user_token):
+    @pytest.mark.asyncio
+    async def test_authenticated_admin_user_when_staff_user_token(self, non_empty_db_session, staff_user_token):
         db_session = non_empty_db_session
         access_token = staff_user_token
 
         with pytest.raises(HTTPException):
-            authenticated_admin_user(token=access_token, session=db_session)
+            await authenticated_admin_user(token=access_token, session=db_session)
+
+
+class TestStatelessAuthentication:
+    @pytest.mark.asyncio
+    async def test_authenticated_user_from_token_claims(self, non_empty_db_session, staff_user, monkeypatch):
+        monkeypatch.setattr(settings, "STATELESS_AUTH", True)
+        non_empty_db_session.refresh(staff_user)
+        access_token = create_access_token(data={"sub": staff_user.username}, user=staff_user)
+
+        actual_user = await authenticated_staff_user(token=access_token, session=None)
+
+        assert isinstance(actual_user, Principal)
+        assert actual_user.id == staff_user.id
+        assert actual_user.username == staff_user.username
+
+    @pytest.mark.asyncio
+    async def test_authenticated_user_without_user_claims_falls_back_to_db(
+        self, non_empty_db_session, basic_user, basic_user_token, monkeypatch
+    ):
+        monkeypatch.setattr(settings, "STATELESS_AUTH", True)
+        non_empty_db_session.refresh(basic_user)
+
+        actual_user = await authenticated_user(token=basic_user_token, session=non_empty_db_session)
+
+        assert isinstance(actual_user, Principal)
+        assert actual_user == Principal.from_user(basic_user)
+
+    @pytest.mark.asyncio
+    async def test_role_change_invalidates_token_claims(self, non_empty_db_session, staff_user, monkeypatch):
+        monkeypatch.setattr(settings, "STATELESS_AUTH", True)
+        non_empty_db_session.refresh(staff_user)
+        access_token = create_access_token(data={"sub": staff_user.username}, user=staff_user)
+
+        update_user_data(uid=staff_user.id, update_data={"role": "basic"}, session=non_empty_db_session)
+
+        with pytest.raises(HTTPException):
+            await authenticated_staff_user(token=access_token, session=non_empty_db_session)
+
+    @pytest.mark.asyncio
+    async def test_invalid_token(self, monkeypatch):
+        monkeypatch.setattr(settings, "STATELESS_AUTH", True)
+
+        with pytest.raises(HTTPException):
+            await authenticated_user(token="invalid.token.string", session=None)